@@ -1,71 +1,670 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, jsonify
+from flask import Flask, Response, g, render_template, request, redirect, url_for, jsonify
+from jinja2.utils import htmlsafe_json_dumps
+from markupsafe import Markup
+from werkzeug.utils import safe_join
+from sqlalchemy.exc import OperationalError
 from datetime import datetime
-import logic, storage
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import cache, events, expiry, logic, metrics, models, records, recurrence, storage
 
 app = Flask(__name__)
+# Seconds between SSE heartbeats on /api/stream
+app.config.setdefault('STREAM_HEARTBEAT', 15.0)
+# Seconds between an open stream's checks of the stored data version: how it notices writes
+# committed by other worker processes (writes in its own process wake it at once)
+app.config.setdefault('STREAM_POLL', 2.0)
+# Largest number of operations accepted by one /api/batch request
+app.config.setdefault('BATCH_MAX_OPS', 1000)
+# How many recent list snapshots to keep as bases for ?since= delta responses
+app.config.setdefault('DELTA_HISTORY', 8)
+# Page size of windowed lists (?window=, /api/tasks/<list>) when the client names none, and the largest allowed
+app.config.setdefault('LIST_PAGE_SIZE', 100)
+app.config.setdefault('LIST_PAGE_MAX', 1000)
+# Cache lifetime of static files requested under their content hash (url_for adds ?v=<hash>)
+app.config.setdefault('STATIC_IMMUTABLE_MAX_AGE', 365 * 24 * 3600)
+# Opt-in request instrumentation: per-phase timings, SQL statement counts and /metrics
+app.config.setdefault('METRICS', os.environ.get('TODO_METRICS') == '1')
+# With METRICS on, requests sent with "X-Profile: 1" dump a cProfile file here (unset = never profile);
+# one request is profiled at a time, overlapping ones run unprofiled (see metrics.begin_request)
+app.config.setdefault('PROFILE_DIR', os.environ.get('TODO_PROFILE_DIR'))
 
+LIST_KEYS = ("main_list", "awaragardi_list", "home_list")
 
-def _to_iso(val):
-    if val is None:
+
+def _build_lists(workspace, version, now):
+    """Compile a workspace's canonical lists (each filtered in SQL by storage) into a cache entry for version."""
+    # Main workspace contains tasks that are explicitly in_main OR tasks that are by-design in main (Necessary/College)
+    with metrics.phase("load"):
+        main_input = storage.get_main_tasks(workspace)
+        # Side banks exclude tasks that are currently placed in_main
+        awaragardi_list = storage.get_side_tasks("Awaragardi", workspace, now)
+        home_list = storage.get_side_tasks("Home", workspace, now)
+        # recurring tasks: the templates still running, and occurrences already turned into tasks
+        templates = storage.get_templates(workspace, now)
+        claimed = storage.get_claims(workspace, now) if templates else set()
+    return _assemble_lists(workspace, version, now, main_input, awaragardi_list, home_list, templates, claimed)
+
+
+def _with_occurrences(now, main_input, side_lists, templates, claimed):
+    """
+    Add the occurrences recurrence.expand generates for the look-ahead window to the loaded
+    lists (Main input by the same rule as storage.get_main_tasks; side banks stay in id order,
+    which generated ids sort after). Nothing is written: the series only exist here.
+    """
+    main_input = list(main_input)
+    extra = {category: [] for category in side_lists}
+    for occ in recurrence.expand(templates, now, claimed):
+        if occ.in_main or occ.category in storage.MAIN_CATEGORIES:
+            main_input.append(occ)
+        elif occ.category in extra:
+            extra[occ.category].append(occ)
+    for category, occs in extra.items():
+        occs.sort(key=lambda t: t.id)
+        side_lists[category] = side_lists[category] + occs
+    return main_input, side_lists
+
+
+def _assemble_lists(workspace, version, now, main_input, awaragardi_list, home_list, templates=(), claimed=()):
+    """Compile loaded task records (and templates) into a cache entry (shared by the WSGI app and asgi.py)."""
+    with metrics.phase("compile"):
+        passed, window_change = 0, None
+        if templates:
+            main_input, sides = _with_occurrences(now, main_input, {"Awaragardi": awaragardi_list, "Home": home_list},
+                                                  templates, claimed)
+            awaragardi_list, home_list = sides["Awaragardi"], sides["Home"]
+            passed, window_change = recurrence.time_boundaries(templates, now)
+        main_list = logic.compile_main(main_input, now)
+        # the Main order also depends on now: tag it with the boundaries crossed, expire at the next one
+        crossed, next_change = logic.time_boundaries(main_input, now)
+        # side banks were loaded without the tasks already due: they change when the next one comes due
+        side_due = min((t.due for t in awaragardi_list + home_list), default=None)
+        for change in (window_change, records.from_epoch(side_due)):
+            if change is not None and (next_change is None or change < next_change):
+                next_change = change
+    lists = (main_list, awaragardi_list, home_list)
+    with metrics.phase("serialize"):
+        # the JSON boundary: ISO datetime strings are only produced here
+        payload = {key: [t.as_json() for t in lst] for key, lst in zip(LIST_KEYS, lists)}
+    # workspaces that were never written share version 0, so the key is part of the tag;
+    # with templates, the occurrences that entered or left the window change it too
+    tag = f"{crossed}.{passed}" if templates else f"{crossed}"
+    # every side task due before the next side due has left the banks, so that due names their state
+    if side_due is not None:
+        tag += f"~{side_due}"
+    return cache.CompiledLists(version, f"{workspace}:{version}-{tag}", lists, payload, next_change)
+
+
+# Compiled lists per workspace, shared by every request until the next write or time boundary
+_lists_cache = cache.ListCache()
+
+
+def _workspace():
+    """The workspace of the current request (resolved by _resolve_workspace)."""
+    return g.workspace
+
+
+def _compiled(now, workspace=None):
+    if workspace is None:
+        workspace = _workspace()
+    return _lists_cache.get(workspace, storage.data_version(workspace), now,
+                            lambda version, at: _build_lists(workspace, version, at))
+
+
+def _canonical_lists_and_response(now=None, removed_expired=None, workspace=None):
+    """
+    Return canonical lists: main = in_main OR necessary/college; side lists exclude in_main; include removed_expired.
+    Read-only: expired rows are deleted by the expiry scheduler (compile_main already hides them until then).
+    "version" is the lists' ETag.
+    """
+    if now is None:
+        now = datetime.now()
+    if removed_expired is None:
+        removed_expired = []
+    return _entry_payload(_compiled(now, workspace), removed_expired)
+
+
+def _entry_payload(entry, removed_expired=()):
+    return {**entry.payload, "removed_expired": list(removed_expired), "version": entry.etag}
+
+
+def _list_delta(old, new):
+    """
+    Diff two serialized lists by task id.
+    Returns None when identical, else inserted/updated tasks, removed ids and
+    positions {id: new_index} for every task whose index changed (inserted ones included).
+    """
+    old_idx = {t["id"]: i for i, t in enumerate(old)}
+    new_ids = {t["id"] for t in new}
+    inserted, updated, positions = [], [], {}
+    for i, t in enumerate(new):
+        j = old_idx.get(t["id"])
+        if j is None:
+            inserted.append(t)
+        elif old[j] != t:
+            updated.append(t)
+        if j != i:
+            positions[t["id"]] = i
+    removed = [tid for tid in old_idx if tid not in new_ids]
+    if not (inserted or updated or removed or positions):
+        return None
+    return {"inserted": inserted, "updated": updated, "removed": removed,
+            "positions": positions, "length": len(new)}
+
+
+def _delta_payload(base_version, base_lists, payload, window=None):
+    """
+    Express payload as changes against base_lists (a snapshot the client already holds).
+    With a window (see _parse_window) the client holds only the first n tasks of a list: the
+    delta is between the first n of each side, so a task crossing the window edge arrives as
+    inserted/removed and tasks beyond it are not reported.
+    """
+    lists = {}
+    for key in LIST_KEYS:
+        old, new = base_lists[key], payload[key]
+        if window and key in window:
+            old, new = old[:window[key]], new[:window[key]]
+        d = _list_delta(old, new)
+        if d is not None:
+            lists[key] = d
+    body = {"delta": True, "base": base_version, "version": payload["version"],
+            "lists": lists, "removed_expired": payload["removed_expired"]}
+    if window:
+        body["windows"] = _windows(payload, window)
+    return body
+
+
+def _parse_window(value):
+    """
+    Parse ?window=: "n" (the first n tasks of every list) or "main_list:n,home_list:m,..."
+    (lists not named stay whole). Returns {list_key: n}, or None for no window (also when malformed).
+    """
+    if not value:
         return None
     try:
-        from datetime import datetime as _dt
-        if isinstance(val, _dt):
-            return val.isoformat()
-    except Exception:
-        pass
+        if ":" not in value:
+            n = int(value)
+            return {key: n for key in LIST_KEYS} if n >= 0 else None
+        window = {}
+        for part in value.split(","):
+            key, n = part.split(":", 1)
+            n = int(n)
+            if key not in LIST_KEYS or n < 0:
+                return None
+            window[key] = n
+        return window
+    except ValueError:
+        return None
+
+
+def _cursor(items, end):
+    """Opaque cursor for the tasks after items[:end]; None when nothing follows."""
+    if end >= len(items):
+        return None
+    return f"{end}.{items[end - 1]['id']}" if end else "0"
+
+
+def _cursor_offset(items, cursor):
+    """
+    Where cursor resumes in items: right after the task it was issued after, wherever that task
+    sits now (the list may have changed since), else at its recorded offset. None if malformed.
+    """
+    offset, _, after = cursor.partition(".")
     try:
-        return str(val)
-    except Exception:
+        offset = int(offset)
+        after = int(after) if after else None
+    except ValueError:
         return None
+    if offset < 0:
+        return None
+    if after is not None and not (0 < offset <= len(items) and items[offset - 1]["id"] == after):
+        for i, t in enumerate(items):
+            if t["id"] == after:
+                return i + 1
+    return min(offset, len(items))
 
 
-def _canonical_lists_and_response():
-    """Return canonical lists: main = in_main OR necessary/college; side lists exclude in_main; include removed_expired."""
-    now = datetime.now()
-    removed_expired = storage.remove_expired(now)
-    all_tasks = storage.get_all_tasks()
+def _windows(payload, window):
+    """Each list's total length and the cursor of the page after its window."""
+    return {key: {"total": len(payload[key]), "next": _cursor(payload[key], window.get(key, len(payload[key])))}
+            for key in LIST_KEYS}
 
-    # Main workspace contains tasks that are explicitly in_main OR tasks that are by-design in main (Necessary/College)
-    tasks_for_main = [t for t in all_tasks if t.get("in_main") or t.get("category") in ("Necessary", "College")]
-    main_list = logic.compile_main(tasks_for_main, now)
-
-    # Side banks must exclude tasks that are currently placed in_main
-    awaragardi_list = [t for t in all_tasks if t.get("category") == "Awaragardi" and not t.get("is_done") and not t.get("in_main")]
-    home_list = [t for t in all_tasks if t.get("category") == "Home" and not t.get("is_done") and not t.get("in_main")]
-
-    def _serial(task):
-        return {
-            **task,
-            "due_datetime": _to_iso(task.get("due_datetime")),
-            "created_at": _to_iso(task.get("created_at")),
-            "updated_at": _to_iso(task.get("updated_at")),
-        }
-
-    return {
-        "main_list": [_serial(t) for t in main_list],
-        "awaragardi_list": [_serial(t) for t in awaragardi_list],
-        "home_list": [_serial(t) for t in home_list],
-        "removed_expired": removed_expired
-    }
+
+def _windowed(payload, window):
+    """payload with its lists cut to window, plus "windows" (totals and next-page cursors)."""
+    body = dict(payload)
+    for key, n in window.items():
+        body[key] = payload[key][:n]
+    body["windows"] = _windows(payload, window)
+    return body
+
+
+def _page_limit(value):
+    """?limit= of a page request: LIST_PAGE_SIZE when absent, capped at LIST_PAGE_MAX; None if invalid."""
+    if value is None:
+        return app.config['LIST_PAGE_SIZE']
+    try:
+        limit = int(value)
+    except ValueError:
+        return None
+    return min(limit, app.config['LIST_PAGE_MAX']) if limit > 0 else None
+
+
+def _page_body(entry, list_key, cursor=None, limit=None):
+    """One page of a compiled list (see api_tasks_page). Returns (body, None) or (None, reason)."""
+    items = entry.payload[list_key]
+    offset = _cursor_offset(items, cursor) if cursor else 0
+    if offset is None:
+        return None, "invalid cursor"
+    end = min(offset + limit, len(items))
+    return {"list": list_key, "items": items[offset:end], "offset": offset, "total": len(items),
+            "next": _cursor(items, end), "version": entry.etag}, None
+
+
+# Recently served list snapshots per workspace (as many workspaces as the list cache holds),
+# by version; None marks a version served with two different bodies
+_snapshots = OrderedDict()
+_snapshots_lock = threading.Lock()
+
+
+def _etag_workspace(version):
+    """The workspace a list ETag belongs to ("<workspace>:<data version>-<tag>"; keys have no ':')."""
+    return version.split(":", 1)[0]
+
+
+def _expired_since(etag, since):
+    """
+    Ids the expiry sweep removed from etag's workspace after the client's version since (an ETag
+    of the same workspace), for its "expired" toast: polling clients get no stream events.
+    """
+    if not since or _etag_workspace(since) != _etag_workspace(etag):
+        return []
+    try:
+        data_version = int(since.split(":", 1)[1].split("-", 1)[0])
+    except (IndexError, ValueError):
+        return []
+    return events.hub.expired_since(_etag_workspace(etag), data_version)
+
+
+def _remember_snapshot(version, payload):
+    lists = {key: payload[key] for key in LIST_KEYS}
+    workspace = _etag_workspace(version)
+    with _snapshots_lock:
+        history = _snapshots.setdefault(workspace, OrderedDict())
+        _snapshots.move_to_end(workspace)
+        while len(_snapshots) > _lists_cache.max_entries:
+            _snapshots.popitem(last=False)
+        if version in history:
+            if history[version] != lists:
+                history[version] = None
+            return
+        history[version] = lists
+        while len(history) > app.config['DELTA_HISTORY']:
+            history.popitem(last=False)
+
+
+def _snapshot(workspace, version):
+    """The lists of workspace served as version, if remembered (None for another workspace's version)."""
+    if _etag_workspace(version) != workspace:
+        return None
+    with _snapshots_lock:
+        history = _snapshots.get(workspace)
+        return history.get(version) if history is not None else None
+
+
+@app.before_request
+def _begin_metrics():
+    # registered first so it also covers requests another hook answers early
+    if app.config['METRICS']:
+        metrics.enable(storage.get_engine())
+        profile = bool(app.config['PROFILE_DIR']) and request.headers.get('X-Profile') == '1'
+        metrics.begin_request(request.endpoint, profile)
+
+
+@app.after_request
+def _end_metrics(resp):
+    if metrics.enabled:
+        stats, dump = metrics.end_request(app.config['PROFILE_DIR'])
+        if stats is not None:
+            resp.headers['Server-Timing'] = metrics.server_timing(stats)
+            if dump:
+                resp.headers['X-Profile-Dump'] = os.path.basename(dump)
+    return resp
+
+
+@app.before_request
+def _start_background_jobs():
+    # started lazily so only the process that serves requests runs it (not the debug reloader's parent)
+    expiry.scheduler.start()
+
+
+def _pick_workspace(query, header, cookie):
+    """First of ?workspace=, X-Workspace and the cookie that is set (else the default); None if invalid."""
+    ws = query or header or cookie or storage.DEFAULT_WORKSPACE
+    return ws if storage.WORKSPACE_RE.match(ws) else None
+
+
+@app.before_request
+def _resolve_workspace():
+    """Scope the request to a workspace: ?workspace=, else the X-Workspace header, else the workspace cookie."""
+    if request.endpoint == 'static':
+        return  # static files are shared by every workspace (a bad cookie must not break the page's script)
+    ws = _pick_workspace(request.args.get('workspace'), request.headers.get('X-Workspace'),
+                         request.cookies.get('workspace'))
+    if ws is None:
+        return jsonify({"status": "error", "reason": "invalid workspace"}), 400
+    g.workspace = ws
+
+
+@app.errorhandler(OperationalError)
+def _database_error(e):
+    # workers do not create the schema (see models.py): name the fix instead of a bare 500
+    if "no such table" not in str(e.orig):
+        raise e
+    app.logger.error("database %s has no schema: run `python models.py` first", models.DB_URL)
+    return jsonify({"status": "error", "reason": "database not initialized"}), 503
+
+
+def _conflict_body(task_id, current):
+    """Extra keys of a 409 answer: the task as it is now (None if it is gone)."""
+    return {"status": "error", "reason": "conflict", "task_id": task_id,
+            "task": current.as_json() if current else None}
+
+
+@app.errorhandler(storage.Conflict)
+def _conflict(e):
+    """A write based on a stale task version (nothing was written): 409 with the current state."""
+    current = storage.get_task(e.task_id, workspace=_workspace())
+    resp = _lists_response(extra=_conflict_body(e.task_id, current))
+    resp.status_code = 409
+    return resp
+
+
+# Content hashes of static files: filename -> (mtime_ns, hash)
+_static_hashes = {}
+
+
+def _static_hash(filename):
+    """Short content hash of a file under static/ (recomputed when it changes); None if there is no such file."""
+    path = safe_join(app.static_folder, filename)
+    try:
+        mtime = os.stat(path).st_mtime_ns if path else None
+    except OSError:
+        return None
+    if mtime is None:
+        return None
+    cached = _static_hashes.get(filename)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            cached = _static_hashes[filename] = (mtime, hashlib.sha256(f.read()).hexdigest()[:12])
+    return cached[1]
+
+
+@app.url_defaults
+def _hash_static_urls(endpoint, values):
+    """url_for('static', filename=...) carries ?v=<content hash>: a changed file gets a new URL."""
+    if endpoint == 'static' and 'v' not in values:
+        digest = _static_hash(values.get('filename', ''))
+        if digest:
+            values['v'] = digest
+
+
+@app.after_request
+def _cache_static(resp):
+    # a static file fetched under its current hash never changes: let browsers keep it
+    if request.endpoint == 'static' and resp.status_code == 200:
+        v = request.args.get('v')
+        if v and v == _static_hash((request.view_args or {}).get('filename', '')):
+            resp.cache_control.no_cache = None
+            resp.cache_control.public = True
+            resp.cache_control.max_age = app.config['STATIC_IMMUTABLE_MAX_AGE']
+            resp.cache_control.immutable = True
+    return resp
+
+
+def _page_fragments(entry):
+    """
+    The data-dependent parts of index.html for a cache entry: the first page of each list as
+    HTML, and the same page as JSON for script.js to hydrate from. Rendered once per data version.
+    """
+    fragments = entry.rendered.get('index')
+    if fragments is None:
+        page = app.config['LIST_PAGE_SIZE']
+        lists = {key: Markup(render_template('_task_list.html', tasks=lst[:page], done_button=(key == "main_list")))
+                 for key, lst in zip(LIST_KEYS, entry.lists)}
+        initial = _windowed(_entry_payload(entry), {key: page for key in LIST_KEYS})
+        fragments = entry.rendered['index'] = (lists, htmlsafe_json_dumps(initial, dumps=app.json.dumps))
+    return fragments
 
 
 @app.route('/')
 def index():
     now = datetime.now()
-    storage.remove_expired(now)
-    all_tasks = storage.get_all_tasks()
-    tasks_for_main = [t for t in all_tasks if t.get("in_main") or t.get("category") in ("Necessary", "College")]
-    main_list = logic.compile_main(tasks_for_main, now)
-    awaragardi_list = [t for t in all_tasks if t.get("category") == "Awaragardi" and not t.get("is_done") and not t.get("in_main")]
-    home_list = [t for t in all_tasks if t.get("category") == "Home" and not t.get("is_done") and not t.get("in_main")]
-    return render_template('index.html', main_list=main_list, awaragardi_list=awaragardi_list, home_list=home_list)
+    entry = _compiled(now)
+    # the embedded state is a base the page's stream can diff against (?since=)
+    _remember_snapshot(entry.etag, _entry_payload(entry))
+    with metrics.phase("render"):
+        # only the first page of each list is rendered; script.js windows the rest in on scroll
+        lists, initial = _page_fragments(entry)
+        resp = app.make_response(render_template('index.html', lists=lists, initial=initial))
+    # ?workspace= on the page sticks for the page's own fetches, forms and stream
+    if request.args.get('workspace'):
+        resp.set_cookie('workspace', _workspace(), samesite='Lax')
+    return resp
+
+
+def _lists_response(now=None, extra=None):
+    """
+    jsonify the canonical lists and tag the response with their ETag.
+    Opt-in delta mode: with ?since=<version> (the "version" of a payload the client holds),
+    only the changes against that version are returned, if it is still remembered.
+    Opt-in windowing: with ?window= (see _parse_window) only the first tasks of each list are
+    sent (or diffed), with "windows" giving each list's total and the cursor of its next page.
+    extra: additional top-level keys for the body (e.g. batch results).
+    """
+    if now is None:
+        now = datetime.now()
+    payload, etag = _lists_body(_compiled(now), request.args.get('since'), extra,
+                                _parse_window(request.args.get('window')))
+    with metrics.phase("jsonify"):
+        resp = jsonify(payload)
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
+
+def _lists_body(entry, since=None, extra=None, window=None):
+    """
+    Return (body, etag) for the lists in entry: full, or a delta against since when it is remembered;
+    either cut to window when one is given. removed_expired lists the tasks that expired after since.
+    """
+    payload = _entry_payload(entry, _expired_since(entry.etag, since))
+    etag = payload["version"]
+    _remember_snapshot(etag, payload)
+    base = _snapshot(_etag_workspace(etag), since) if since else None
+    if base is not None:
+        with metrics.phase("delta"):
+            payload = _delta_payload(since, base, payload, window)
+    elif window:
+        payload = _windowed(payload, window)
+    if extra:
+        payload.update(extra)
+    return payload, etag
 
 
 @app.route('/api/tasks')
 def api_tasks():
-    return jsonify(_canonical_lists_and_response())
+    """Canonical lists; answers 304 Not Modified when If-None-Match already carries the current version."""
+    now = datetime.now()
+    etag = _compiled(now).etag
+    if request.if_none_match.contains_weak(etag):
+        resp = app.response_class(status=304)
+        resp.set_etag(etag)
+        resp.headers['Cache-Control'] = 'no-cache'
+        return resp
+    return _lists_response(now)
+
+
+@app.route('/api/tasks/<list_key>')
+def api_tasks_page(list_key):
+    """
+    One page of a compiled list (main_list, awaragardi_list or home_list) for windowed clients:
+    ?cursor= comes from "next" of a windowed response or of the previous page (omit it for the
+    first page), ?limit= caps the page. "offset" is the absolute index of the first item, the
+    index /move's new_index refers to. Pages are cut from the current version: when "version"
+    differs from the one the client holds, refresh what it has (?since= with ?window=).
+    """
+    if list_key not in LIST_KEYS:
+        return jsonify({"status": "error", "reason": "unknown list"}), 404
+    limit = _page_limit(request.args.get('limit'))
+    if limit is None:
+        return jsonify({"status": "error", "reason": "invalid limit"}), 400
+    body, reason = _page_body(_compiled(datetime.now()), list_key, request.args.get('cursor'), limit)
+    if reason:
+        return jsonify({"status": "error", "reason": reason}), 400
+    resp = jsonify(body)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
+
+def _history_json(row):
+    """An archive row as JSON: the task's original id, ISO datetimes."""
+    iso = lambda v: v.isoformat() if v is not None else None  # noqa: E731
+    return {"id": row["task_id"], "title": row["title"], "category": row["category"],
+            "due_datetime": iso(row["due_datetime"]), "part_label": row["part_label"],
+            "is_gym": bool(row["is_gym"]), "in_main": bool(row["in_main"]),
+            "created_at": iso(row["created_at"]), "completed_at": iso(row["completed_at"])}
+
+
+def _history_cursor(value):
+    """Decode a /api/history cursor into storage.get_history's after=; None if malformed."""
+    at, _, archive_id = value.partition(".")
+    try:
+        return records.from_epoch(int(at)), int(archive_id)
+    except ValueError:
+        return None
+
+
+@app.route('/api/history')
+def api_history():
+    """
+    Read-only history of completed tasks (the archive), newest completion first.
+    ?from= / ?to= bound the completion time (ISO date or datetime; from inclusive, to exclusive),
+    ?limit= caps the page and ?cursor= (the previous page's "next") continues it.
+    """
+    bounds = {}
+    for key in ('from', 'to'):
+        raw = request.args.get(key)
+        if raw:
+            bounds[key] = storage.parse_due(raw)
+            if bounds[key] is None:
+                return jsonify({"status": "error", "reason": f"invalid {key}"}), 400
+    limit = _page_limit(request.args.get('limit'))
+    if limit is None:
+        return jsonify({"status": "error", "reason": "invalid limit"}), 400
+    after = None
+    if request.args.get('cursor'):
+        after = _history_cursor(request.args['cursor'])
+        if after is None:
+            return jsonify({"status": "error", "reason": "invalid cursor"}), 400
+    with metrics.phase("load"):
+        rows = storage.get_history(_workspace(), bounds.get('from'), bounds.get('to'), limit + 1, after)
+    last = rows[limit - 1] if len(rows) > limit else None
+    return jsonify({"items": [_history_json(r) for r in rows[:limit]],
+                    "next": f"{records.to_epoch(last['completed_at'])}.{last['id']}" if last else None})
+
+
+def _stream_base(workspace, since):
+    """(version, lists) a stream client of workspace already holds, or (None, None) when unknown."""
+    base = _snapshot(workspace, since) if since else None
+    return (since, base) if base is not None else (None, None)
+
+
+@app.route('/api/stream')
+def api_stream():
+    """
+    Server-Sent Events channel. Sends the canonical lists once on connect (event "tasks")
+    and then only the changes whenever storage publishes one (event "delta"); id = list ETag.
+    Idle connections get a comment heartbeat, which also detects dropped clients.
+    ?window= windows both events like /api/tasks (fixed for the life of the connection).
+    A client that already holds a version (?since=, or Last-Event-ID on reconnect) gets no
+    snapshot: only a delta if that version is outdated (a snapshot if it is not remembered).
+    Writes by other worker processes are picked up within STREAM_POLL seconds.
+    """
+    heartbeat = app.config['STREAM_HEARTBEAT']
+    poll = app.config['STREAM_POLL']
+    workspace = _workspace()
+    window = _parse_window(request.args.get('window'))
+    last_etag, last_payload = _stream_base(workspace, request.headers.get('Last-Event-ID') or request.args.get('since'))
+    sub = events.hub.subscribe()
+
+    def generate():
+        nonlocal last_etag, last_payload
+        removed = []
+        last_sent = time.monotonic()
+        try:
+            while True:
+                now = datetime.now()
+                entry = _compiled(now, workspace)
+                etag = entry.etag
+                if etag != last_etag or removed:
+                    payload = _entry_payload(entry, removed)
+                    # the event's id is a base a reconnecting client resumes from (Last-Event-ID)
+                    _remember_snapshot(etag, payload)
+                    if last_payload is None:
+                        first = _windowed(payload, window) if window else payload
+                        yield f"event: tasks\nid: {etag}\ndata: {json.dumps(first)}\n\n"
+                    else:
+                        delta = _delta_payload(last_etag, last_payload, payload, window)
+                        yield f"event: delta\nid: {etag}\ndata: {json.dumps(delta)}\n\n"
+                    last_etag, last_payload = etag, payload
+                    last_sent = time.monotonic()
+                # wake for the next write, poll, heartbeat, or the moment the Main order changes with time
+                timeout = max(0.0, min(poll, heartbeat - (time.monotonic() - last_sent)))
+                if entry.expires_at is not None:
+                    timeout = max(0.0, min(timeout, (entry.expires_at - datetime.now()).total_seconds()))
+                try:
+                    # coalesce bursts of writes into a single push; writes to other workspaces
+                    # leave this workspace's ETag unchanged and so push nothing
+                    pending = [sub.get(timeout=timeout)] + events.drain(sub)
+                    removed = events.coalesce(pending)["removed_expired"].get(workspace, [])
+                except queue.Empty:
+                    removed = []
+                    if time.monotonic() - last_sent >= heartbeat:
+                        yield ": heartbeat\n\n"
+                        last_sent = time.monotonic()
+        finally:
+            events.hub.unsubscribe(sub)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/cache')
+def api_cache():
+    """Hit/miss counters of the compiled-lists cache (all workspaces)."""
+    return jsonify(_lists_cache.stats())
+
+
+@app.route('/metrics')
+def api_metrics():
+    """Request latency, per-phase and SQL-statement histograms per endpoint, in Prometheus text format."""
+    if not app.config['METRICS']:
+        return jsonify({"status": "error", "reason": "metrics disabled (set TODO_METRICS=1)"}), 404
+    stats = _lists_cache.stats()
+    extra = {
+        "todo_list_cache_hits_total": ("counter", "Compiled-lists cache hits.", stats["hits"]),
+        "todo_list_cache_misses_total": ("counter", "Compiled-lists cache misses.", stats["misses"]),
+        "todo_stream_subscribers": ("gauge", "Open event subscriptions (SSE clients and the scheduler).",
+                                    events.hub.subscriber_count()),
+    }
+    return Response(metrics.render(extra), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/add', methods=['POST'])
@@ -81,44 +680,35 @@ def add_task():
     except Exception:
         return redirect(url_for('index'))
     # default in_main False for newly created tasks (they live in their category bank)
-    storage.add_task(title, category, due_datetime, in_main=False)
+    repeat = request.form.get('repeat')
+    with metrics.phase("write"):
+        if repeat in recurrence.FREQUENCIES:
+            # a repeating task is a template: its first occurrence is due at the given time
+            storage.add_template(title, category, due_datetime, repeat, workspace=_workspace())
+        else:
+            storage.add_task(title, category, due_datetime, in_main=False, workspace=_workspace())
     return redirect(url_for('index'))
 
 
 @app.route('/done/<int:task_id>')
 def mark_done(task_id):
-    storage.mark_done(task_id)
+    with metrics.phase("write"):
+        storage.mark_done(task_id, workspace=_workspace())
     return redirect(url_for('index'))
 
 
 @app.route('/delete/<int:task_id>')
 def delete_task(task_id):
-    storage.delete_task(task_id)
+    with metrics.phase("write"):
+        storage.delete_task(task_id, workspace=_workspace())
     return redirect(url_for('index'))
 
 
-@app.route('/move', methods=['POST'])
-def move_task():
+def _parse_move(data):
     """
-    Server-side enforcement of drag/drop rules:
-
-    - Side -> Main:
-        * allowed. Set in_main=True, locked=False (eligible for reordering).
-        * category remains unchanged.
-    - Side -> Side:
-        * rejected (400).
-    - Main -> Side:
-        * rejected (400).
-    - Main -> Main (reorder inside Main):
-        * allowed. If client indicates locked=True (reorder-as-lock), server sets locked=True and fixed_pos=new_index.
-          Otherwise, if client passes locked=False, server keeps locked=False (no change) but will re-run compile_main to
-          place items (client should pass locked=true when they want to lock at position).
-    Response: canonical lists JSON.
+    Validate a /move body (rules documented on move_task).
+    Returns ((task_id, new_category, new_index, locked, version), None) or (None, (reason, http_status)).
     """
-    data = request.get_json(silent=True)
-    if not data:
-        return jsonify({"status": "error", "reason": "bad json"}), 400
-
     task_id = data.get('task_id')
     new_index = data.get('new_index')
     new_category = data.get('new_category')  # "Main", "Home", "Awaragardi", or None
@@ -127,7 +717,7 @@ def move_task():
     try:
         task_id = int(task_id)
     except Exception:
-        return jsonify({"status": "error", "reason": "invalid task_id"}), 400
+        return None, ("invalid task_id", 400)
 
     # coerce new_index
     idx = None
@@ -138,110 +728,347 @@ def move_task():
                 idx = None
         except Exception:
             idx = None
+    version, reason = _expected_version(data)
+    if reason:
+        return None, (reason, 400)
+    return (task_id, new_category, idx, client_locked, version), None
+
+
+def _expected_version(data):
+    """
+    The task version a write body was based on ("version", optional: the task's "version"
+    in the lists). Returns (version or None, None) or (None, reason).
+    """
+    version = data.get('version')
+    if version is None:
+        return None, None
+    if isinstance(version, bool) or not isinstance(version, int):
+        return None, "invalid version"
+    return version, None
 
-    current = storage.get_task(task_id)
-    if not current:
-        return jsonify({"status": "error", "reason": "task not found"}), 404
 
-    src_in_main = bool(current.get("in_main"))
-    src_cat = current.get("category")
+def _move_changes(current, new_category, idx, client_locked):
+    """
+    Decide the writes for moving task current.
+    Returns (changes, None), changes being ("update", kwargs) / ("lock", kwargs) steps for
+    storage.update_task / storage.set_locked in order, or (None, (reason, http_status)).
+    """
+    src_in_main = bool(current.in_main)
 
     # Side -> Side (both not in main): reject
     if not src_in_main and new_category and new_category != "Main":
         # moving from a side bank to another side bank
-        return jsonify({"status": "error", "reason": "cannot move directly between side banks"}), 400
+        return None, ("cannot move directly between side banks", 400)
 
     # Main -> Side: reject (once in main, cannot go back)
     if src_in_main and new_category and new_category != "Main":
-        return jsonify({"status": "error", "reason": "cannot move tasks out of Main back to side banks"}), 400
+        return None, ("cannot move tasks out of Main back to side banks", 400)
 
+    changes = []
     # Moving into Main
     if new_category == "Main":
         if not src_in_main:
             # side -> main: mark in_main true, ensure unlocked
-            storage.update_task(task_id, in_main=True)
-            storage.set_locked(task_id, False, fixed_pos=None)
+            changes.append(("update", {"in_main": True}))
+            changes.append(("lock", {"locked": False, "fixed_pos": None}))
         else:
             # already in main and reordering within main
             # If client requests lock (client_locked==True), set locked True at position idx
             if client_locked:
-                storage.set_locked(task_id, True, fixed_pos=idx)
+                changes.append(("lock", {"locked": True, "fixed_pos": idx}))
             else:
                 # client didn't ask to lock - ensure it's not locked
-                storage.set_locked(task_id, False, fixed_pos=None)
-    else:
-        # new_category is None or a side - handled above, but ensure safe default
-        pass
+                changes.append(("lock", {"locked": False, "fixed_pos": None}))
+    # new_category None: nothing to change
+    return changes, None
 
-    return jsonify(_canonical_lists_and_response())
 
+def _apply_move(data, s):
+    """
+    Apply one /move request body inside unit of work s.
+    Returns None on success or (reason, http_status) when the move is rejected; raises
+    storage.Conflict if the body's "version" is not the task's.
+    """
+    args, err = _parse_move(data)
+    if err:
+        return err
+    task_id, new_category, idx, client_locked, version = args
+    ws = _workspace()
+    current = storage.get_task(task_id, workspace=ws, session=s)
+    if not current:
+        return "task not found", 404
+    changes, err = _move_changes(current, new_category, idx, client_locked)
+    if err:
+        return err
+    # the first write compares-and-swaps on the client's version; the rest follow it in this transaction
+    for kind, kwargs in changes:
+        if kind == "update":
+            storage.update_task(task_id, workspace=ws, session=s, expected_version=version, **kwargs)
+        else:
+            storage.set_locked(task_id, workspace=ws, session=s, expected_version=version, **kwargs)
+        version = None
+    return None
 
-@app.route('/update/<int:task_id>', methods=['POST'])
-def update_task(task_id):
-    data = request.get_json(silent=True)
-    if not data:
-        return jsonify({"status": "error", "reason": "bad json"}), 400
 
+def _update_fields(data):
+    """Validate an /update request body. Returns (fields, None) or (None, reason)."""
     fields = {}
     if 'due_datetime' in data and data['due_datetime']:
-        raw = data['due_datetime']
-        parsed = None
-        # Try Python 3.7+ fromisoformat (accepts 'YYYY-MM-DDTHH:MM:SS' and 'YYYY-MM-DDTHH:MM')
-        try:
-            parsed = datetime.fromisoformat(raw)
-        except Exception:
-            # Fallbacks: 'YYYY-MM-DD HH:MM' or 'YYYY-MM-DDTHH:MM'
-            from datetime import datetime as _dt
-            for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M"):
-                try:
-                    parsed = _dt.strptime(raw, fmt)
-                    break
-                except Exception:
-                    parsed = None
+        parsed = storage.parse_due(data['due_datetime'])
         if not parsed:
-            return jsonify({"status": "error", "reason": "invalid due_datetime"}), 400
+            return None, "invalid due_datetime"
         fields['due_datetime'] = parsed
 
-
     # allow title/category/part_label/is_gym/is_done/in_main/fixed_pos/locked
     for k in ("title", "category", "part_label", "is_gym", "is_done", "fixed_pos", "locked", "in_main"):
         if k in data:
             fields[k] = data[k]
+    return fields, None
 
-    updated = storage.update_task(task_id, **fields)
+
+@app.route('/move', methods=['POST'])
+def move_task():
+    """
+    Server-side enforcement of drag/drop rules:
+
+    - Side -> Main:
+        * allowed. Set in_main=True, locked=False (eligible for reordering).
+        * category remains unchanged.
+    - Side -> Side:
+        * rejected (400).
+    - Main -> Side:
+        * rejected (400).
+    - Main -> Main (reorder inside Main):
+        * allowed. If client indicates locked=True (reorder-as-lock), server sets locked=True and fixed_pos=new_index.
+          Otherwise, if client passes locked=False, server keeps locked=False (no change) but will re-run compile_main to
+          place items (client should pass locked=true when they want to lock at position).
+    Optional "version": the task's version as the client saw it. If the task has changed since
+    (another tab or worker wrote it), nothing is applied and the answer is 409 (see _conflict).
+    Response: canonical lists JSON.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"status": "error", "reason": "bad json"}), 400
+
+    # read, decide and write in one transaction
+    with metrics.phase("write"), storage.unit_of_work() as s:
+        err = _apply_move(data, s)
+    if err:
+        reason, status = err
+        return jsonify({"status": "error", "reason": reason}), status
+
+    return _lists_response()
+
+
+@app.route('/update/<int:task_id>', methods=['POST'])
+def update_task(task_id):
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"status": "error", "reason": "bad json"}), 400
+
+    fields, reason = _update_fields(data)
+    if not reason:
+        version, reason = _expected_version(data)
+    if reason:
+        return jsonify({"status": "error", "reason": reason}), 400
+
+    # with "version", a compare-and-swap like /move
+    with metrics.phase("write"):
+        updated = storage.update_task(task_id, workspace=_workspace(), expected_version=version, **fields)
     if not updated:
         return jsonify({"status": "error", "reason": "not found"}), 404
 
-    return jsonify(_canonical_lists_and_response())
+    return _lists_response()
 
 
 @app.route('/split/<int:task_id>', methods=['POST'])
 def split_task(task_id):
-    orig = storage.get_task(task_id)
-    if not orig:
-        return jsonify({"status": "error", "reason": "not found"}), 404
+    ws = _workspace()
+    with metrics.phase("write"), storage.unit_of_work() as s:
+        orig = storage.get_task(task_id, workspace=ws, session=s)
+        if not orig:
+            return jsonify({"status": "error", "reason": "not found"}), 404
 
-    new_title = orig["title"]
-    new_category = orig["category"]
-    new_due = orig["due_datetime"]
-    new_part = None
+        new_title = orig.title
+        new_category = orig.category
+        new_due = orig.due_datetime
+        new_part = None
 
-    if orig.get("part_label"):
-        try:
-            base, num = orig["part_label"].rsplit(" ", 1)
-            num = int(num)
-            new_part = f"{base} {num + 1}"
-        except Exception:
-            new_part = orig["part_label"] + " (copy)"
+        if orig.part_label:
+            try:
+                base, num = orig.part_label.rsplit(" ", 1)
+                num = int(num)
+                new_part = f"{base} {num + 1}"
+            except Exception:
+                new_part = orig.part_label + " (copy)"
+        else:
+            storage.update_task(task_id, workspace=ws, part_label="Part 1", session=s)
+            new_part = "Part 2"
+
+        # duplicate inherits in_main state (so copy appears where expected)
+        storage.add_task(new_title, new_category, new_due, part_label=new_part, is_gym=orig.is_gym,
+                         in_main=bool(orig.in_main), workspace=ws, session=s)
+
+    return _lists_response()
+
+
+def _template_json(tpl):
+    return {"id": tpl.id, "title": tpl.title, "category": tpl.category, "part_label": tpl.part_label,
+            "is_gym": tpl.is_gym, "in_main": tpl.in_main, "freq": tpl.freq, "interval": tpl.interval,
+            "start": records.iso(tpl.start), "until": records.iso(tpl.until), "created_at": records.iso(tpl.created)}
+
+
+def _template_fields(data):
+    """Validate a /api/templates body. Returns (fields, None) or (None, reason)."""
+    title, category = data.get('title'), data.get('category')
+    if not (title and category in logic.CATEGORY_RANK):
+        return None, "template needs a title and a known category"
+    start = storage.parse_due(data['start']) if data.get('start') else None
+    if not start:
+        return None, "invalid start"
+    until = None
+    if data.get('until'):
+        until = storage.parse_due(data['until'])
+        if not until or until < start:
+            return None, "invalid until"
+    freq, interval = data.get('freq'), data.get('interval', 1)
+    if freq not in recurrence.FREQUENCIES:
+        return None, f"freq must be one of {', '.join(recurrence.FREQUENCIES)}"
+    if not isinstance(interval, int) or isinstance(interval, bool) or interval < 1:
+        return None, "invalid interval"
+    return {"title": title, "category": category, "start": start, "freq": freq, "interval": interval,
+            "until": until, "part_label": data.get('part_label'), "is_gym": bool(data.get('is_gym', False)),
+            "in_main": bool(data.get('in_main', False))}, None
+
+
+@app.route('/api/templates', methods=['GET', 'POST'])
+def api_templates():
+    """
+    Recurring tasks. GET lists the workspace's templates. POST creates one:
+    {"title", "category", "start" (first due), "freq": "daily"|"weekly"|"monthly",
+     "interval" (default 1), "until" (optional last due), "part_label", "is_gym", "in_main"}
+    and answers with the canonical lists plus "template_id". Occurrences show up in the lists
+    for the next recurrence.LOOKAHEAD_DAYS days under generated ids, and become ordinary tasks
+    once edited, moved, locked, done or deleted through those ids.
+    """
+    if request.method == 'GET':
+        return jsonify({"templates": [_template_json(t) for t in storage.get_templates(_workspace())]})
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"status": "error", "reason": "bad json"}), 400
+    fields, reason = _template_fields(data)
+    if reason:
+        return jsonify({"status": "error", "reason": reason}), 400
+    with metrics.phase("write"):
+        template_id = storage.add_template(workspace=_workspace(), **fields)
+    return _lists_response(extra={"template_id": template_id})
+
+
+@app.route('/api/templates/<int:template_id>', methods=['DELETE'])
+def delete_template(template_id):
+    """Stop a recurring task: its generated occurrences disappear, materialized ones stay."""
+    with metrics.phase("write"):
+        if not storage.delete_template(template_id, workspace=_workspace()):
+            return jsonify({"status": "error", "reason": "not found"}), 404
+    return _lists_response()
+
+
+class _BatchError(Exception):
+    """Raised inside /api/batch to roll the whole batch back."""
+
+    def __init__(self, index, reason, status=400):
+        super().__init__(reason)
+        self.index, self.reason, self.status = index, reason, status
+
+
+def _apply_batch_op(i, op, s):
+    """Apply operation i of a batch inside unit of work s; returns its result entry."""
+    kind = op.get('op')
+    ws = _workspace()
+    if kind == 'add':
+        title, category = op.get('title'), op.get('category')
+        due = storage.parse_due(op['due_datetime']) if op.get('due_datetime') else None
+        if not (title and category and due):
+            raise _BatchError(i, "add needs title, category and a valid due_datetime")
+        new_id = storage.add_task(title, category, due, part_label=op.get('part_label'),
+                                  is_gym=bool(op.get('is_gym', False)), in_main=bool(op.get('in_main', False)),
+                                  workspace=ws, session=s)
+        return {"op": kind, "task_id": new_id}
+    if kind == 'move':
+        err = _apply_move(op, s)
+        if err:
+            raise _BatchError(i, *err)
+        return {"op": kind, "task_id": op.get('task_id')}
+    if kind not in ('update', 'lock', 'done', 'delete'):
+        raise _BatchError(i, f"unknown op {kind!r}")
+
+    try:
+        task_id = int(op.get('task_id'))
+    except Exception:
+        raise _BatchError(i, "invalid task_id")
+    version, reason = _expected_version(op)
+    if reason:
+        raise _BatchError(i, reason)
+    if kind == 'update':
+        fields, reason = _update_fields(op)
+        if reason:
+            raise _BatchError(i, reason)
+        ok = storage.update_task(task_id, workspace=ws, session=s, expected_version=version, **fields)
+    elif kind == 'lock':
+        fixed_pos = op.get('fixed_pos')
+        ok = storage.set_locked(task_id, bool(op.get('locked', True)),
+                                fixed_pos=fixed_pos if isinstance(fixed_pos, int) else None,
+                                workspace=ws, session=s, expected_version=version)
+    elif kind == 'done':
+        ok = storage.mark_done(task_id, workspace=ws, session=s)
     else:
-        storage.update_task(task_id, part_label="Part 1")
-        new_part = "Part 2"
+        ok = storage.delete_task(task_id, workspace=ws, session=s)
+    if not ok:
+        raise _BatchError(i, "task not found", 404)
+    return {"op": kind, "task_id": task_id}
 
-    # duplicate inherits in_main state (so copy appears where expected)
-    storage.add_task(new_title, new_category, new_due, part_label=new_part, is_gym=orig.get("is_gym", False), in_main=bool(orig.get("in_main")))
 
-    return jsonify(_canonical_lists_and_response())
+@app.route('/api/batch', methods=['POST'])
+def batch():
+    """
+    Apply an ordered list of operations in one transaction and answer with one recompiled
+    canonical response (plus "results", one entry per op, e.g. the ids of added tasks).
+
+    Body: {"ops": [{"op": "add", "title", "category", "due_datetime", ...},
+                   {"op": "update", "task_id", <same fields as /update>},
+                   {"op": "move", <same body as /move>},
+                   {"op": "lock", "task_id", "locked", "fixed_pos"},
+                   {"op": "done", "task_id"}, {"op": "delete", "task_id"}]}
+
+    Each op sees the effects of the ones before it. If any op is rejected (same rules as
+    /move and /update), nothing is applied and the error names the failing op_index;
+    update, lock and move ops may carry a task "version", and a stale one makes it a 409.
+    """
+    data = request.get_json(silent=True)
+    ops = data.get('ops') if isinstance(data, dict) else None
+    if not isinstance(ops, list) or not all(isinstance(op, dict) for op in ops):
+        return jsonify({"status": "error", "reason": "bad json"}), 400
+    if len(ops) > app.config['BATCH_MAX_OPS']:
+        return jsonify({"status": "error", "reason": "too many ops"}), 413
+
+    results = []
+    try:
+        with metrics.phase("write"), storage.unit_of_work() as s:
+            for i, op in enumerate(ops):
+                results.append(_apply_batch_op(i, op, s))
+    except _BatchError as e:
+        return jsonify({"status": "error", "reason": e.reason, "op_index": e.index}), e.status
+    except storage.Conflict as e:
+        # the 409 of a single write (current task and lists), naming the stale op
+        current = storage.get_task(e.task_id, workspace=_workspace())
+        resp = _lists_response(extra={**_conflict_body(e.task_id, current), "op_index": i})
+        resp.status_code = 409
+        return resp
+
+    return _lists_response(extra={"results": results})
 
 
 if __name__ == '__main__':
+    # the dev server brings the schema up to date itself; production workers expect `python models.py` first
+    storage.migrate()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,320 @@
+# asgi.py
+"""
+Async serving mode:
+
+    uvicorn asgi:app --workers 1
+
+The push channel and the hot JSON routes are served by coroutines on astorage, so an
+idle SSE client or a slow reader costs a task instead of a worker thread:
+
+    GET /api/tasks, GET /api/tasks/<list>, GET /api/stream, POST /move, POST /update/<id>
+
+Bodies, ETags, ?since= deltas, workspace scoping and status codes match the Flask views
+(the two share app.py's helpers and list cache). Every other route is the Flask app
+itself, run in a thread pool through asgiref. The sync path (python app.py / any WSGI
+server) is unchanged.
+"""
+import asyncio
+import json
+import re
+import sqlite3
+import time
+from datetime import datetime
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy.exc import OperationalError
+from werkzeug.http import parse_etags
+
+import app as web
+import astorage
+import events
+import expiry
+import models
+import storage
+
+_flask = WsgiToAsgi(web.app)
+_UPDATE_PATH = re.compile(r"^/update/(\d+)$")
+_PAGE_PATH = re.compile(r"^/api/tasks/([^/]+)$")
+
+
+class _Request:
+    """The parts of an ASGI http scope the handlers need."""
+    __slots__ = ("scope", "receive", "query", "headers")
+
+    def __init__(self, scope, receive):
+        self.scope = scope
+        self.receive = receive
+        self.query = {k: v[-1] for k, v in parse_qs(scope.get("query_string", b"").decode("latin-1")).items()}
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", ())}
+
+    def cookie(self, name):
+        morsel = SimpleCookie(self.headers.get("cookie", "")).get(name)
+        return morsel.value if morsel else None
+
+    async def json(self):
+        """The body parsed as JSON, or None (like request.get_json(silent=True))."""
+        content_type = self.headers.get("content-type", "").split(";")[0].strip()
+        if not (content_type == "application/json" or content_type.endswith("+json")):
+            return None
+        chunks = []
+        while True:
+            message = await self.receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        try:
+            return json.loads(b"".join(chunks))
+        except ValueError:
+            return None
+
+
+def _dumps(payload) -> bytes:
+    # the Flask app's JSON provider, compact like jsonify, so both paths send identical bytes
+    return (web.app.json.dumps(payload, separators=(",", ":")) + "\n").encode()
+
+
+async def _respond(send, status, body=b"", headers=(), content_type="application/json"):
+    head = [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())]
+    head += [(k.encode(), v.encode()) for k, v in headers]
+    await send({"type": "http.response.start", "status": status, "headers": head})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _error(send, reason, status):
+    await _respond(send, status, _dumps({"status": "error", "reason": reason}))
+
+
+async def _compiled(workspace, now):
+    """
+    Async app._compiled: the cached entry, or one built from concurrent async queries.
+    Nothing here blocks the event loop: the data version read (which may wait out a
+    writer's lock) and the CPU-bound compile run in worker threads; the cache lookup only
+    takes the cache's dict lock, which builds never hold.
+    """
+    version = await asyncio.to_thread(storage.data_version, workspace)
+    entry = web._lists_cache.lookup(workspace, version, now)
+    if entry is None:
+        main_input, awaragardi_list, home_list, templates, claimed = await asyncio.gather(
+            astorage.get_main_tasks(workspace),
+            astorage.get_side_tasks("Awaragardi", workspace, now),
+            astorage.get_side_tasks("Home", workspace, now),
+            astorage.get_templates(workspace, now),
+            astorage.get_claims(workspace, now),
+        )
+        entry = await asyncio.to_thread(web._assemble_lists, workspace, version, now, main_input, awaragardi_list,
+                                        home_list, templates, claimed)
+        web._lists_cache.store(workspace, entry)
+    return entry
+
+
+async def _lists_response(send, req, workspace, extra=None, status=200):
+    entry = await _compiled(workspace, datetime.now())
+    payload, etag = web._lists_body(entry, req.query.get("since"), extra,
+                                    web._parse_window(req.query.get("window")))
+    await _respond(send, status, _dumps(payload), [("ETag", f'"{etag}"'), ("Cache-Control", "no-cache")])
+
+
+async def _conflict(send, req, workspace, e):
+    """app._conflict: 409 with the task as it is now and the current lists."""
+    current = await astorage.get_task(e.task_id, workspace=workspace)
+    await _lists_response(send, req, workspace, web._conflict_body(e.task_id, current), status=409)
+
+
+async def api_tasks(req, send, workspace):
+    entry = await _compiled(workspace, datetime.now())
+    if parse_etags(req.headers.get("if-none-match")).contains_weak(entry.etag):
+        await send({"type": "http.response.start", "status": 304,
+                    "headers": [(b"etag", f'"{entry.etag}"'.encode()), (b"cache-control", b"no-cache")]})
+        await send({"type": "http.response.body", "body": b""})
+        return
+    await _lists_response(send, req, workspace)
+
+
+async def api_tasks_page(req, send, workspace, list_key):
+    """Async app.api_tasks_page."""
+    if list_key not in web.LIST_KEYS:
+        return await _error(send, "unknown list", 404)
+    limit = web._page_limit(req.query.get("limit"))
+    if limit is None:
+        return await _error(send, "invalid limit", 400)
+    entry = await _compiled(workspace, datetime.now())
+    body, reason = web._page_body(entry, list_key, req.query.get("cursor"), limit)
+    if reason:
+        return await _error(send, reason, 400)
+    await _respond(send, 200, _dumps(body), [("Cache-Control", "no-cache")])
+
+
+async def api_stream(req, send, workspace):
+    """Async /api/stream: same events as the Flask generator, one coroutine per client."""
+    # fail (e.g. no schema) while an error status can still be sent; the entry stays cached for the first event
+    await _compiled(workspace, datetime.now())
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"text/event-stream; charset=utf-8"), (b"cache-control", b"no-cache"),
+                            (b"x-accel-buffering", b"no")]})
+
+    async def disconnected():
+        while (await req.receive())["type"] != "http.disconnect":
+            pass
+
+    window = web._parse_window(req.query.get("window"))
+    since = req.headers.get("last-event-id") or req.query.get("since")
+    # servers may silently drop writes to a closed connection: stop when the client leaves
+    stream = asyncio.ensure_future(_stream_events(send, workspace, window, since))
+    watcher = asyncio.ensure_future(disconnected())
+    try:
+        await asyncio.wait({stream, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stream.cancel()
+        watcher.cancel()
+
+
+async def _stream_events(send, workspace, window=None, since=None):
+    heartbeat = web.app.config['STREAM_HEARTBEAT']
+    poll = web.app.config['STREAM_POLL']
+    sub = events.hub.subscribe_async()
+
+    async def emit(text):
+        await send({"type": "http.response.body", "body": text.encode(), "more_body": True})
+
+    last_etag, last_payload = web._stream_base(workspace, since)
+    removed = []
+    last_sent = time.monotonic()
+    try:
+        while True:
+            entry = await _compiled(workspace, datetime.now())
+            etag = entry.etag
+            if etag != last_etag or removed:
+                payload = web._entry_payload(entry, removed)
+                web._remember_snapshot(etag, payload)
+                if last_payload is None:
+                    first = web._windowed(payload, window) if window else payload
+                    await emit(f"event: tasks\nid: {etag}\ndata: {json.dumps(first)}\n\n")
+                else:
+                    delta = web._delta_payload(last_etag, last_payload, payload, window)
+                    await emit(f"event: delta\nid: {etag}\ndata: {json.dumps(delta)}\n\n")
+                last_etag, last_payload = etag, payload
+                last_sent = time.monotonic()
+            timeout = max(0.0, min(poll, heartbeat - (time.monotonic() - last_sent)))
+            if entry.expires_at is not None:
+                timeout = max(0.0, min(timeout, (entry.expires_at - datetime.now()).total_seconds()))
+            try:
+                pending = [await sub.get(timeout)] + sub.drain()
+                removed = events.coalesce(pending)["removed_expired"].get(workspace, [])
+            except asyncio.TimeoutError:
+                removed = []
+                if time.monotonic() - last_sent >= heartbeat:
+                    await emit(": heartbeat\n\n")
+                    last_sent = time.monotonic()
+    except OSError:
+        pass  # client went away while we were sending
+    finally:
+        events.hub.unsubscribe(sub)
+
+
+async def _apply_move(data, workspace, s):
+    """Async app._apply_move (same rules, via app._parse_move/_move_changes)."""
+    args, err = web._parse_move(data)
+    if err:
+        return err
+    task_id, new_category, idx, client_locked, version = args
+    current = await astorage.get_task(task_id, workspace=workspace, session=s)
+    if not current:
+        return "task not found", 404
+    changes, err = web._move_changes(current, new_category, idx, client_locked)
+    if err:
+        return err
+    for kind, kwargs in changes:
+        if kind == "update":
+            await astorage.update_task(task_id, workspace=workspace, session=s, expected_version=version, **kwargs)
+        else:
+            await astorage.set_locked(task_id, workspace=workspace, session=s, expected_version=version, **kwargs)
+        version = None
+    return None
+
+
+async def move_task(req, send, workspace):
+    data = await req.json()
+    if not data:
+        return await _error(send, "bad json", 400)
+    try:
+        async with astorage.unit_of_work() as s:
+            err = await _apply_move(data, workspace, s)
+    except storage.Conflict as e:
+        return await _conflict(send, req, workspace, e)
+    if err:
+        return await _error(send, *err)
+    await _lists_response(send, req, workspace)
+
+
+async def update_task(req, send, workspace, task_id):
+    data = await req.json()
+    if not data:
+        return await _error(send, "bad json", 400)
+    fields, reason = web._update_fields(data)
+    if not reason:
+        version, reason = web._expected_version(data)
+    if reason:
+        return await _error(send, reason, 400)
+    try:
+        updated = await astorage.update_task(task_id, workspace=workspace, expected_version=version, **fields)
+    except storage.Conflict as e:
+        return await _conflict(send, req, workspace, e)
+    if not updated:
+        return await _error(send, "not found", 404)
+    await _lists_response(send, req, workspace)
+
+
+def _route(method, path):
+    """(handler, extra args) for the async routes, or None to hand the request to Flask."""
+    if path == "/api/tasks" and method == "GET":
+        return api_tasks, ()
+    if path == "/api/stream" and method == "GET":
+        return api_stream, ()
+    m = _PAGE_PATH.match(path)
+    if m and method == "GET":
+        return api_tasks_page, (m.group(1),)
+    if path == "/move" and method == "POST":
+        return move_task, ()
+    m = _UPDATE_PATH.match(path)
+    if m and method == "POST":
+        return update_task, (int(m.group(1)),)
+    return None
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            expiry.scheduler.start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            expiry.scheduler.stop()
+            await astorage.dispose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    route = _route(scope.get("method"), scope.get("path", "")) if scope["type"] == "http" else None
+    if route is None:
+        return await _flask(scope, receive, send)
+    handler, args = route
+    # servers without lifespan support: start on first use like the Flask hook does
+    expiry.scheduler.start()
+    req = _Request(scope, receive)
+    workspace = web._pick_workspace(req.query.get("workspace"), req.headers.get("x-workspace"),
+                                    req.cookie("workspace"))
+    if workspace is None:
+        return await _error(send, "invalid workspace", 400)
+    try:
+        await handler(req, send, workspace, *args)
+    except (OperationalError, sqlite3.OperationalError) as e:
+        # app._database_error for the async routes: name the fix instead of a bare 500
+        if "no such table" not in str(e):
+            raise
+        web.app.logger.error("database %s has no schema: run `python models.py` first", models.DB_URL)
+        await _error(send, "database not initialized", 503)
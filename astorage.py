@@ -0,0 +1,238 @@
+# astorage.py
+"""
+Async counterparts of the storage.py task functions, on the aiosqlite driver (used by asgi.py).
+
+Same database, queries, workspace scoping and change notifications as storage.py: writes
+advance the stored data versions and publish on events.hub after commit, so the sync app,
+the expiry scheduler and async clients all see one another's changes.
+"""
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm.exc import StaleDataError
+
+import models
+import storage
+from models import Task, TaskTemplate, TemplateOccurrence
+from records import TaskRecord
+from recurrence import Template, split_id
+from storage import DEFAULT_WORKSPACE, _note_write, _records, _row_to_record
+
+# The async (engine, write engine), created on first use like models.get_engine
+_engines = None
+
+
+def _get_engines():
+    global _engines
+    if _engines is None:
+        engine = create_async_engine(
+            models.async_url(), echo=False,
+            connect_args={"timeout": models.BUSY_TIMEOUT},
+            pool_size=10, max_overflow=20, pool_timeout=models.BUSY_TIMEOUT,
+        )
+        # same pragmas and BEGIN handling as the sync engine (WAL, busy timeout, BEGIN IMMEDIATE for writers)
+        event.listen(engine.sync_engine, "connect", models._sqlite_on_connect)
+        event.listen(engine.sync_engine, "begin", models._sqlite_on_begin)
+        _engines = engine, engine.execution_options(sqlite_begin="IMMEDIATE")
+    return _engines
+
+
+_sessions = async_sessionmaker(expire_on_commit=False)
+
+
+def Session():
+    return _sessions(bind=_get_engines()[0])
+
+
+def WriteSession():
+    return _sessions(bind=_get_engines()[1])
+
+
+async def dispose() -> None:
+    """Close the async engine's connections (if it was ever created)."""
+    global _engines
+    if _engines is not None:
+        await _engines[0].dispose()
+        _engines = None
+
+
+@asynccontextmanager
+async def unit_of_work():
+    """
+    Async storage.unit_of_work:
+
+        async with astorage.unit_of_work() as s:
+            task = await astorage.get_task(task_id, workspace=ws, session=s)
+            await astorage.update_task(task_id, workspace=ws, in_main=True, session=s)
+    """
+    s = WriteSession()
+    changes = s.info.setdefault("changes", {"workspaces": set(), "removed": {}, "due": []})
+    version = None
+    try:
+        yield s
+        if changes["workspaces"]:
+            await s.execute(storage._advance_versions_stmt(changes["workspaces"]))
+            version = (await s.execute(storage._latest_version_stmt(changes["workspaces"]))).scalar()
+        await s.commit()
+    except Exception:
+        await s.rollback()
+        raise
+    finally:
+        await s.close()
+    if version is not None:
+        storage._publish(version, changes["workspaces"], changes["removed"], changes["due"])
+
+
+@asynccontextmanager
+async def _writing(session=None):
+    if session is not None:
+        yield session
+    else:
+        async with unit_of_work() as s:
+            yield s
+
+
+@asynccontextmanager
+async def _reading(session=None):
+    if session is not None:
+        yield session
+        return
+    async with Session() as s:
+        yield s
+
+
+async def _get_row(s, task_id: int, workspace: str, materialize: bool = False) -> Optional[Task]:
+    """storage._get_row (generated occurrence ids included)."""
+    occ = split_id(task_id)
+    if occ is not None:
+        return await _occurrence_row(s, occ, workspace, materialize)
+    row = await s.get(Task, task_id)
+    if row is None or row.workspace != workspace:
+        return None
+    return row
+
+
+async def _occurrence_row(s, occ: Tuple[int, int], workspace: str, materialize: bool) -> Optional[Task]:
+    claim = await s.get(TemplateOccurrence, occ)
+    if claim is not None:
+        return await _get_row(s, claim.task_id, workspace) if claim.task_id is not None else None
+    tpl = await s.get(TaskTemplate, occ[0])
+    row = storage._occurrence_task(tpl, occ, workspace)
+    if row is None or not materialize:
+        return storage._unsaved(row, occ)
+    s.add(row)
+    await s.flush()
+    s.add(storage._claim(row, occ))
+    await s.flush()
+    return row
+
+
+async def _cas_row(s, task_id: int, workspace: str, expected_version: Optional[int]) -> Optional[Task]:
+    """storage._cas_row."""
+    if expected_version is not None:
+        storage._check_version(await _get_row(s, task_id, workspace), task_id, expected_version)
+    return await _get_row(s, task_id, workspace, materialize=True)
+
+
+async def _cas_flush(s, task_id: int) -> None:
+    try:
+        await s.flush()
+    except StaleDataError:
+        raise storage.Conflict(task_id) from None
+
+
+async def add_task(title: str, category: str, due_datetime: datetime,
+                   part_label: Optional[str] = None, is_gym: bool = False, in_main: bool = False,
+                   workspace: str = DEFAULT_WORKSPACE, session=None) -> int:
+    """Create a task and return its new id."""
+    async with _writing(session) as s:
+        t = Task(workspace=workspace, title=title, category=category, due_datetime=due_datetime,
+                 part_label=part_label, is_gym=is_gym, in_main=in_main, locked=False, is_done=False)
+        s.add(t)
+        await s.flush()
+        _note_write(s, workspace, due=[due_datetime])
+        return t.id
+
+
+async def get_task(task_id: int, workspace: str = DEFAULT_WORKSPACE, session=None) -> Optional[TaskRecord]:
+    """Return a task record or None if not found (in this workspace)."""
+    async with _reading(session) as s:
+        row = await _get_row(s, task_id, workspace)
+        return _row_to_record(row) if row else None
+
+
+async def get_main_tasks(workspace: str = DEFAULT_WORKSPACE) -> List[TaskRecord]:
+    """Open tasks that belong in Main (see storage.get_main_tasks)."""
+    async with _reading() as s:
+        return _records(await s.execute(storage._main_tasks_stmt(workspace)))
+
+
+async def get_side_tasks(category: str, workspace: str = DEFAULT_WORKSPACE,
+                         now: Optional[datetime] = None) -> List[TaskRecord]:
+    """Open tasks sitting in a side bank, not yet due (see storage.get_side_tasks)."""
+    async with _reading() as s:
+        return _records(await s.execute(storage._side_tasks_stmt(category, workspace, now or datetime.now())))
+
+
+async def get_templates(workspace: str = DEFAULT_WORKSPACE, now: Optional[datetime] = None) -> List[Template]:
+    """A workspace's templates (see storage.get_templates)."""
+    async with _reading() as s:
+        return [Template(*row) for row in await s.execute(storage._templates_stmt(workspace, now))]
+
+
+async def get_claims(workspace: str = DEFAULT_WORKSPACE, now: Optional[datetime] = None) -> Set[Tuple[int, int]]:
+    """Claimed occurrences still ahead (see storage.get_claims)."""
+    async with _reading() as s:
+        return {(tid, n) for tid, n in await s.execute(storage._claims_stmt(workspace, now or datetime.now()))}
+
+
+async def update_task(task_id: int, workspace: str = DEFAULT_WORKSPACE, session=None,
+                      expected_version: Optional[int] = None, **fields) -> bool:
+    """
+    Update fields on a task (storage.UPDATABLE_FIELDS; is_done=True archives it); False if not found.
+    expected_version: compare-and-swap, raising storage.Conflict (see storage.update_task).
+    """
+    async with _writing(session) as s:
+        row = await _cas_row(s, task_id, workspace, expected_version)
+        if not row:
+            return False
+        storage._apply_update(row, fields)
+        if row.is_done:
+            s.add(storage._archived(row, datetime.now()))
+            await s.delete(row)
+        if row.is_done or expected_version is not None:
+            await _cas_flush(s, task_id)
+        _note_write(s, workspace, due=[row.due_datetime])
+    return True
+
+
+async def set_locked(task_id: int, locked: bool, fixed_pos: Optional[int] = None,
+                     workspace: str = DEFAULT_WORKSPACE, session=None, expected_version: Optional[int] = None) -> bool:
+    """Mark a task locked/unlocked (see storage.set_locked)."""
+    async with _writing(session) as s:
+        row = await _cas_row(s, task_id, workspace, expected_version)
+        if not row:
+            return False
+        storage._apply_lock(row, locked, fixed_pos)
+        if expected_version is not None:
+            await _cas_flush(s, task_id)
+        _note_write(s, workspace)
+    return True
+
+
+async def mark_done(task_id: int, workspace: str = DEFAULT_WORKSPACE, session=None) -> bool:
+    return await update_task(task_id, workspace=workspace, session=session, is_done=True)
+
+
+async def delete_task(task_id: int, workspace: str = DEFAULT_WORKSPACE, session=None) -> bool:
+    """Delete a task row; returns True if deleted."""
+    async with _writing(session) as s:
+        row = await _get_row(s, task_id, workspace, materialize=True)
+        if not row:
+            return False
+        await s.delete(row)
+        _note_write(s, workspace)
+    return True
@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+"""Performance benchmarks. Run modules with `python -m benchmarks.<name>` from the repo root."""
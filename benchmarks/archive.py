@@ -0,0 +1,91 @@
+# benchmarks/archive.py
+"""
+Cost of completed-task history on the live list queries, before and after compaction.
+
+    python -m benchmarks.archive                              # 5k open tasks, 200k done
+    python -m benchmarks.archive --open 10000 --done 1000000 --out archive.json
+
+Seeds a scratch database (TODO_DB_URL) with open tasks plus a large history of tasks
+marked done in the live table (how completions piled up before the archive), times the
+three canonical list queries and a full get_all_tasks scan, runs storage.archive_done,
+and times them again. Also times a one-month /api/history page over the archive.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict
+
+from benchmarks.results import write_results
+from benchmarks.synth import Mix, generate_tasks, task_rows
+
+
+def _best(fn: Callable[[], Any], repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(n_open: int, n_done: int, repeat: int, seed: int = 0) -> Dict[str, Any]:
+    import storage
+
+    storage.migrate()
+    rng = random.Random(seed)
+    now = datetime.now()
+    storage.bulk_insert(task_rows(generate_tasks(rng, n_open, now, Mix(expired=0.0, done=0.0))))
+    for start in range(0, n_done, 50000):
+        storage.bulk_insert(task_rows(generate_tasks(rng, min(50000, n_done - start), now, Mix(expired=0.0, done=1.0))))
+
+    cases = {
+        "lists": lambda: (storage.get_main_tasks(), storage.get_side_tasks("Home"),
+                          storage.get_side_tasks("Awaragardi")),
+        "get_all_tasks": lambda: storage.get_all_tasks(),
+    }
+    results: Dict[str, Any] = {}
+    for name, fn in cases.items():
+        results[name] = {"before_s": _best(fn, repeat)}
+    t0 = time.perf_counter()
+    moved = storage.archive_done()
+    results["archive_done"] = {"moved": moved, "seconds": time.perf_counter() - t0}
+    for name, fn in cases.items():
+        r = results[name]
+        r["after_s"] = _best(fn, repeat)
+        r["speedup"] = r["before_s"] / r["after_s"]
+    month = (now - timedelta(days=30), now + timedelta(days=1))
+    results["history_page"] = {"seconds": _best(lambda: storage.get_history("default", *month, limit=100), repeat)}
+
+    print(f"{n_open} open tasks, {n_done} done, best of {repeat}")
+    print(f"{'query':<14} {'before':>10} {'after':>10} {'speedup':>8}")
+    for name in cases:
+        r = results[name]
+        print(f"{name:<14} {r['before_s'] * 1000:>8.1f}ms {r['after_s'] * 1000:>8.1f}ms {r['speedup']:>7.1f}x")
+    print(f"archive_done moved {moved} tasks in {results['archive_done']['seconds']:.2f}s; "
+          f"history page {results['history_page']['seconds'] * 1000:.2f}ms")
+    return results
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--open", type=int, default=5000, help="open tasks")
+    ap.add_argument("--done", type=int, default=200000, help="completed tasks left in the live table")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="write results as JSON to this path ('-' for stdout)")
+    args = ap.parse_args(argv)
+
+    os.environ["TODO_DB_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='todo-archive-'), 'tasks.db')}"
+    results = run(args.open, args.done, args.repeat, args.seed)
+    if args.out:
+        params = {"open": args.open, "done": args.done, "repeat": args.repeat, "seed": args.seed}
+        write_results(args.out, "archive", params, results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
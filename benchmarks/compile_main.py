@@ -0,0 +1,167 @@
+# benchmarks/compile_main.py
+"""
+Benchmark logic.compile_main against the original quadratic implementation.
+
+    python -m benchmarks.compile_main                  # 10k..1M timings
+    python -m benchmarks.compile_main --sizes 10000,100000 --locked 0.2
+
+The legacy implementation is only timed up to --legacy-max tasks; above that it
+takes minutes (every reorderable task is compared against every fixed task).
+tests/test_logic.py checks that both produce the same order on randomized inputs.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List, Dict, Any
+
+import logic
+from records import TaskRecord
+
+
+# The original logic.py ranking and placement, kept verbatim as the reference ordering
+LEGACY_CATEGORY_RANK = {
+    "Necessary": 1,
+    "College": 2,
+    "Home": 3,
+    "Awaragardi": 4
+}
+
+
+def _legacy_priority_key(task: Dict[str, Any], now: datetime) -> tuple:
+    due = task["due_datetime"]
+    hours_left = (due - now).total_seconds() / 3600.0
+
+    if task.get("category") == "College" and hours_left < 24:
+        category_rank = 0
+    else:
+        category_rank = LEGACY_CATEGORY_RANK.get(task.get("category"), 99)
+
+    created_at = task.get("created_at") or datetime.min
+    return (due, category_rank, created_at)
+
+
+def legacy_sort_reorderable(tasks: List[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+    """The original logic.sort_reorderable."""
+    valid = []
+    for t in tasks:
+        if t.get("is_done"):
+            continue
+        if t.get("locked"):
+            continue
+        if t.get("due_datetime") <= now:
+            continue
+        valid.append(t)
+
+    return sorted(valid, key=lambda t: _legacy_priority_key(t, now))
+
+
+def legacy_compile_main(all_tasks: List[Dict[str, Any]], now: datetime = None) -> List[Dict[str, Any]]:
+    """The original logic.compile_main."""
+    if now is None:
+        now = datetime.now()
+
+    fixed_tasks = [t for t in all_tasks if t.get("locked") and not t.get("is_done")]
+    fixed_tasks = [t for t in fixed_tasks if isinstance(t.get("fixed_pos"), int) and t.get("due_datetime") > now]
+
+    reorderable = legacy_sort_reorderable(all_tasks, now)
+
+    max_fixed_pos = max([t["fixed_pos"] for t in fixed_tasks], default=-1)
+    needed_slots = max(max_fixed_pos + 1, len(fixed_tasks) + len(reorderable))
+
+    main_slots: List[Dict[str, Any] | None] = [None] * needed_slots
+
+    for ft in sorted(fixed_tasks, key=lambda x: x["fixed_pos"]):
+        pos = ft["fixed_pos"]
+        if pos < 0:
+            pos = 0
+        while pos < len(main_slots) and main_slots[pos] is not None:
+            pos += 1
+        if pos >= len(main_slots):
+            main_slots.append(None)
+        main_slots[pos] = ft
+
+    idx = 0
+    for r in reorderable:
+        if any(r.get("id") == ft.get("id") for ft in fixed_tasks):
+            continue
+        while idx < len(main_slots) and main_slots[idx] is not None:
+            idx += 1
+        if idx >= len(main_slots):
+            main_slots.append(None)
+        main_slots[idx] = r
+        idx += 1
+
+    final = [t for t in main_slots if t is not None and not t.get("is_done") and t.get("due_datetime") > now]
+    return final
+
+
+def random_tasks(rng: random.Random, n: int, now: datetime, locked_ratio: float = 0.1,
+                 pos_spread: float = 1.5) -> List[TaskRecord]:
+    """Generate n task records with a mix of categories, locks, colliding fixed_pos, done and expired rows."""
+    categories = list(logic.CATEGORY_RANK) + ["Other"]
+    max_pos = max(1, int(n * pos_spread))
+    tasks = []
+    for i in range(n):
+        locked = rng.random() < locked_ratio
+        fixed_pos = None
+        if locked:
+            roll = rng.random()
+            if roll < 0.05:
+                fixed_pos = None            # locked without a slot
+            elif roll < 0.10:
+                fixed_pos = -rng.randint(1, 3)
+            elif roll < 0.40:
+                fixed_pos = rng.randint(0, 3)  # heavy collisions near the top
+            else:
+                fixed_pos = rng.randint(0, max_pos)
+        tasks.append(TaskRecord.from_dict({
+            "id": i + 1,
+            "title": f"T{i}",
+            "category": rng.choice(categories),
+            # coarse due times so ties on due exercise the category/created tie-breaks
+            "due_datetime": now + timedelta(hours=rng.randint(-5, 72)),
+            "locked": locked,
+            "fixed_pos": fixed_pos,
+            "is_done": rng.random() < 0.05,
+            "created_at": None if rng.random() < 0.05 else now - timedelta(minutes=rng.randint(0, 50)),
+        }))
+    rng.shuffle(tasks)
+    return tasks
+
+
+def _time(fn, *args) -> float:
+    t0 = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - t0
+
+
+def run(sizes: List[int], locked_ratio: float, legacy_max: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 1, 12, 0)
+    print(f"{'tasks':>9} {'compile_main':>14} {'legacy':>12} {'speedup':>9}")
+    for n in sizes:
+        tasks = random_tasks(rng, n, now, locked_ratio=locked_ratio)
+        new = _time(logic.compile_main, tasks, now)
+        if n <= legacy_max:
+            old = _time(legacy_compile_main, tasks, now)
+            print(f"{n:>9} {new * 1000:>12.1f}ms {old * 1000:>10.1f}ms {old / new:>8.1f}x")
+        else:
+            print(f"{n:>9} {new * 1000:>12.1f}ms {'skipped':>12} {'-':>9}")
+        sys.stdout.flush()
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="10000,100000,1000000", help="comma separated task counts")
+    ap.add_argument("--locked", type=float, default=0.1, help="fraction of locked tasks")
+    ap.add_argument("--legacy-max", type=int, default=20000, help="largest size to time the legacy version on")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    run([int(x) for x in args.sizes.split(",") if x], args.locked, args.legacy_max, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# benchmarks/load.py
+"""
+Local HTTP load generator for /api/tasks, /move and /update.
+
+    python -m benchmarks.load                                  # 2k tasks, 8 clients, 10s
+    python -m benchmarks.load --tasks 20000 --clients 16 --duration 30 --mix tasks=8,move=1,update=1
+    python -m benchmarks.load --conditional --out load.json    # GETs revalidate with If-None-Match
+
+Serves the app with the threaded werkzeug server on a free localhost port, backed by a
+scratch SQLite database (TODO_DB_URL) seeded with a synthetic task set, and drives it
+from --clients threads over real HTTP. Reports per-endpoint p50/p99 latency and
+throughput; 4xx answers (e.g. a move of a task the expiry sweep already removed)
+are counted per status, 5xx and connection failures as errors.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.results import percentile, write_results
+from benchmarks.synth import Mix, generate_tasks, task_rows
+
+ENDPOINTS = ("tasks", "move", "update")
+
+
+def _parse_mix(text: str) -> Dict[str, float]:
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise SystemExit(f"unknown endpoint {name!r} in --mix (choose from {', '.join(ENDPOINTS)})")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def _request(port: int, kind: str, rng: random.Random, n_tasks: int, etag: str) -> Tuple[int, str]:
+    """Send one request; returns (status, etag of the response)."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        if kind == "tasks":
+            headers = {"If-None-Match": etag} if etag else {}
+            conn.request("GET", "/api/tasks", headers=headers)
+        else:
+            task_id = rng.randint(1, n_tasks)
+            if kind == "move":
+                path, body = "/move", {"task_id": task_id, "new_category": "Main",
+                                       "new_index": rng.randint(0, 50), "locked": rng.random() < 0.5}
+            else:
+                path, body = f"/update/{task_id}", {"title": f"Load {rng.randint(0, 10 ** 6)}"}
+            conn.request("POST", path, body=json.dumps(body), headers={"Content-Type": "application/json"})
+        resp = conn.getresponse()
+        resp.read()
+        return resp.status, resp.getheader("ETag")
+    finally:
+        conn.close()
+
+
+def run(n_tasks: int, clients: int, duration: float, weights: Dict[str, float], conditional: bool,
+        mix: Mix, seed: int = 0) -> Dict[str, Dict[str, Any]]:
+    from werkzeug.serving import make_server
+
+    import storage
+    from app import app
+
+    storage.migrate()
+    storage.bulk_insert(task_rows(generate_tasks(random.Random(seed), n_tasks, datetime.now(), mix)))
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # no per-request access log
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    kinds, kind_weights = list(weights), list(weights.values())
+    latencies: Dict[str, List[float]] = {k: [] for k in kinds}
+    statuses: Dict[str, Dict[str, int]] = {k: {} for k in kinds}
+    errors: List[str] = []
+    lock = threading.Lock()
+    start = threading.Barrier(clients + 1)
+    deadline = [0.0]
+
+    def client(n):
+        rng = random.Random(seed * 1000 + n + 1)
+        etag = None
+        start.wait()
+        while time.perf_counter() < deadline[0]:
+            kind = rng.choices(kinds, kind_weights)[0]
+            t0 = time.perf_counter()
+            try:
+                status, new_etag = _request(port, kind, rng, n_tasks, etag if conditional else None)
+            except (OSError, http.client.HTTPException) as e:
+                with lock:
+                    errors.append(f"{kind}: {e!r}")
+                continue
+            elapsed = time.perf_counter() - t0
+            if kind == "tasks" and new_etag:
+                etag = new_etag
+            with lock:
+                latencies[kind].append(elapsed)
+                statuses[kind][str(status)] = statuses[kind].get(str(status), 0) + 1
+                if status >= 500:
+                    errors.append(f"{kind}: HTTP {status}")
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    deadline[0] = time.perf_counter() + duration
+    start.wait()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    server.shutdown()
+
+    results = {}
+    print(f"{'endpoint':<10} {'requests':>9} {'req/s':>8} {'p50':>9} {'p99':>9} {'max':>9}  statuses")
+    for kind in kinds + ["all"]:
+        lat = sorted(sum(latencies.values(), []) if kind == "all" else latencies[kind])
+        if not lat:
+            continue
+        r = results[kind] = {
+            "requests": len(lat),
+            "throughput_per_s": len(lat) / wall,
+            "p50_s": percentile(lat, 50),
+            "p99_s": percentile(lat, 99),
+            "mean_s": sum(lat) / len(lat),
+            "max_s": lat[-1],
+        }
+        if kind != "all":
+            r["statuses"] = statuses[kind]
+        print(f"{kind:<10} {r['requests']:>9} {r['throughput_per_s']:>8.1f} {r['p50_s'] * 1000:>7.1f}ms "
+              f"{r['p99_s'] * 1000:>7.1f}ms {r['max_s'] * 1000:>7.1f}ms  {r.get('statuses', '')}")
+    results.setdefault("all", {"requests": 0})["errors"] = len(errors)
+    for e in errors[:10]:
+        print("  ", e)
+    print(f"errors: {len(errors)}")
+    return results
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--tasks", type=int, default=2000, help="synthetic tasks seeded before the run")
+    ap.add_argument("--clients", type=int, default=8, help="concurrent client threads")
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    ap.add_argument("--mix", default="tasks=8,move=1,update=1", help="relative request weights")
+    ap.add_argument("--conditional", action="store_true", help="send If-None-Match on GET /api/tasks")
+    ap.add_argument("--locked", type=float, default=0.1, help="fraction of locked tasks")
+    ap.add_argument("--expired", type=float, default=0.0, help="fraction of tasks already past due")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="write results as JSON to this path ('-' for stdout)")
+    args = ap.parse_args(argv)
+
+    os.environ["TODO_DB_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='todo-load-'), 'tasks.db')}"
+    mix = Mix(locked=args.locked, expired=args.expired)
+    weights = _parse_mix(args.mix)
+    results = run(args.tasks, args.clients, args.duration, weights, args.conditional, mix, args.seed)
+    if args.out:
+        params = {"tasks": args.tasks, "clients": args.clients, "duration": args.duration, "mix": weights,
+                  "conditional": args.conditional, "seed": args.seed, "tasks_mix": mix.as_dict()}
+        write_results(args.out, "load", params, results)
+    return 1 if results["all"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# benchmarks/micro.py
+"""
+Micro-benchmarks of the per-request hot paths on synthetic task sets.
+
+    python -m benchmarks.micro                                   # 1k, 10k, 100k tasks
+    python -m benchmarks.micro --sizes 10000 --locked 0.3 --expired 0.2 --out micro.json
+
+Cases: logic.compile_main, logic.sort_reorderable and storage._row_to_record (on
+detached Task rows, so no database time is included). Each case is run --repeat
+times; min_s/median_s are seconds per call over the whole task set.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from benchmarks.results import write_results
+from benchmarks.synth import Mix, generate_tasks
+
+
+def _measure(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    fn()  # warm up
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {"min_s": min(times), "median_s": statistics.median(times), "repeat": repeat}
+
+
+def run(sizes: List[int], mix: Mix, repeat: int, seed: int = 0) -> Dict[str, Dict[str, Any]]:
+    import logic
+    import storage
+    from models import Task
+    from records import TaskRecord
+
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 1, 12, 0)
+    results = {}
+    print(f"{'case':<28} {'min':>10} {'median':>10} {'per task':>10}")
+    for n in sizes:
+        dicts = generate_tasks(rng, n, now, mix)
+        tasks = [TaskRecord.from_dict(t) for t in dicts]
+        rows = [Task(**t, workspace="default") for t in dicts]
+        cases = {
+            f"compile_main/{n}": lambda: logic.compile_main(tasks, now),
+            f"sort_reorderable/{n}": lambda: logic.sort_reorderable(tasks, now),
+            f"row_to_record/{n}": lambda: [storage._row_to_record(r) for r in rows],
+        }
+        for name, fn in cases.items():
+            r = results[name] = {**_measure(fn, repeat), "tasks": n}
+            print(f"{name:<28} {r['min_s'] * 1000:>8.2f}ms {r['median_s'] * 1000:>8.2f}ms "
+                  f"{r['min_s'] / max(n, 1) * 1e6:>8.2f}us")
+            sys.stdout.flush()
+    return results
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="1000,10000,100000", help="comma separated task counts")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--locked", type=float, default=0.1, help="fraction of locked tasks")
+    ap.add_argument("--collisions", type=float, default=0.3, help="fraction of locked tasks on fixed_pos 0..3")
+    ap.add_argument("--expired", type=float, default=0.05, help="fraction of tasks already past due")
+    ap.add_argument("--done", type=float, default=0.05, help="fraction of completed tasks")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="write results as JSON to this path ('-' for stdout)")
+    args = ap.parse_args(argv)
+
+    # nothing here writes, but keep storage pointed at a scratch file, never db/tasks.db
+    os.environ["TODO_DB_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='todo-micro-'), 'tasks.db')}"
+    mix = Mix(locked=args.locked, collisions=args.collisions, expired=args.expired, done=args.done)
+    sizes = [int(x) for x in args.sizes.split(",") if x]
+    results = run(sizes, mix, args.repeat, args.seed)
+    if args.out:
+        params = {"sizes": sizes, "repeat": args.repeat, "seed": args.seed, "mix": mix.as_dict()}
+        write_results(args.out, "micro", params, results)
+
+
+if __name__ == "__main__":
+    main()
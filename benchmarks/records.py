@@ -0,0 +1,169 @@
+# benchmarks/records.py
+"""
+Memory and CPU of TaskRecord lists against the previous per-row dicts.
+
+    python -m benchmarks.records                     # 100k tasks
+    python -m benchmarks.records --tasks 200000 --out records.json
+
+Seeds a scratch database (TODO_DB_URL) with one workspace whose tasks all belong in
+Main, then measures the stages of building /api/tasks for the Main list both ways:
+
+    load       dicts: ORM rows -> _row_to_dict      records: epoch columns -> TaskRecord
+    sort       dicts: datetime keys via .get()      records: int keys via attributes
+    serialize  dicts: {**task, ISO strings}         records: TaskRecord.as_json
+    memory     tracemalloc size of the loaded list (datetimes included)
+
+Both paths must produce the same sorted ids and the same JSON objects.
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Dict, List
+
+from benchmarks.results import write_results
+from benchmarks.synth import Mix, generate_tasks, task_rows
+
+
+def legacy_row_to_dict(row) -> Dict[str, Any]:
+    """storage._row_to_dict before records."""
+    return {
+        "id": row.id,
+        "title": row.title,
+        "category": row.category,
+        "due_datetime": row.due_datetime,
+        "locked": bool(row.locked),
+        "fixed_pos": row.fixed_pos,
+        "part_label": row.part_label,
+        "is_done": bool(row.is_done),
+        "is_gym": bool(row.is_gym),
+        "in_main": bool(getattr(row, "in_main", False)),
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+    }
+
+
+def legacy_sort_reorderable(tasks: List[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+    """logic.sort_reorderable before records (dict access, datetime keys)."""
+    import logic
+
+    def key(task):
+        due = task["due_datetime"]
+        hours_left = (due - now).total_seconds() / 3600.0
+        if task.get("category") == "College" and hours_left < logic.COLLEGE_BOOST_HOURS:
+            category_rank = 0
+        else:
+            category_rank = logic.CATEGORY_RANK.get(task.get("category"), 99)
+        return (due, category_rank, task.get("created_at") or datetime.min)
+
+    valid = [t for t in tasks if not t.get("is_done") and not t.get("locked") and t.get("due_datetime") > now]
+    return sorted(valid, key=key)
+
+
+def legacy_serial(task: Dict[str, Any]) -> Dict[str, Any]:
+    """app._serial before records."""
+    iso = lambda v: v.isoformat() if v is not None else None  # noqa: E731
+    return {**task, "due_datetime": iso(task.get("due_datetime")),
+            "created_at": iso(task.get("created_at")), "updated_at": iso(task.get("updated_at"))}
+
+
+def _best(fn, repeat: int):
+    best, result = None, None
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _size(fn) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = fn()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def run(n: int, repeat: int, seed: int = 0) -> Dict[str, Dict[str, Any]]:
+    import logic
+    import storage
+    from models import Session, Task
+    from sqlalchemy import or_, select
+
+    storage.migrate()
+    now = datetime.now()
+    mix = Mix(categories={"Necessary": 1.0, "College": 1.0}, expired=0.0, done=0.0)
+    storage.bulk_insert(task_rows(generate_tasks(random.Random(seed), n, now, mix)))
+
+    # storage.get_main_tasks before records: whole ORM rows
+    legacy_stmt = select(Task).where(
+        Task.workspace == "default", Task.is_done == False,  # noqa: E712
+        or_(Task.in_main == True, Task.category.in_(storage.MAIN_CATEGORIES)),  # noqa: E712
+    ).order_by(Task.id)
+
+    def load_dicts():
+        with Session() as s:
+            return [legacy_row_to_dict(r) for r in s.execute(legacy_stmt).scalars()]
+
+    def load_records():
+        return storage.get_main_tasks("default")
+
+    results = {}
+    t_load_d, dicts = _best(load_dicts, repeat)
+    t_load_r, recs = _best(load_records, repeat)
+    t_sort_d, sorted_d = _best(lambda: legacy_sort_reorderable(dicts, now), repeat)
+    t_sort_r, sorted_r = _best(lambda: logic.sort_reorderable(recs, now), repeat)
+    t_ser_d, json_d = _best(lambda: [legacy_serial(t) for t in sorted_d], repeat)
+    t_ser_r, json_r = _best(lambda: [t.as_json() for t in sorted_r], repeat)
+    assert [t["id"] for t in sorted_d] == [t.id for t in sorted_r], "sorted ids differ"
+    # the legacy rows predate the per-task "version"
+    assert json_d == [{k: v for k, v in t.items() if k != "version"} for t in json_r], "serialized tasks differ"
+    mem_d = _size(load_dicts)
+    mem_r = _size(load_records)
+
+    for name, d, r in (("load", t_load_d, t_load_r), ("sort", t_sort_d, t_sort_r),
+                       ("serialize", t_ser_d, t_ser_r),
+                       ("total", t_load_d + t_sort_d + t_ser_d, t_load_r + t_sort_r + t_ser_r)):
+        results[name] = {"dicts_s": d, "records_s": r, "speedup": d / r}
+    results["memory"] = {"dicts_bytes": mem_d, "records_bytes": mem_r, "ratio": mem_d / mem_r,
+                         "dicts_bytes_per_task": mem_d / n, "records_bytes_per_task": mem_r / n}
+
+    print(f"{n} tasks, best of {repeat}")
+    print(f"{'stage':<10} {'dicts':>10} {'records':>10} {'speedup':>8}")
+    for name in ("load", "sort", "serialize", "total"):
+        r = results[name]
+        print(f"{name:<10} {r['dicts_s'] * 1000:>8.1f}ms {r['records_s'] * 1000:>8.1f}ms {r['speedup']:>7.2f}x")
+    m = results["memory"]
+    print(f"{'memory':<10} {m['dicts_bytes'] / 2 ** 20:>8.1f}MB {m['records_bytes'] / 2 ** 20:>8.1f}MB "
+          f"{m['ratio']:>7.2f}x  ({m['dicts_bytes_per_task']:.0f} vs {m['records_bytes_per_task']:.0f} bytes/task)")
+    return results
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--tasks", type=int, default=100000)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="write results as JSON to this path ('-' for stdout)")
+    args = ap.parse_args(argv)
+
+    os.environ["TODO_DB_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='todo-records-'), 'tasks.db')}"
+    results = run(args.tasks, args.repeat, args.seed)
+    if args.out:
+        write_results(args.out, "records", {"tasks": args.tasks, "repeat": args.repeat, "seed": args.seed}, results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+# benchmarks/recurrence.py
+"""
+Cost of recurring-task templates on the list builds and requests.
+
+    python -m benchmarks.recurrence                          # 2000 templates, 500 plain tasks
+    python -m benchmarks.recurrence --templates 10000 --series-days 730 --out recurrence.json
+
+Seeds a scratch database (TODO_DB_URL) with the same plain tasks in four workspaces and adds,
+to three of them, one set of templates (daily/weekly/monthly, open-ended, started up to a
+year ago) in different forms:
+
+    plain    the plain tasks only
+    lazy     the templates; occurrences are generated per build (recurrence.expand)
+    window   no templates: the occurrences inside the look-ahead window stored as task rows
+    series   no templates: each series stored as task rows for --series-days ahead
+
+and times a full list build (what the first request after a write pays) and a cached
+/api/tasks request for each. lazy should cost about what window does, however long the
+series run; series is what materializing them would cost.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict
+
+from benchmarks.results import write_results
+from benchmarks.synth import Mix, generate_tasks, task_rows
+
+_FREQS = (("daily", 0.6), ("weekly", 0.3), ("monthly", 0.1))
+_CATEGORIES = ("Necessary", "College", "Home", "Awaragardi")
+
+
+def _best(fn: Callable[[], Any], repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _occurrence_rows(templates, now: datetime, days: int, workspace: str):
+    import recurrence
+
+    for occ in recurrence.expand(templates, now, lookahead=timedelta(days=days)):
+        yield {"workspace": workspace, "title": occ.title, "category": occ.category,
+               "due_datetime": occ.due_datetime, "locked": False, "fixed_pos": None, "part_label": None,
+               "is_done": False, "is_gym": occ.is_gym, "in_main": False, "created_at": now, "updated_at": now}
+
+
+def run(n_templates: int, n_plain: int, series_days: int, repeat: int, seed: int = 0) -> Dict[str, Any]:
+    import app as web
+    import recurrence
+    import storage
+
+    storage.migrate()
+    rng = random.Random(seed)
+    now = datetime.now()
+    plain = generate_tasks(rng, n_plain, now, Mix(expired=0.0, done=0.0, locked=0.0))
+    for ws in ("plain", "lazy", "window", "series"):
+        storage.bulk_insert(task_rows(plain, ws))
+
+    freqs, weights = zip(*_FREQS)
+    with storage.unit_of_work() as s:
+        for i in range(n_templates):
+            start = now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+            storage.add_template(f"Template {i}", rng.choice(_CATEGORIES), start, rng.choices(freqs, weights)[0],
+                                 is_gym=rng.random() < 0.2, workspace="lazy", session=s)
+    templates = storage.get_templates("lazy", now)
+    rows = {"window": recurrence.LOOKAHEAD_DAYS, "series": series_days}
+    for ws, days in rows.items():
+        batch = list(_occurrence_rows(templates, now, days, ws))
+        for start in range(0, len(batch), 50000):
+            storage.bulk_insert(batch[start:start + 50000])
+
+    # counted before any request starts the expiry scheduler, which deletes occurrences coming due
+    stored = {ws: len(storage.get_all_tasks(workspace=ws)) for ws in ("plain", "lazy", "window", "series")}
+    client = web.app.test_client()
+    results: Dict[str, Any] = {}
+    for ws in ("plain", "lazy", "window", "series"):
+        with web.app.test_request_context():
+            version = storage.data_version(ws)
+            entry = web._build_lists(ws, version, now)
+            build_s = _best(lambda: web._build_lists(ws, version, now), repeat)
+        headers = {"X-Workspace": ws}
+        client.get("/api/tasks", headers=headers)  # fill the cache
+        request_s = _best(lambda: client.get("/api/tasks", headers=headers), repeat * 10)
+        results[ws] = {"build_s": build_s, "request_s": request_s, "listed": sum(len(lst) for lst in entry.lists),
+                       "stored": stored[ws]}
+
+    print(f"{n_templates} templates, {n_plain} plain tasks, look-ahead {recurrence.LOOKAHEAD_DAYS} days, "
+          f"series {series_days} days, best of {repeat}")
+    print(f"{'workspace':<10} {'stored rows':>12} {'listed':>8} {'build':>10} {'cached req':>11}")
+    for ws, r in results.items():
+        print(f"{ws:<10} {r['stored']:>12} {r['listed']:>8} {r['build_s'] * 1000:>8.1f}ms "
+              f"{r['request_s'] * 1000:>9.2f}ms")
+    return results
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--templates", type=int, default=2000, help="recurring templates")
+    ap.add_argument("--plain", type=int, default=500, help="plain open tasks in every workspace")
+    ap.add_argument("--series-days", type=int, default=365, help="how far ahead 'series' stores occurrences")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="write results as JSON to this path ('-' for stdout)")
+    args = ap.parse_args(argv)
+
+    os.environ["TODO_DB_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='todo-recurrence-'), 'tasks.db')}"
+    results = run(args.templates, args.plain, args.series_days, args.repeat, args.seed)
+    if args.out:
+        params = {"templates": args.templates, "plain": args.plain, "series_days": args.series_days,
+                  "repeat": args.repeat, "seed": args.seed}
+        write_results(args.out, "recurrence", params, results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+# benchmarks/results.py
+"""
+JSON result files shared by the benchmarks, and a comparison between two runs.
+
+    python -m benchmarks.micro --out before.json
+    ... change something ...
+    python -m benchmarks.micro --out after.json
+    python -m benchmarks.results before.json after.json      # flags >10% regressions
+
+A result file is {"benchmark", "params", "env", "results"}; results maps a case name
+to a dict of numbers. Keys ending in "_s" are timings (lower is better), keys ending
+in "_per_s" are rates (higher is better); everything else, including the noisy
+max_s, is informational.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100) of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+    }
+
+
+def write_results(path: str, benchmark: str, params: Dict[str, Any], results: Dict[str, Dict[str, Any]]) -> None:
+    """Write one run to path ('-' for stdout)."""
+    doc = {"benchmark": benchmark, "params": params, "env": environment(), "results": results}
+    text = json.dumps(doc, indent=2, sort_keys=True)
+    if path == "-":
+        print(text)
+        return
+    with open(path, "w", encoding="utf-8") as fp:
+        fp.write(text + "\n")
+    print(f"results written to {path}", file=sys.stderr)
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float = 0.10) -> List[str]:
+    """Print every shared metric with its change; returns the regressions beyond threshold."""
+    regressions = []
+    for case, metrics in new["results"].items():
+        base = old["results"].get(case)
+        if not base:
+            continue
+        for key, value in metrics.items():
+            before = base.get(key)
+            if not isinstance(value, (int, float)) or not isinstance(before, (int, float)) or not before:
+                continue
+            change = value / before - 1
+            if key == "max_s":
+                continue
+            if key.endswith("_per_s"):
+                worse = change < -threshold
+            elif key.endswith("_s"):
+                worse = change > threshold
+            else:
+                continue
+            line = f"{case:<32} {key:<16} {before:>12.6g} -> {value:<12.6g} {change:+7.1%}"
+            print(line + ("  REGRESSION" if worse else ""))
+            if worse:
+                regressions.append(line)
+    return regressions
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("old")
+    ap.add_argument("new")
+    ap.add_argument("--threshold", type=float, default=0.10, help="relative change that counts as a regression")
+    args = ap.parse_args(argv)
+    with open(args.old, encoding="utf-8") as fp:
+        old = json.load(fp)
+    with open(args.new, encoding="utf-8") as fp:
+        new = json.load(fp)
+    if old.get("benchmark") != new.get("benchmark"):
+        print(f"warning: comparing {old.get('benchmark')} with {new.get('benchmark')}", file=sys.stderr)
+    regressions = compare(old, new, args.threshold)
+    print(f"{len(regressions)} regression(s)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+# benchmarks/sort_columns.py
+"""
+Columnar ranking in logic.sort_reorderable: NumPy lexsort vs pure Python vs the previous key function.
+
+    python -m benchmarks.sort_columns                      # 1k..1M timings
+    python -m benchmarks.sort_columns --sizes 2000,5000 --out sort.json
+
+tests/test_logic.py requires the NumPy order, the pure-Python order and reference_order to
+be identical, ties included, on adversarial_tasks sets.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import logic
+from benchmarks.results import write_results
+from records import TaskRecord, to_epoch
+
+
+def reference_order(tasks: List[TaskRecord], now_us: int) -> List[int]:
+    """The per-task key function sort_reorderable used before the columns."""
+    boost_until = now_us + logic._BOOST_US
+
+    def key(i):
+        t = tasks[i]
+        if t.category == "College" and t.due < boost_until:
+            rank = 0
+        else:
+            rank = logic.CATEGORY_RANK.get(t.category, 99)
+        return (t.due, rank, logic._NO_CREATED if t.created is None else t.created)
+
+    return sorted(range(len(tasks)), key=key)
+
+
+def adversarial_tasks(rng: random.Random, n: int, now_us: int) -> List[TaskRecord]:
+    """
+    Reorderable tasks built to stress ties: few distinct due times, dues exactly on the College
+    boost boundary and one microsecond either side, missing created_at, unknown categories.
+    """
+    boundary = now_us + logic._BOOST_US
+    pool = [boundary - 1, boundary, boundary + 1, now_us + 1] + [now_us + rng.randint(1, 4 * logic._BOOST_US)
+                                                                  for _ in range(rng.choice([1, 3, 50]))]
+    created_pool = [None] + [now_us - rng.randint(0, 10 ** 9) for _ in range(rng.choice([1, 5, 1000]))]
+    categories = list(logic.CATEGORY_RANK) + ["Other", None]
+    return [TaskRecord(i, f"T{i}", rng.choice(categories), rng.choice(pool), False, None, None,
+                       False, False, True, rng.choice(created_pool), None)
+            for i in range(n)]
+
+
+def _best(fn, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(sizes: List[int], repeat: int, seed: int = 0) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 1, 12, 0)
+    now_us = to_epoch(now)
+    results = {}
+    print(f"{'tasks':>9} {'reference':>11} {'python':>11} {'numpy':>11} {'sort_reorderable':>17}")
+    for n in sizes:
+        tasks = [TaskRecord(i, f"T{i}", rng.choice(list(logic.CATEGORY_RANK)),
+                            to_epoch(now + timedelta(minutes=rng.randint(1, 72 * 60))), False, None, None,
+                            False, False, True, to_epoch(now - timedelta(minutes=rng.randint(0, 10000))), None)
+                 for i in range(n)]
+        r = results[str(n)] = {
+            "reference_s": _best(lambda: reference_order(tasks, now_us), repeat),
+            "python_s": _best(lambda: logic._order_python(tasks, now_us), repeat),
+            "sort_reorderable_s": _best(lambda: logic.sort_reorderable(tasks, now), repeat),
+        }
+        if logic._numpy() is not None:
+            r["numpy_s"] = _best(lambda: logic._order_numpy(tasks, now_us), repeat)
+        numpy_ms = f"{r['numpy_s'] * 1000:>9.2f}ms" if "numpy_s" in r else f"{'-':>11}"
+        print(f"{n:>9} {r['reference_s'] * 1000:>9.2f}ms {r['python_s'] * 1000:>9.2f}ms {numpy_ms} "
+              f"{r['sort_reorderable_s'] * 1000:>15.2f}ms")
+        sys.stdout.flush()
+    return results
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="1000,2000,5000,10000,100000,1000000", help="comma separated task counts")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="write results as JSON to this path ('-' for stdout)")
+    args = ap.parse_args(argv)
+
+    sizes = [int(x) for x in args.sizes.split(",") if x]
+    results = run(sizes, args.repeat, args.seed)
+    if args.out:
+        params = {"sizes": sizes, "repeat": args.repeat, "seed": args.seed,
+                  "numpy": logic._numpy().__version__ if logic._numpy() is not None else None}
+        write_results(args.out, "sort_columns", params, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/startup.py
+"""
+Cold-start cost of the app and the command-line tools.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 20 --out startup.json
+
+Each case runs in a fresh interpreter against a scratch database (TODO_DB_URL,
+initialized once with `python models.py`) and is timed from spawn to exit:
+
+    python         bare interpreter start (the floor)
+    logic_cli      python logic.py (the demo run)
+    import_storage import storage
+    import_app     import app (Flask app with every route registered)
+    import_asgi    import asgi
+    first_request  import app and answer one GET /api/tasks
+
+fork_request (POSIX only) preloads app in one process, then forks workers the way a
+preforking server does and times each child's first GET /api/tasks from fork to response.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.results import write_results
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_FIRST_REQUEST = "import app; assert app.app.test_client().get('/api/tasks').status_code == 200"
+
+# Prints the seconds each forked child took from fork to its first response
+_FORK_REQUEST = """
+import os, sys, time
+import app
+for _ in range(int(sys.argv[1])):
+    r, w = os.pipe()
+    t0 = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        ok = app.app.test_client().get('/api/tasks').status_code == 200
+        os.write(w, repr(time.perf_counter() - t0 if ok else -1.0).encode())
+        os._exit(0)
+    os.close(w)
+    with os.fdopen(r) as f:
+        print(f.read())
+    os.waitpid(pid, 0)
+"""
+
+CASES = {
+    "python": ["-c", "pass"],
+    "logic_cli": ["logic.py"],
+    "import_storage": ["-c", "import storage"],
+    "import_app": ["-c", "import app"],
+    "import_asgi": ["-c", "import asgi"],
+    "first_request": ["-c", _FIRST_REQUEST],
+}
+
+
+def _spawn(args: List[str], env: Dict[str, str]) -> float:
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, *args], cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - t0
+
+
+def _summary(times: List[float]) -> Dict[str, Any]:
+    return {"min_s": min(times), "median_s": statistics.median(times), "repeat": len(times)}
+
+
+def run(repeat: int) -> Dict[str, Dict[str, Any]]:
+    env = {**os.environ, "TODO_DB_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='todo-startup-'), 'tasks.db')}"}
+    _spawn(["models.py"], env)
+    results = {}
+    for name, args in CASES.items():
+        _spawn(args, env)  # warm the OS file cache and __pycache__
+        results[name] = _summary([_spawn(args, env) for _ in range(repeat)])
+    if hasattr(os, "fork"):
+        out = subprocess.run([sys.executable, "-c", _FORK_REQUEST, str(repeat)], cwd=ROOT, env=env, check=True,
+                             capture_output=True, text=True).stdout
+        results["fork_request"] = _summary([float(line) for line in out.split()])
+
+    print(f"{'case':<16} {'min':>10} {'median':>10}   (best of {repeat})")
+    for name, r in results.items():
+        print(f"{name:<16} {r['min_s'] * 1000:>8.1f}ms {r['median_s'] * 1000:>8.1f}ms")
+    return results
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=10)
+    ap.add_argument("--out", help="write results as JSON to this path ('-' for stdout)")
+    args = ap.parse_args(argv)
+
+    results = run(args.repeat)
+    if args.out:
+        write_results(args.out, "startup", {"repeat": args.repeat}, results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# benchmarks/stress_concurrency.py
+"""
+Concurrency stress test: many threads writing through the Flask app at once.
+
+    python -m benchmarks.stress_concurrency --threads 16 --ops 200
+
+Runs against a scratch SQLite database (TODO_DB_URL), never db/tasks.db.
+Every request must succeed (no "database is locked"), and the final row count
+must match the adds and splits that were acknowledged.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--threads", type=int, default=16)
+    ap.add_argument("--ops", type=int, default=200, help="requests per thread")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix="todo-stress-")
+    os.environ["TODO_DB_URL"] = f"sqlite:///{os.path.join(tmp, 'tasks.db')}"
+    import app as app_module
+    import storage
+
+    storage.migrate()
+    flask_app = app_module.app
+    due = (datetime.now() + timedelta(days=2)).strftime("%Y-%m-%d %H:%M")
+    created = [0] * args.threads
+    errors = []
+    start = threading.Barrier(args.threads)
+
+    def worker(n):
+        rng = random.Random(args.seed * 1000 + n)
+        client = flask_app.test_client()
+        start.wait()
+        for i in range(args.ops):
+            op = rng.random()
+            ids = [t["id"] for t in storage.get_all_tasks()]
+            try:
+                if op < 0.35 or not ids:
+                    date_str, time_str = due.split(" ")
+                    r = client.post("/add", data={"title": f"w{n}-{i}", "category": rng.choice(["Home", "Awaragardi", "College"]),
+                                                  "due_date": date_str, "due_time": time_str})
+                    if r.status_code == 302:
+                        created[n] += 1
+                elif op < 0.65:
+                    r = client.post("/move", json={"task_id": rng.choice(ids), "new_category": "Main",
+                                                   "new_index": rng.randint(0, 20), "locked": rng.random() < 0.5})
+                elif op < 0.85:
+                    r = client.post(f"/update/{rng.choice(ids)}", json={"title": f"u{n}-{i}"})
+                else:
+                    r = client.post(f"/split/{rng.choice(ids)}")
+                    if r.status_code == 200:
+                        created[n] += 1
+                if r.status_code >= 500 or (r.status_code >= 400 and r.status_code != 404):
+                    errors.append((n, i, r.status_code, r.get_data(as_text=True)[:200]))
+            except Exception as e:  # noqa: BLE001 - report every failure
+                errors.append((n, i, "exception", repr(e)))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    total = args.threads * args.ops
+    rows = len(storage.get_all_tasks())
+    print(f"{total} requests from {args.threads} threads in {elapsed:.2f}s ({total / elapsed:.0f} req/s)")
+    print(f"rows: {rows}, acknowledged creates: {sum(created)}, errors: {len(errors)}")
+    for e in errors[:10]:
+        print("  ", e)
+    ok = not errors and rows == sum(created)
+    print("OK" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
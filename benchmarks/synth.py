@@ -0,0 +1,85 @@
+# benchmarks/synth.py
+"""
+Synthetic task sets for benchmarks.
+
+    from benchmarks.synth import Mix, generate_tasks
+    tasks = generate_tasks(random.Random(0), 10000, now, Mix(locked=0.2, expired=0.1))
+
+generate_tasks returns the task dicts logic.py works on (ids 1..n); task_rows turns
+them into Task column dicts for storage.bulk_insert.
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import logic
+
+
+class Mix:
+    """
+    Shape of a synthetic task set; fractions are of all tasks unless noted.
+
+    categories: relative weights per category
+    locked:     tasks that are locked
+    collisions: of the locked tasks, those piled onto fixed_pos 0..3 (the rest spread over the list)
+    expired:    open tasks already past due (hidden by compile_main, swept by the scheduler)
+    done:       completed tasks
+    in_main:    side-bank tasks (Home/Awaragardi) already dragged into Main
+    """
+    __slots__ = ("categories", "locked", "collisions", "expired", "done", "in_main", "horizon_hours")
+
+    def __init__(self, categories: Optional[Dict[str, float]] = None, locked: float = 0.1,
+                 collisions: float = 0.3, expired: float = 0.05, done: float = 0.05,
+                 in_main: float = 0.2, horizon_hours: int = 72):
+        self.categories = categories or {c: 1.0 for c in logic.CATEGORY_RANK}
+        self.locked = locked
+        self.collisions = collisions
+        self.expired = expired
+        self.done = done
+        self.in_main = in_main
+        self.horizon_hours = horizon_hours
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+def generate_tasks(rng: random.Random, n: int, now: datetime, mix: Optional[Mix] = None) -> List[Dict[str, Any]]:
+    """Generate n task dicts (ids 1..n, shuffled) following mix."""
+    if mix is None:
+        mix = Mix()
+    names = list(mix.categories)
+    weights = [mix.categories[c] for c in names]
+    categories = rng.choices(names, weights, k=n)
+    tasks = []
+    for i in range(n):
+        locked = rng.random() < mix.locked
+        fixed_pos = None
+        if locked:
+            fixed_pos = rng.randint(0, 3) if rng.random() < mix.collisions else rng.randint(0, max(1, n))
+        if rng.random() < mix.expired:
+            due = now - timedelta(minutes=rng.randint(1, 600))
+        else:
+            # whole minutes so ties on due exercise the category/created tie-breaks
+            due = now + timedelta(minutes=rng.randint(1, mix.horizon_hours * 60))
+        category = categories[i]
+        tasks.append({
+            "id": i + 1,
+            "title": f"Task {i}",
+            "category": category,
+            "due_datetime": due,
+            "locked": locked,
+            "fixed_pos": fixed_pos,
+            "part_label": None,
+            "is_done": rng.random() < mix.done,
+            "is_gym": False,
+            "in_main": category in ("Home", "Awaragardi") and rng.random() < mix.in_main,
+            "created_at": now - timedelta(minutes=rng.randint(0, 10000)),
+            "updated_at": now,
+        })
+    rng.shuffle(tasks)
+    return tasks
+
+
+def task_rows(tasks: List[Dict[str, Any]], workspace: str = "default") -> List[Dict[str, Any]]:
+    """Task column dicts for storage.bulk_insert (ids are left to the database)."""
+    return [{**{k: v for k, v in t.items() if k != "id"}, "workspace": workspace} for t in tasks]
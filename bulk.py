@@ -0,0 +1,176 @@
+# bulk.py
+"""
+Streaming bulk import/export of tasks (JSONL or CSV).
+
+    python bulk.py import tasks.jsonl
+    python bulk.py import tasks.csv --chunk 10000
+    python bulk.py export backup.jsonl [--open-only]
+    python bulk.py import alice.jsonl --workspace alice
+    python bulk.py export - --format csv > tasks.csv
+
+Rows are read and written as generators, so memory stays flat however large the file.
+Imports are validated row by row (due_datetime uses the same parsing as /update) and
+inserted in chunks, one executemany and one transaction per chunk. Rows without a
+"workspace" column go to --workspace; export covers one workspace (--workspace) or all.
+"""
+import argparse
+import csv
+import json
+import sys
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, TextIO
+
+import storage
+
+# Columns written by export and accepted by import ("id" is exported but never imported)
+EXPORT_FIELDS = ["id", "workspace", "title", "category", "due_datetime", "locked", "fixed_pos", "part_label",
+                 "is_done", "is_gym", "in_main", "created_at", "updated_at"]
+BOOL_FIELDS = ("locked", "is_done", "is_gym", "in_main")
+DATETIME_FIELDS = ("created_at", "updated_at")
+
+
+def _fmt(path: str, fmt: str) -> str:
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def read_rows(fp: TextIO, fmt: str) -> Iterator[Dict[str, Any]]:
+    """Yield raw row dicts from a JSONL or CSV stream."""
+    if fmt == "csv":
+        yield from csv.DictReader(fp)
+        return
+    for line in fp:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+_TRUE_STRINGS = frozenset(("1", "true", "yes", "y", "t"))
+
+
+def _bool(val: Any) -> bool:
+    if val.__class__ is str:
+        return val.strip().lower() in _TRUE_STRINGS
+    return bool(val)
+
+
+def validate(rows: Iterable[Dict[str, Any]], now: datetime = None,
+             workspace: str = storage.DEFAULT_WORKSPACE) -> Iterator[Dict[str, Any]]:
+    """
+    Turn raw rows into Task column dicts, raising ValueError (with the 1-based row number)
+    on the first invalid row. Rows without a workspace are assigned to workspace.
+    """
+    if now is None:
+        now = datetime.now()
+    for n, raw in enumerate(rows, 1):
+        title, category = raw.get("title"), raw.get("category")
+        if not (title and category):
+            raise ValueError(f"row {n}: title and category are required")
+        due = storage.parse_due(raw["due_datetime"]) if raw.get("due_datetime") else None
+        if due is None:
+            raise ValueError(f"row {n}: invalid due_datetime {raw.get('due_datetime')!r}")
+        ws = raw.get("workspace") or workspace
+        if not storage.WORKSPACE_RE.match(ws):
+            raise ValueError(f"row {n}: invalid workspace {ws!r}")
+        row = {
+            "workspace": ws,
+            "title": title,
+            "category": category,
+            "due_datetime": due,
+            "part_label": raw.get("part_label") or None,
+            "fixed_pos": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for k in BOOL_FIELDS:
+            row[k] = _bool(raw.get(k, False))
+        if raw.get("fixed_pos") not in (None, ""):
+            try:
+                row["fixed_pos"] = int(raw["fixed_pos"])
+            except (TypeError, ValueError):
+                raise ValueError(f"row {n}: invalid fixed_pos {raw['fixed_pos']!r}")
+        for k in DATETIME_FIELDS:
+            if raw.get(k):
+                parsed = storage.parse_due(raw[k])
+                if parsed is None:
+                    raise ValueError(f"row {n}: invalid {k} {raw[k]!r}")
+                row[k] = parsed
+        yield row
+
+
+def import_tasks(rows: Iterable[Dict[str, Any]], chunk_size: int = 5000) -> int:
+    """Insert validated rows chunk by chunk; returns the number of tasks imported."""
+    total = 0
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, chunk_size))
+        if not chunk:
+            return total
+        total += storage.bulk_insert(chunk)
+
+
+def export_tasks(out: TextIO, fmt: str = "jsonl", include_done: bool = True,
+                 workspace: str = None) -> int:
+    """Stream tasks (of one workspace, or all when None) to out; returns the number of rows written."""
+    n = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+    for row in storage.iter_tasks(include_done=include_done, workspace=workspace):
+        for k in ("due_datetime",) + DATETIME_FIELDS:
+            if row.get(k) is not None:
+                row[k] = row[k].isoformat()
+        if fmt == "csv":
+            writer.writerow(row)
+        else:
+            out.write(json.dumps(row))
+            out.write("\n")
+        n += 1
+    return n
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="import tasks from a JSONL/CSV file ('-' for stdin)")
+    imp.add_argument("path")
+    imp.add_argument("--format", choices=("jsonl", "csv"))
+    imp.add_argument("--chunk", type=int, default=5000, help="rows per insert/transaction")
+    imp.add_argument("--workspace", default=storage.DEFAULT_WORKSPACE,
+                     help="workspace for rows that do not name one")
+    exp = sub.add_parser("export", help="export tasks to a JSONL/CSV file ('-' for stdout)")
+    exp.add_argument("path")
+    exp.add_argument("--format", choices=("jsonl", "csv"))
+    exp.add_argument("--open-only", action="store_true", help="skip completed tasks")
+    exp.add_argument("--workspace", help="export only this workspace (default: all)")
+    args = ap.parse_args(argv)
+
+    fmt = _fmt(args.path, args.format)
+    if args.command == "import":
+        # an admin command like `python models.py`: importing into a new database creates it
+        storage.migrate()
+        fp = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+        try:
+            n = import_tasks(validate(read_rows(fp, fmt), workspace=args.workspace), args.chunk)
+        except ValueError as e:
+            print(f"import failed: {e} (earlier chunks were committed)", file=sys.stderr)
+            return 1
+        finally:
+            if fp is not sys.stdin:
+                fp.close()
+        print(f"imported {n} tasks", file=sys.stderr)
+    else:
+        fp = sys.stdout if args.path == "-" else open(args.path, "w", newline="", encoding="utf-8")
+        try:
+            n = export_tasks(fp, fmt, include_done=not args.open_only, workspace=args.workspace)
+        finally:
+            if fp is not sys.stdout:
+                fp.close()
+        print(f"exported {n} tasks", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+# cache.py
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+
+class CompiledLists:
+    """One cached build: compiled lists for a data version, valid until expires_at (None = until the next write)."""
+    __slots__ = ("version", "etag", "lists", "payload", "expires_at", "rendered")
+
+    def __init__(self, version: int, etag: str, lists: tuple, payload: Dict[str, Any],
+                 expires_at: Optional[datetime]):
+        self.version = version
+        self.etag = etag
+        self.lists = lists        # (main_list, awaragardi_list, home_list) as task records
+        self.payload = payload    # the same lists serialized for JSON
+        self.expires_at = expires_at
+        self.rendered: Dict[str, Any] = {}  # output derived from this build (e.g. page fragments), filled lazily
+
+    def valid(self, version: int, now: datetime) -> bool:
+        return self.version == version and (self.expires_at is None or now < self.expires_at)
+
+
+class ListCache:
+    """
+    Read-through cache of the compiled canonical lists, one entry per workspace (LRU-bounded).
+    Entries are keyed by storage.data_version(workspace), so any committed write to the
+    workspace invalidates its entry; they also expire at the next moment the compiled order
+    depends on (see logic.time_boundaries).
+    Builds are serialized per workspace: concurrent misses for one workspace wait for one
+    build instead of all compiling, and nothing else waits for it (the cache-wide lock only
+    guards the dict).
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CompiledLists]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._building: Dict[str, List[Any]] = {}  # key -> [build lock, callers using it]
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0  # misses caused by a time boundary rather than a write
+
+    def get(self, key: str, version: int, now: datetime,
+            build: Callable[[int, datetime], CompiledLists]) -> CompiledLists:
+        entry = self.lookup(key, version, now)
+        if entry is not None:
+            return entry
+        with self._lock:
+            slot = self._building.setdefault(key, [threading.Lock(), 0])
+            slot[1] += 1
+        try:
+            with slot[0]:
+                # another caller may have built it while this one waited
+                with self._lock:
+                    entry = self._entries.get(key)
+                if entry is None or not entry.valid(version, now):
+                    entry = build(version, now)
+                    self.store(key, entry)
+                return entry
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if not slot[1]:
+                    del self._building[key]
+
+    def lookup(self, key: str, version: int, now: datetime) -> Optional[CompiledLists]:
+        """Non-blocking half of get() for async callers: the valid entry, or None (counted as a miss)."""
+        with self._lock:
+            return self._lookup(key, version, now)
+
+    def store(self, key: str, entry: CompiledLists) -> None:
+        """Insert an entry built after a lookup() miss (concurrent async misses may each build)."""
+        with self._lock:
+            self._store(key, entry)
+
+    def _lookup(self, key: str, version: int, now: datetime) -> Optional[CompiledLists]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.valid(version, now):
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+        self.misses += 1
+        if entry is not None and entry.version == version:
+            self.expirations += 1
+        return None
+
+    def _store(self, key: str, entry: CompiledLists) -> None:
+        current = self._entries.get(key)
+        if current is not None and current.version > entry.version:
+            return  # a slow build of an older version finished last
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / total if total else None,
+                "entries": len(self._entries),
+            }
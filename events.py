@@ -0,0 +1,125 @@
+# events.py
+import asyncio
+import queue
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Set, Tuple
+
+
+class Hub:
+    """
+    In-process pub/sub for data-change notifications.
+    Every subscriber owns a bounded queue; a slow subscriber never blocks publishers:
+    when its queue is full, pending events are coalesced into one.
+    The last `history` expiry removals are also kept, so a polling client (no subscription)
+    can still learn which tasks expired after the version it holds (expired_since).
+    """
+
+    def __init__(self, maxsize: int = 16, history: int = 64):
+        self.maxsize = maxsize
+        self._subs: Set[queue.Queue] = set()
+        self._lock = threading.Lock()
+        # (version, {workspace: removed ids}) of recent events that removed expired tasks
+        self._expired: Deque[Tuple[int, Dict[str, List[int]]]] = deque(maxlen=history)
+
+    def subscribe(self) -> queue.Queue:
+        q = queue.Queue(maxsize=self.maxsize)
+        with self._lock:
+            self._subs.add(q)
+        return q
+
+    def subscribe_async(self) -> "AsyncSubscription":
+        """Subscribe from a coroutine: events are delivered on the running event loop."""
+        sub = AsyncSubscription(asyncio.get_running_loop(), self.maxsize)
+        with self._lock:
+            self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, q: queue.Queue) -> None:
+        with self._lock:
+            self._subs.discard(q)
+
+    def expired_since(self, workspace: str, version: int) -> List[int]:
+        """Ids of workspace removed as expired by writes published after version (within the history)."""
+        with self._lock:
+            return [task_id for v, removed in self._expired if v > version
+                    for task_id in removed.get(workspace, ())]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subs)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            subs = list(self._subs)
+            if event.get("removed_expired"):
+                self._expired.append((event["version"], event["removed_expired"]))
+        for q in subs:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                q.put_nowait(coalesce(drain(q) + [event]))
+
+
+class AsyncSubscription:
+    """
+    Subscriber queue for asyncio consumers (asgi.py). Hub.publish runs on worker threads,
+    so events are handed to the loop with call_soon_threadsafe; same coalescing when full.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self._loop = loop
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def put_nowait(self, event: Dict[str, Any]) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            pass  # loop already closed; the subscriber is gone
+
+    def _put(self, event: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self._queue.put_nowait(coalesce(self.drain() + [event]))
+
+    async def get(self, timeout: float) -> Dict[str, Any]:
+        """Wait up to timeout seconds for the next event (raises asyncio.TimeoutError)."""
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+    def drain(self) -> List[Dict[str, Any]]:
+        events = []
+        while not self._queue.empty():
+            events.append(self._queue.get_nowait())
+        return events
+
+
+def drain(q: queue.Queue) -> List[Dict[str, Any]]:
+    """Pop every event currently waiting in q without blocking."""
+    events = []
+    while True:
+        try:
+            events.append(q.get_nowait())
+        except queue.Empty:
+            return events
+
+
+def coalesce(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge a burst of events: keep the newest version, the union of touched workspaces,
+    every removed_expired id (per workspace) and every due time.
+    """
+    workspaces = set()
+    removed: Dict[str, List[int]] = {}
+    due: List[Any] = []
+    for ev in events:
+        workspaces.update(ev.get("workspaces") or ())
+        for ws, ids in (ev.get("removed_expired") or {}).items():
+            removed.setdefault(ws, []).extend(ids)
+        due.extend(ev.get("due") or ())
+    return {"version": max((ev.get("version", 0) for ev in events), default=0),
+            "workspaces": sorted(workspaces), "removed_expired": removed, "due": due}
+
+
+# Process-wide hub; storage publishes, /api/stream and the expiry scheduler subscribe
+hub = Hub()
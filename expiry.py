@@ -0,0 +1,128 @@
+# expiry.py
+import logging
+import queue
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+import events, metrics, storage
+
+# Upper bound on a single sleep so wall-clock jumps (suspend, DST) are noticed
+MAX_SLEEP_SECONDS = 300.0
+# Seconds between compactions (done tasks still in the live table move to the archive,
+# claims of past template occurrences are dropped)
+COMPACT_INTERVAL_SECONDS = 3600.0
+# First pause after a failed iteration (missing schema, "database is locked"); doubles up to MAX_SLEEP_SECONDS
+ERROR_BACKOFF_SECONDS = 1.0
+
+log = logging.getLogger(__name__)
+
+
+class ExpiryScheduler:
+    """
+    Background thread that removes tasks when they come due.
+    Keeps only the earliest upcoming due_datetime (seeded with storage.next_due(), lowered by
+    the "due" field of events.hub notifications, re-anchored on storage.next_due() after
+    every sweep) and sleeps until it, so its memory does not grow with the number of writes
+    and request handlers never have to sweep for expired rows themselves.
+    An iteration that fails is logged and retried with a growing pause (re-seeding the next
+    due, since notifications may have been missed); the thread itself never dies of it.
+    Removed ids are published by storage.remove_expired, which is what drives the
+    "expired" toasts in connected clients.
+    It also runs storage.archive_done and storage.prune_occurrences on start and every
+    COMPACT_INTERVAL_SECONDS.
+    """
+
+    def __init__(self):
+        self._next_due: Optional[datetime] = None
+        self._thread = None
+        self._sub = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start the scheduler thread (idempotent; replaces a thread that has died)."""
+        if self._running():
+            return
+        with self._lock:
+            if self._running():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="expiry-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            sub = self._sub
+            if sub is not None:
+                try:
+                    sub.put_nowait({})  # wake the thread
+                except queue.Full:
+                    pass
+            thread.join()
+
+    def _push(self, dues) -> None:
+        for due in dues:
+            if self._next_due is None or due < self._next_due:
+                self._next_due = due
+
+    def _reanchor(self) -> None:
+        # the earliest open due is all the scheduler needs: each sweep re-anchors on the next one
+        self._next_due = storage.next_due()
+
+    def _run(self) -> None:
+        # subscribe before loading so no write between the two is missed
+        sub = self._sub = events.hub.subscribe()
+        backoff = ERROR_BACKOFF_SECONDS
+        seeded = False
+        next_compact = datetime.now()
+        try:
+            while not self._stop.is_set():
+                try:
+                    if not seeded:
+                        self._reanchor()
+                        seeded = True
+                    next_compact = self._step(sub, next_compact)
+                    backoff = ERROR_BACKOFF_SECONDS
+                except Exception:
+                    log.exception("expiry scheduler iteration failed; retrying in %gs", backoff)
+                    seeded = False
+                    self._stop.wait(backoff)
+                    backoff = min(backoff * 2, MAX_SLEEP_SECONDS)
+        finally:
+            events.hub.unsubscribe(sub)
+            self._sub = None
+
+    def _step(self, sub, next_compact: datetime) -> datetime:
+        """One wake-up: compact if due, sweep if a task came due, else wait. Returns the next compaction time."""
+        now = datetime.now()
+        if now >= next_compact:
+            with metrics.phase("archive_done"):
+                storage.archive_done(now)
+                storage.prune_occurrences(now)
+            next_compact = now + timedelta(seconds=COMPACT_INTERVAL_SECONDS)
+        if self._next_due is not None and self._next_due <= now:
+            with metrics.phase("remove_expired"):
+                storage.remove_expired(now)
+            # writers may only announce the earliest of many dues (bulk import): re-anchor on the table
+            self._reanchor()
+            return next_compact
+        timeout = min(MAX_SLEEP_SECONDS, (next_compact - now).total_seconds())
+        if self._next_due is not None:
+            timeout = min(timeout, (self._next_due - now).total_seconds())
+        try:
+            pending = [sub.get(timeout=timeout)] + events.drain(sub)
+        except queue.Empty:
+            return next_compact
+        self._push(events.coalesce(pending)["due"])
+        return next_compact
+
+
+# Process-wide scheduler; app.py starts it on the first request
+scheduler = ExpiryScheduler()
@@ -1,6 +1,10 @@
 # logic.py
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Optional, Tuple
+from records import TaskRecord, from_epoch, to_epoch
+
+# NumPy, imported by the first sort large enough to use it (see _numpy); False if not installed
+_np = None
 
 # Category base ranks (lower = higher priority)
 CATEGORY_RANK = {
@@ -10,108 +14,189 @@ CATEGORY_RANK = {
     "Awaragardi": 4
 }
 
-def _priority_key(task: Dict[str, Any], now: datetime) -> tuple:
+# College tasks due within this many hours jump to the top (effective rank 0)
+COLLEGE_BOOST_HOURS = 24
+_BOOST_US = COLLEGE_BOOST_HOURS * 3600 * 1000000
+# Sort key of a task without created_at (datetime.min, like before records)
+_NO_CREATED = to_epoch(datetime.min)
+# Reorderable sets at least this large are ranked with NumPy (when installed)
+NUMPY_MIN_TASKS = 2000
+
+def _rank_columns(tasks: List[TaskRecord], now_us: int) -> Tuple[list, list, list]:
     """
-    Compute a sort key for reorderable tasks.
-    Rules:
+    Sort-key columns of tasks: (due epochs, category rank codes, created epochs).
+    Ranks already include the College boost (0 when due within COLLEGE_BOOST_HOURS of now).
+    """
+    boost_until = now_us + _BOOST_US
+    rank = CATEGORY_RANK.get
+    dues = [t.due for t in tasks]
+    ranks = [rank(t.category, 99) for t in tasks]
+    created = [_NO_CREATED if t.created is None else t.created for t in tasks]
+    college = CATEGORY_RANK["College"]
+    for i, r in enumerate(ranks):
+        if r == college and dues[i] < boost_until:
+            ranks[i] = 0
+    return dues, ranks, created
+
+
+def _numpy():
+    """The numpy module, or None when it is not installed (sort_reorderable then uses Python)."""
+    global _np
+    if _np is None:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:
+            _np = False
+    return _np or None
+
+def _order_numpy(tasks: List[TaskRecord], now_us: int) -> List[int]:
+    np = _numpy()
+    n = len(tasks)
+    dues = np.fromiter((t.due for t in tasks), dtype=np.int64, count=n)
+    ranks = np.fromiter((CATEGORY_RANK.get(t.category, 99) for t in tasks), dtype=np.int64, count=n)
+    created = np.fromiter((_NO_CREATED if t.created is None else t.created for t in tasks), dtype=np.int64, count=n)
+    # College boost as one mask
+    ranks[(ranks == CATEGORY_RANK["College"]) & (dues < now_us + _BOOST_US)] = 0
+    # lexsort keys are given least significant first; it is stable, like sorted()
+    return np.lexsort((created, ranks, dues)).tolist()
+
+
+def _order_python(tasks: List[TaskRecord], now_us: int) -> List[int]:
+    keys = list(zip(*_rank_columns(tasks, now_us)))
+    return sorted(range(len(keys)), key=keys.__getitem__)
+
+
+def sort_reorderable(tasks: List[TaskRecord], now: datetime) -> List[TaskRecord]:
+    """
+    Return reorderable (unlocked, active) tasks sorted according to plan rules:
       1. Primary: earlier due_datetime sorts first.
       2. If due_datetime is same, category priority applies:
          Necessary < College < Home < Awaragardi.
       3. College tasks due in <24h get topmost priority (effective rank 0).
-      4. Earlier created tasks break ties.
+      4. Earlier created tasks break ties (then the input order).
+    Ranked over int columns (see _rank_columns); large sets use one NumPy lexsort when
+    NumPy is installed, with the same result as the pure-Python order.
     """
-    due = task["due_datetime"]
-    hours_left = (due - now).total_seconds() / 3600.0
-
-    # College boost
-    if task.get("category") == "College" and hours_left < 24:
-        category_rank = 0
+    now_us = to_epoch(now)
+    valid = [t for t in tasks if not t.is_done and not t.locked and t.due > now_us]
+    if len(valid) >= NUMPY_MIN_TASKS and _numpy() is not None:
+        order = _order_numpy(valid, now_us)
     else:
-        category_rank = CATEGORY_RANK.get(task.get("category"), 99)
-
-    # Sort primarily by due time, then category rank, then creation time
-    created_at = task.get("created_at") or datetime.min
-    return (due, category_rank, created_at)
+        order = _order_python(valid, now_us)
+    return [valid[i] for i in order]
 
-
-def sort_reorderable(tasks: List[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+class _FreeSlots:
     """
-    Return reorderable (unlocked, active) tasks sorted according to plan rules.
+    Union-find "next free slot" over main-list positions.
+    find(p) returns the smallest unoccupied slot >= p in near-constant amortized time.
+    Backed by a dict so sparse, very large fixed_pos values cost nothing.
     """
-    valid = []
-    for t in tasks:
-        if t.get("is_done"):
-            continue
-        if t.get("locked"):
-            continue
-        if t.get("due_datetime") <= now:
-            continue
-        valid.append(t)
+    __slots__ = ("_parent",)
+
+    def __init__(self):
+        self._parent: Dict[int, int] = {}
 
-    # Sort by primary due time, then category, then created_at
-    return sorted(valid, key=lambda t: _priority_key(t, now))
+    def find(self, pos: int) -> int:
+        parent = self._parent
+        root = pos
+        while root in parent:
+            root = parent[root]
+        # path compression
+        while pos in parent and parent[pos] != root:
+            parent[pos], pos = root, parent[pos]
+        return root
 
-def compile_main(all_tasks: List[Dict[str, Any]], now: datetime = None) -> List[Dict[str, Any]]:
+    def take(self, pos: int) -> None:
+        """Mark slot pos as occupied (it must currently be free)."""
+        self._parent[pos] = pos + 1
+
+
+def compile_main(all_tasks: List[TaskRecord], now: datetime = None) -> List[TaskRecord]:
     """
-    Build the ordered 'Main' list (mix of fixed + reorderable) from all task dicts.
+    Build the ordered 'Main' list (mix of fixed + reorderable) from all task records.
     Rules:
       - Fixed tasks (locked==True) must appear at/near their fixed_pos.
       - Reorderable tasks fill the empty slots in order produced by sort_reorderable().
       - If fixed positions collide, later fixed tasks are shifted to the next free slot.
       - The resulting list contains only tasks that are not done and not expired (due > now).
-    Returns: ordered list of task dicts for rendering in Main.
+    Returns: ordered list of task records for rendering in Main.
+
+    Runs in O(n log n): fixed tasks are placed through a union-find of free slots and
+    reorderable tasks are merged into the gaps in a single pass.
     """
     if now is None:
         now = datetime.now()
+    now_us = to_epoch(now)
 
-    # Separate task buckets
-    fixed_tasks = [t for t in all_tasks if t.get("locked") and not t.get("is_done")]
-    # Only consider fixed tasks with a valid fixed_pos; if missing, treat as reorderable
-    fixed_tasks = [t for t in fixed_tasks if isinstance(t.get("fixed_pos"), int) and t.get("due_datetime") > now]
-
-    reorderable = sort_reorderable(all_tasks, now)
-
-    # Determine size: at least enough to hold fixed positions and all items
-    max_fixed_pos = max([t["fixed_pos"] for t in fixed_tasks], default=-1)
-    needed_slots = max(max_fixed_pos + 1, len(fixed_tasks) + len(reorderable))
-
-    # Create empty slots
-    main_slots: List[Dict[str, Any] | None] = [None] * needed_slots
+    # Only consider fixed tasks with a valid fixed_pos; locked tasks without one are not reorderable either
+    fixed_tasks = [
+        t for t in all_tasks
+        if t.locked and not t.is_done
+        and isinstance(t.fixed_pos, int) and t.due > now_us
+    ]
+    fixed_ids = {t.id for t in fixed_tasks}
 
     # Place fixed tasks at their fixed_pos (resolve collisions by shifting forward)
-    for ft in sorted(fixed_tasks, key=lambda x: x["fixed_pos"]):
-        pos = ft["fixed_pos"]
-        if pos < 0:
-            pos = 0
-        while pos < len(main_slots) and main_slots[pos] is not None:
-            pos += 1
-        if pos >= len(main_slots):
-            main_slots.append(None)
-        main_slots[pos] = ft
-
-    # Fill empty slots with reorderable tasks left-to-right
-    idx = 0
-    for r in reorderable:
-        # skip tasks that are already in fixed (defensive)
-        if any(r.get("id") == ft.get("id") for ft in fixed_tasks):
-            continue
-        while idx < len(main_slots) and main_slots[idx] is not None:
-            idx += 1
-        if idx >= len(main_slots):
-            main_slots.append(None)
-        main_slots[idx] = r
-        idx += 1
-
-    # Compact and return only non-None entries, and also ensure no expired/done slipped in
-    final = [t for t in main_slots if t is not None and not t.get("is_done") and t.get("due_datetime") > now]
+    free = _FreeSlots()
+    placed = []
+    for ft in sorted(fixed_tasks, key=lambda x: x.fixed_pos):
+        pos = free.find(max(ft.fixed_pos, 0))
+        free.take(pos)
+        placed.append((pos, ft))
+    placed.sort(key=lambda p: p[0])
+
+    # Fill the gaps before each fixed slot with reorderable tasks left-to-right
+    reorderable = [r for r in sort_reorderable(all_tasks, now) if r.id not in fixed_ids]
+    final: List[TaskRecord] = []
+    ri = 0
+    for k, (pos, ft) in enumerate(placed):
+        # slots before pos that are not taken by earlier fixed tasks
+        take = min(pos - k, len(reorderable)) - ri
+        if take > 0:
+            final.extend(reorderable[ri:ri + take])
+            ri += take
+        final.append(ft)
+    final.extend(reorderable[ri:])
     return final
 
-def expired_tasks(tasks: List[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+def time_boundaries(tasks: List[TaskRecord], now: datetime) -> Tuple[int, Optional[datetime]]:
+    """
+    Describe how compile_main(tasks, t) depends on the clock, without compiling.
+    Returns (crossed, next_change):
+      - crossed: boundaries already passed at now (due times reached, College boost windows entered).
+        For a fixed task set it only grows with time, so it identifies the time-dependent state.
+      - next_change: earliest boundary after now, or None. The result cannot change before it.
+    """
+    now_us = to_epoch(now)
+    crossed = 0
+    next_change = None
+    for t in tasks:
+        if t.is_done:
+            continue
+        due = t.due
+        # dropped from Main once due <= now
+        if due <= now_us:
+            crossed += 1
+            continue
+        if next_change is None or due < next_change:
+            next_change = due
+        # boosted once (due - now) < 24h, i.e. strictly after due - 24h
+        if t.category == "College":
+            start = due - _BOOST_US
+            if now_us > start:
+                crossed += 1
+            elif next_change is None or start < next_change:
+                next_change = start
+    return crossed, from_epoch(next_change)
+
+def expired_tasks(tasks: List[TaskRecord], now: datetime) -> List[TaskRecord]:
     """
     Return a list of tasks whose due_datetime <= now (expired).
     Use this so the caller can remove them and show notifications.
     """
-    return [t for t in tasks if t.get("due_datetime") <= now and not t.get("is_done")]
+    now_us = to_epoch(now)
+    return [t for t in tasks if t.due <= now_us and not t.is_done]
 
 # Demo runner
 if __name__ == "__main__":
@@ -121,5 +206,5 @@ if __name__ == "__main__":
         {"id": 2, "title": "B", "category": "College", "due_datetime": now + timedelta(hours=20), "locked": False, "created_at": now - timedelta(hours=2), "is_done": False},
         {"id": 3, "title": "C", "category": "Home", "due_datetime": now + timedelta(hours=10), "locked": True, "fixed_pos": 0, "created_at": now - timedelta(hours=3), "is_done": False},
     ]
-    main = compile_main(demo, now=now)
+    main = compile_main([TaskRecord.from_dict(t) for t in demo], now=now)
     print("Compiled Main order:", [t["title"] for t in main])
\ No newline at end of file
@@ -0,0 +1,183 @@
+# metrics.py
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds of the SQL-statements-per-request histogram buckets
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Prometheus-style histogram with one series per label tuple."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: Dict[tuple, list] = {}  # labels -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float) -> None:
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    s[i] += 1
+                    break
+            s[-2] += 1
+            s[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((k, list(v)) for k, v in self._series.items())
+        for labels, s in series:
+            label_str = ",".join(f'{n}="{v}"' for n, v in zip(self.label_names, labels))
+            sep = "," if label_str else ""
+            cumulative = 0
+            for bound, n in zip(self.buckets, s):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{label_str}{sep}le="{bound:g}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_str}{sep}le="+Inf"}} {s[-2]}')
+            lines.append(f"{self.name}_sum{{{label_str}}} {s[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{label_str}}} {s[-2]}")
+        return lines
+
+
+request_seconds = Histogram("todo_request_duration_seconds", "Time spent handling a request.",
+                            ("endpoint",), LATENCY_BUCKETS)
+phase_seconds = Histogram("todo_request_phase_seconds", "Time spent in one phase of a request.",
+                          ("endpoint", "phase"), LATENCY_BUCKETS)
+sql_statements = Histogram("todo_request_sql_statements", "SQL statements executed per request.",
+                           ("endpoint",), STATEMENT_BUCKETS)
+
+# Instrumentation is opt-in: until enable() is called phase() is a no-op and no SQL hook is installed
+enabled = False
+_enable_lock = threading.Lock()
+_local = threading.local()
+# One profiled request at a time: a threaded server overlaps requests, and cProfile allows a
+# single active profiler per process on newer Pythons ("Another profiling tool is already active")
+_profile_lock = threading.Lock()
+
+
+class RequestStats:
+    """Timings of the request being handled on this thread."""
+    __slots__ = ("endpoint", "started", "phases", "statements", "profiler")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.statements = 0
+        self.profiler: Optional["cProfile.Profile"] = None
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    stats = getattr(_local, "stats", None)
+    if stats is not None:
+        stats.statements += 1
+
+
+def enable(engine) -> None:
+    """Turn instrumentation on for this process and start counting SQL statements on engine (idempotent)."""
+    global enabled
+    from sqlalchemy import event
+    with _enable_lock:
+        if enabled:
+            return
+        event.listen(engine, "before_cursor_execute", _count_statement)
+        enabled = True
+
+
+def begin_request(endpoint: str, profile: bool = False) -> None:
+    """
+    Start recording a request on this thread. With profile it is also profiled, unless another
+    request is being profiled right now (or another profiler is active): then it just runs.
+    """
+    stale = getattr(_local, "stats", None)
+    if stale is not None and stale.profiler is not None:  # a profiled request on this thread never ended
+        stale.profiler.disable()
+        _profile_lock.release()
+    stats = _local.stats = RequestStats(endpoint or "unknown")
+    if profile and _profile_lock.acquire(blocking=False):
+        import cProfile  # only profiled requests need it
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            _profile_lock.release()
+            return
+        stats.profiler = profiler
+
+
+def end_request(profile_dir: Optional[str] = None) -> Tuple[Optional[RequestStats], Optional[str]]:
+    """
+    Record the current request in the histograms.
+    Returns (stats, path of the cProfile dump or None); (None, None) outside a recorded request.
+    """
+    stats = getattr(_local, "stats", None)
+    if stats is None:
+        return None, None
+    _local.stats = None
+    path = None
+    if stats.profiler is not None:
+        stats.profiler.disable()
+        _profile_lock.release()
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+            path = os.path.join(profile_dir, f"{stats.endpoint}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+                                             f"-{threading.get_ident()}.prof")
+            stats.profiler.dump_stats(path)
+    request_seconds.observe((stats.endpoint,), time.perf_counter() - stats.started)
+    sql_statements.observe((stats.endpoint,), stats.statements)
+    for name, seconds in stats.phases.items():
+        phase_seconds.observe((stats.endpoint, name), seconds)
+    return stats, path
+
+
+@contextmanager
+def phase(name: str):
+    """
+    Time a block as phase name of the current request (summed if entered repeatedly).
+    Outside a request (e.g. the expiry scheduler) the block is recorded under endpoint "background".
+    """
+    if not enabled:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        stats = getattr(_local, "stats", None)
+        if stats is None:
+            phase_seconds.observe(("background", name), elapsed)
+        else:
+            stats.phases[name] = stats.phases.get(name, 0.0) + elapsed
+
+
+def server_timing(stats: RequestStats) -> str:
+    """Server-Timing header value for the phases of stats (durations in ms)."""
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in stats.phases.items()]
+    parts.append(f'sql;desc="{stats.statements} statements"')
+    return ", ".join(parts)
+
+
+def render(extra: Optional[Dict[str, Tuple[str, str, float]]] = None) -> str:
+    """
+    All histograms in Prometheus text format.
+    extra: name -> (type, help, value) for single-value counters/gauges owned elsewhere.
+    """
+    lines = []
+    for hist in (request_seconds, phase_seconds, sql_statements):
+        lines.extend(hist.render())
+    for name, (kind, help_text, value) in (extra or {}).items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
@@ -1,26 +1,101 @@
 # models.py
+"""
+Schema and database connection. Importing this module opens nothing: the engine is created
+on first use in each process (get_engine), and the schema is only created or upgraded by
+migrate(), run explicitly with `python models.py` (and by `python app.py` before serving).
+"""
 import os
+import threading
 from datetime import datetime
 from sqlalchemy import (
-    create_engine, Column, Integer, String, DateTime, Boolean
+    create_engine, event, make_url, Column, Integer, String, DateTime, Boolean, Index, inspect, text
 )
 from sqlalchemy.orm import declarative_base, sessionmaker
+# The dialect module is most of create_engine's cost: importing it here lets workers forked
+# from a preloaded app inherit it, so each only builds its engine object
+import sqlalchemy.dialects.sqlite.pysqlite  # noqa: F401
 
-# Ensure db directory exists
-os.makedirs("db", exist_ok=True)
+# SQLite file path (TODO_DB_URL overrides it, e.g. for benchmarks on a scratch database)
+DB_URL = os.environ.get("TODO_DB_URL", "sqlite:///db/tasks.db")
 
-# SQLite file path
-DB_URL = "sqlite:///db/tasks.db"
+# Seconds a connection waits on SQLite's write lock before raising "database is locked"
+BUSY_TIMEOUT = 30
 
-# SQLAlchemy base and engine setup
 Base = declarative_base()
-engine = create_engine(DB_URL, echo=False, future=True)
-Session = sessionmaker(bind=engine)
+
+# This process's (engine, write engine), and the pid that created them
+_engines = None
+_engines_pid = None
+_engines_lock = threading.Lock()
+
+def _sqlite_on_connect(dbapi_conn, _record):
+    # WAL lets readers run alongside the single writer; NORMAL sync is durable enough under WAL
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT * 1000}")
+    cur.close()
+    # let SQLAlchemy emit BEGIN itself (see _sqlite_on_begin)
+    dbapi_conn.isolation_level = None
+
+def _sqlite_on_begin(conn):
+    # Write sessions take the write lock up front: a deferred transaction that reads and then
+    # writes can fail immediately with SQLITE_BUSY instead of waiting for busy_timeout.
+    conn.exec_driver_sql(f"BEGIN {conn.get_execution_options().get('sqlite_begin', 'DEFERRED')}")
+
+def _create_engines():
+    database = make_url(DB_URL).database
+    if database and database != ":memory:":
+        # Ensure db directory exists
+        os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+    engine = create_engine(
+        DB_URL, echo=False, future=True,
+        connect_args={"timeout": BUSY_TIMEOUT, "check_same_thread": False},
+        pool_size=10, max_overflow=20, pool_timeout=BUSY_TIMEOUT,
+    )
+    event.listen(engine, "connect", _sqlite_on_connect)
+    event.listen(engine, "begin", _sqlite_on_begin)
+    # plus the same engine for sessions that are going to write (storage.unit_of_work)
+    return engine, engine.execution_options(sqlite_begin="IMMEDIATE")
+
+def _get_engines():
+    global _engines, _engines_pid
+    pid = os.getpid()
+    if _engines_pid != pid:
+        with _engines_lock:
+            if _engines_pid != pid:
+                if _engines is None:
+                    _engines = _create_engines()
+                else:
+                    # forked after the parent connected: a new pool (the write engine shares it),
+                    # leaving the parent's connections alone; statement caches carry over
+                    _engines[0].dispose(close=False)
+                _engines_pid = pid
+    return _engines
+
+def get_engine():
+    """The SQLAlchemy engine (created on first use; given a fresh connection pool after a fork)."""
+    return _get_engines()[0]
+
+def async_url(url: str = DB_URL) -> str:
+    """The same database for the aiosqlite driver (used by astorage)."""
+    return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+_sessions = sessionmaker()
+
+def Session():
+    """A new session on this process's engine."""
+    return _sessions(bind=get_engine())
+
+def WriteSession():
+    """A new session whose transactions begin IMMEDIATE (see _sqlite_on_begin)."""
+    return _sessions(bind=_get_engines()[1])
 
 class Task(Base):
     __tablename__ = "tasks"
 
     id = Column(Integer, primary_key=True)
+    workspace = Column(String, nullable=False, default="default")  # Owner workspace/user key; every query is scoped to it
     title = Column(String, nullable=False)           # Task title
     category = Column(String, nullable=False)        # Necessary / College / Home / Awaragardi
     due_datetime = Column(DateTime, nullable=False)  # Due date & time
@@ -32,11 +107,25 @@ class Task(Base):
     in_main = Column(Boolean, default=False)         # True if task currently placed in Main workspace
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1)  # Bumped by every ORM update of the row (compare-and-swap)
+
+    __table_args__ = (
+        # Canonical list queries, per workspace: open tasks split by Main membership and category bank
+        Index("ix_tasks_ws_lists", "workspace", "is_done", "in_main", "category"),
+        # Expiry sweep (across workspaces): open tasks ordered by due time
+        Index("ix_tasks_open_due", "is_done", "due_datetime"),
+        # ids are never reused: completed/expired rows are deleted, and their ids live on in
+        # tasks_archive.task_id, template_occurrences.task_id and clients' compare-and-swap writes
+        {"sqlite_autoincrement": True},
+    )
+    # UPDATE/DELETE of a loaded row match its version and raise StaleDataError if it moved on
+    __mapper_args__ = {"version_id_col": version}
 
     def as_dict(self):
         """Return a plain dict useful for logic/rendering."""
         return {
             "id": self.id,
+            "workspace": self.workspace,
             "title": self.title,
             "category": self.category,
             "due_datetime": self.due_datetime,
@@ -48,9 +137,147 @@ class Task(Base):
             "in_main": self.in_main,
             "created_at": self.created_at,
             "updated_at": self.updated_at,
+            "version": self.version,
         }
 
+class ArchivedTask(Base):
+    """A completed task, moved out of tasks so the live table only holds open work (see storage.archive_done)."""
+    __tablename__ = "tasks_archive"
+
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, nullable=False)        # id the task had in tasks
+    workspace = Column(String, nullable=False, default="default")
+    title = Column(String, nullable=False)
+    category = Column(String, nullable=False)
+    due_datetime = Column(DateTime, nullable=False)
+    part_label = Column(String, nullable=True)
+    is_gym = Column(Boolean, default=False)
+    in_main = Column(Boolean, default=False)
+    created_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=False)  # When it was archived (local time, like due_datetime)
+
+    __table_args__ = (
+        # History queries: a workspace's completions in a date range, newest first
+        Index("ix_tasks_archive_ws_completed", "workspace", "completed_at"),
+    )
+
+    def as_dict(self):
+        """Return a plain dict of the archived task."""
+        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+
+class TaskTemplate(Base):
+    """A recurring task: one row stands for its whole series of occurrences (see recurrence.py)."""
+    __tablename__ = "task_templates"
+
+    id = Column(Integer, primary_key=True)
+    workspace = Column(String, nullable=False, default="default")
+    title = Column(String, nullable=False)
+    category = Column(String, nullable=False)
+    part_label = Column(String, nullable=True)
+    is_gym = Column(Boolean, default=False)
+    in_main = Column(Boolean, default=False)
+    freq = Column(String, nullable=False)             # daily / weekly / monthly
+    interval = Column(Integer, nullable=False, default=1)  # every interval days/weeks/months
+    start = Column(DateTime, nullable=False)          # Due time of the first occurrence
+    until = Column(DateTime, nullable=True)           # No occurrence is due after this (None = open-ended)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # List builds load a workspace's live templates
+        Index("ix_task_templates_ws", "workspace", "until"),
+    )
+
+class TemplateOccurrence(Base):
+    """
+    An occurrence of a template that became a real task (it was edited, moved, locked, done or
+    deleted), so recurrence.expand no longer generates it. Rows due in the past are pruned.
+    """
+    __tablename__ = "template_occurrences"
+
+    template_id = Column(Integer, primary_key=True)
+    occurrence = Column(Integer, primary_key=True)    # Index in the series (0 = start)
+    workspace = Column(String, nullable=False, default="default")
+    due_datetime = Column(DateTime, nullable=False)   # Scheduled due time of the occurrence
+    task_id = Column(Integer, nullable=True)          # The tasks row it became
+
+    __table_args__ = (
+        # List builds load a workspace's claims still ahead of now
+        Index("ix_template_occurrences_ws_due", "workspace", "due_datetime"),
+    )
+
+class WorkspaceVersion(Base):
+    """
+    Data version of a workspace, advanced in the transaction of every write to it, so all
+    worker processes on the database agree on when cached lists are stale (storage.data_version).
+    """
+    __tablename__ = "workspace_versions"
+
+    workspace = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False)
+
+def _rebuild_with_autoincrement(conn, table, id_floors):
+    """
+    Recreate an existing table whose integer key was declared without AUTOINCREMENT (SQLite
+    cannot alter it in place), keeping its rows, and start its id sequence above id_floors
+    (SQL scalars of ids handed out before) so deleted ids are not reused.
+    """
+    sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                       {"name": table.name}).scalar()
+    if sql is None or "AUTOINCREMENT" in sql.upper():
+        return
+    old = f"_{table.name}_old"
+    indexes = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index' "
+                                "AND tbl_name = :name AND sql IS NOT NULL"), {"name": table.name}).scalars().all()
+    for index_name in indexes:
+        conn.execute(text(f"DROP INDEX {index_name}"))
+    conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {old}"))
+    table.create(conn)
+    cols = ", ".join(c.name for c in table.columns)
+    conn.execute(text(f"INSERT INTO {table.name} ({cols}) SELECT {cols} FROM {old}"))
+    conn.execute(text(f"DROP TABLE {old}"))
+    floors = [f"(SELECT MAX(id) FROM {table.name})", *id_floors]
+    floor = f"MAX({', '.join(f'COALESCE({f}, 0)' for f in floors)}, 0)"
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {"name": table.name})
+    conn.execute(text(f"INSERT INTO sqlite_sequence (name, seq) VALUES (:name, {floor})"), {"name": table.name})
+
+def migrate(bind=None):
+    """
+    Create the schema, or bring an existing database up to it (safe to call multiple times).
+    create_all() only creates missing tables, so columns and indexes added later
+    are applied here for db/tasks.db files created by older versions.
+    """
+    if bind is None:
+        bind = get_engine()
+    Base.metadata.create_all(bind)
+    insp = inspect(bind)
+    with bind.begin() as conn:
+        for table in (Task.__table__, ArchivedTask.__table__, TaskTemplate.__table__,
+                      TemplateOccurrence.__table__, WorkspaceVersion.__table__):
+            existing_cols = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in existing_cols:
+                    continue
+                ddl_type = col.type.compile(dialect=bind.dialect)
+                default = col.default.arg if col.default is not None and col.default.is_scalar else None
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {col.name} {ddl_type}"
+                if default is not None:
+                    ddl += f" DEFAULT {int(default) if isinstance(default, bool) else repr(default)}"
+                conn.execute(text(ddl))
+            # drop indexes an older schema defined but the model no longer does
+            wanted = {idx.name for idx in table.indexes}
+            for old in insp.get_indexes(table.name):
+                if old["name"].startswith(f"ix_{table.name}_") and old["name"] not in wanted:
+                    conn.execute(text(f"DROP INDEX {old['name']}"))
+            for idx in table.indexes:
+                idx.create(conn, checkfirst=True)
+        # databases created before tasks used AUTOINCREMENT
+        _rebuild_with_autoincrement(conn, Task.__table__, (
+            f"(SELECT MAX(task_id) FROM {ArchivedTask.__tablename__})",
+            f"(SELECT MAX(task_id) FROM {TemplateOccurrence.__tablename__})",
+        ))
+
 if __name__ == "__main__":
-    # Create tables (runs once). Use this to initialize the DB.
-    Base.metadata.create_all(engine)
-    print("Database & tables created at db/tasks.db")
+    # Create tables / apply migrations. Use this to initialize or upgrade the DB.
+    migrate()
+    print(f"Database & tables created/migrated at {DB_URL}")
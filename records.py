@@ -0,0 +1,105 @@
+# records.py
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+# Datetimes travel as integer microseconds since this (naive) origin: the stored local
+# wall-clock time taken literally, so conversions never depend on the timezone or DST.
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch(dt: Optional[datetime]) -> Optional[int]:
+    if dt is None:
+        return None
+    d = dt - EPOCH
+    return (d.days * 86400 + d.seconds) * 1000000 + d.microseconds
+
+
+def from_epoch(us: Optional[int]) -> Optional[datetime]:
+    if us is None:
+        return None
+    return EPOCH + timedelta(0, 0, us)
+
+
+def iso(us: Optional[int]) -> Optional[str]:
+    """ISO string of an epoch value (same text as datetime.isoformat())."""
+    if us is None:
+        return None
+    return (EPOCH + timedelta(0, 0, us)).isoformat()
+
+
+class TaskRecord:
+    """
+    Compact task row used from storage through logic.py to the JSON boundary.
+    due/created/updated are epoch ints (see to_epoch) so sorting compares plain ints;
+    due_datetime/created_at/updated_at rebuild datetimes on demand (templates, writes).
+    version is the row's compare-and-swap counter (0 for a generated occurrence, never stored).
+    Also readable like the old task dicts (task["title"], task.get("fixed_pos")).
+    """
+    __slots__ = ("id", "title", "category", "due", "locked", "fixed_pos", "part_label",
+                 "is_done", "is_gym", "in_main", "created", "updated", "version")
+
+    def __init__(self, id, title, category, due, locked, fixed_pos, part_label,
+                 is_done, is_gym, in_main, created, updated, version=0):
+        self.id = id
+        self.title = title
+        self.category = category
+        self.due = due
+        self.locked = locked
+        self.fixed_pos = fixed_pos
+        self.part_label = part_label
+        self.is_done = is_done
+        self.is_gym = is_gym
+        self.in_main = in_main
+        self.created = created
+        self.updated = updated
+        self.version = version
+
+    @classmethod
+    def from_dict(cls, task: Dict[str, Any]) -> "TaskRecord":
+        """Build a record from a task dict with datetime values (tests, benchmarks, demos)."""
+        return cls(task.get("id"), task.get("title"), task.get("category"), to_epoch(task["due_datetime"]),
+                   bool(task.get("locked")), task.get("fixed_pos"), task.get("part_label"),
+                   bool(task.get("is_done")), bool(task.get("is_gym")), bool(task.get("in_main")),
+                   to_epoch(task.get("created_at")), to_epoch(task.get("updated_at")), task.get("version", 0))
+
+    @property
+    def due_datetime(self) -> datetime:
+        return from_epoch(self.due)
+
+    @property
+    def created_at(self) -> Optional[datetime]:
+        return from_epoch(self.created)
+
+    @property
+    def updated_at(self) -> Optional[datetime]:
+        return from_epoch(self.updated)
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def __repr__(self) -> str:
+        return f"TaskRecord(id={self.id!r}, title={self.title!r}, category={self.category!r}, due={iso(self.due)})"
+
+    def as_json(self) -> Dict[str, Any]:
+        """The task's JSON object (the /api/tasks shape); datetimes become ISO strings here."""
+        return {
+            "id": self.id,
+            "title": self.title,
+            "category": self.category,
+            "due_datetime": iso(self.due),
+            "locked": self.locked,
+            "fixed_pos": self.fixed_pos,
+            "part_label": self.part_label,
+            "is_done": self.is_done,
+            "is_gym": self.is_gym,
+            "in_main": self.in_main,
+            "created_at": iso(self.created),
+            "updated_at": iso(self.updated),
+            "version": self.version,
+        }
@@ -0,0 +1,145 @@
+# recurrence.py
+"""
+Recurring tasks. A template (models.TaskTemplate) with a rule stands for a whole series of
+occurrences, none of which is stored: expand() generates the ones due inside the look-ahead
+window as TaskRecords, which go through compile_main and the side lists like any other task.
+An occurrence only becomes a real tasks row when someone acts on it (see storage._get_row);
+from then on it is "claimed" and expand() skips it.
+"""
+import calendar
+from datetime import datetime, timedelta
+from typing import AbstractSet, Iterable, Iterator, Optional, Tuple
+
+from records import TaskRecord, from_epoch, to_epoch
+
+FREQUENCIES = ("daily", "weekly", "monthly")
+
+# Occurrences are generated this far ahead of now
+LOOKAHEAD_DAYS = 14
+_DAY_US = 86400 * 1000000
+_STEP_US = {"daily": _DAY_US, "weekly": 7 * _DAY_US}
+
+# Generated occurrences have no row id: they get ids above every real one that encode
+# (template id, index in the series), and stay below 2**53 so JavaScript reads them exactly
+OCCURRENCE_ID_BASE = 1 << 52
+_INDEX_BITS = 20
+MAX_OCCURRENCES = 1 << _INDEX_BITS  # longer series end there
+
+
+def occurrence_id(template_id: int, n: int) -> int:
+    return OCCURRENCE_ID_BASE + (template_id << _INDEX_BITS) + n
+
+
+def split_id(task_id: int) -> Optional[Tuple[int, int]]:
+    """(template id, index) of a generated occurrence's id, or None for a real task id."""
+    if task_id < OCCURRENCE_ID_BASE:
+        return None
+    rest = task_id - OCCURRENCE_ID_BASE
+    return rest >> _INDEX_BITS, rest & (MAX_OCCURRENCES - 1)
+
+
+class Template:
+    """A template row as logic needs it; start/until/created are epoch ints like TaskRecord's."""
+    __slots__ = ("id", "title", "category", "part_label", "is_gym", "in_main", "freq", "interval",
+                 "start", "until", "created")
+
+    def __init__(self, id, title, category, part_label, is_gym, in_main, freq, interval, start, until, created):
+        self.id = id
+        self.title = title
+        self.category = category
+        self.part_label = part_label
+        self.is_gym = is_gym
+        self.in_main = in_main
+        self.freq = freq
+        self.interval = interval
+        self.start = start
+        self.until = until
+        self.created = created
+
+    def due(self, n: int) -> Optional[int]:
+        """Due time of occurrence n, or None if the series ends before it."""
+        if n < 0 or n >= MAX_OCCURRENCES:
+            return None
+        step = _STEP_US.get(self.freq)
+        if step is not None:
+            due = self.start + n * self.interval * step
+        else:
+            # monthly: same day of the month (clamped to the month's length) and time of day
+            first = from_epoch(self.start)
+            months = first.month - 1 + n * self.interval
+            year, month = first.year + months // 12, months % 12 + 1
+            if year > 9999:
+                return None
+            day = min(first.day, calendar.monthrange(year, month)[1])
+            due = to_epoch(first.replace(year=year, month=month, day=day))
+        if self.until is not None and due > self.until:
+            return None
+        return due
+
+    def first_after(self, t: int) -> int:
+        """Index of the first occurrence due after t (past the end of a finished series)."""
+        if t < self.start:
+            return 0
+        step = _STEP_US.get(self.freq)
+        if step is not None:
+            return (t - self.start) // (self.interval * step) + 1
+        first, at = from_epoch(self.start), from_epoch(t)
+        n = max(0, ((at.year - first.year) * 12 + at.month - first.month) // self.interval - 1)
+        while True:
+            due = self.due(n)
+            if due is None or due > t:
+                return n
+            n += 1
+
+    def occurrence(self, n: int, due: int) -> TaskRecord:
+        return TaskRecord(occurrence_id(self.id, n), self.title, self.category, due, False, None,
+                          self.part_label, False, self.is_gym, self.in_main, self.created, self.created)
+
+
+def _lookahead_us(lookahead: Optional[timedelta]) -> int:
+    if lookahead is None:
+        return LOOKAHEAD_DAYS * _DAY_US
+    return (lookahead.days * 86400 + lookahead.seconds) * 1000000 + lookahead.microseconds
+
+
+def expand(templates: Iterable[Template], now: datetime, claimed: AbstractSet[Tuple[int, int]] = frozenset(),
+           lookahead: Optional[timedelta] = None) -> Iterator[TaskRecord]:
+    """
+    Yield the occurrences of templates due in (now, now + lookahead], except claimed
+    (template id, index) pairs. Work is per template plus per occurrence yielded: how long
+    a series runs, or how much of it has passed, costs nothing.
+    """
+    now_us = to_epoch(now)
+    end = now_us + _lookahead_us(lookahead)
+    for tpl in templates:
+        n = tpl.first_after(now_us)
+        while True:
+            due = tpl.due(n)
+            if due is None or due > end:
+                break
+            if (tpl.id, n) not in claimed:
+                yield tpl.occurrence(n, due)
+            n += 1
+
+
+def time_boundaries(templates: Iterable[Template], now: datetime,
+                    lookahead: Optional[timedelta] = None) -> Tuple[int, Optional[datetime]]:
+    """
+    logic.time_boundaries for the generated occurrences. Returns (passed, next_change):
+      - passed: occurrences that have entered the window plus those that have left it. Both only
+        grow with time, so passed changes whenever expand()'s output does.
+      - next_change: the next moment an occurrence enters or leaves the window, or None.
+    """
+    now_us = to_epoch(now)
+    ahead = _lookahead_us(lookahead)
+    passed = 0
+    next_change = None
+    for tpl in templates:
+        left, entered = tpl.first_after(now_us), tpl.first_after(now_us + ahead)
+        passed += left + entered
+        leaving, entering = tpl.due(left), tpl.due(entered)
+        # an occurrence leaves the window when it comes due and enters it lookahead before that
+        for at in (leaving, None if entering is None else entering - ahead):
+            if at is not None and (next_change is None or at < next_change):
+                next_change = at
+    return passed, from_epoch(next_change)
@@ -38,7 +38,7 @@ function showToast(message, ttl = 5000) {
 }
 
 // ---- rendering ----
-function renderTaskItem(t) {
+function renderTaskItem(t, index) {
   const dueIso = t.due_datetime || t.due || '';
   const dueDate = dueIso ? new Date(dueIso) : null;
   const dueStr = dueDate && !isNaN(dueDate.getTime())
@@ -51,7 +51,8 @@ function renderTaskItem(t) {
     <li class="list-group-item d-flex justify-content-between align-items-center"
         data-task-id="${t.id}"
         data-due="${escapeHtml(dueIso)}"
-        data-locked="${t.locked ? '1' : '0'}">
+        data-locked="${t.locked ? '1' : '0'}"
+        data-index="${index}">
       <span class="drag-handle me-2" style="cursor:grab">⋮⋮</span>
 
       <div class="flex-grow-1">
@@ -83,30 +84,199 @@ function renderTaskItem(t) {
   `;
 }
 
+// ---- windowed lists ----
+// Each list keeps only a prefix of its tasks (grown a page at a time as it is scrolled) and only
+// the rows in view, plus OVERSCAN either side, are in the DOM; spacer rows stand in for the rest.
+const LIST_BLOCKS = { main_list: 'main-block', awaragardi_list: 'awaragardi-block', home_list: 'home-block' };
+const BLOCK_LISTS = Object.fromEntries(Object.entries(LIST_BLOCKS).map(([key, id]) => [id, key]));
+const PAGE_SIZE = 100;
+const OVERSCAN = 10;
+let rowHeight = 72; // estimate until a row has been measured
+let rowMeasured = false;
+let lists = { main_list: [], awaragardi_list: [], home_list: [] };      // loaded prefix of each list
+let totals = { main_list: 0, awaragardi_list: 0, home_list: 0 };        // length of each list on the server
+let cursors = { main_list: null, awaragardi_list: null, home_list: null }; // next-page cursor, null at the end
+let firstRendered = { main_list: 0, awaragardi_list: 0, home_list: 0 }; // absolute index of the first row drawn
+let renderedRange = {}; // "first:last" drawn per list, so scrolling inside it redraws nothing
+const loading = {};
+// version of the loaded lists (base for delta responses)
+let lastVersion = null;
+
+function isListPayload(j) {
+  return !!(j && (j.main_list || j.delta));
+}
+
+// ?window=: as many tasks of each list as are loaded (at least a page), so deltas cover exactly those
+function withWindow(url) {
+  const sizes = Object.keys(LIST_BLOCKS).map(key => `${key}:${Math.max(PAGE_SIZE, lists[key].length)}`).join(',');
+  return url + (url.includes('?') ? '&' : '?') + 'window=' + sizes;
+}
+
+// version of a task as last received (sent with writes: the server answers 409 if it has changed since)
+function taskVersion(taskId) {
+  for (const key of Object.keys(lists)) {
+    const t = lists[key].find(t => String(t.id) === String(taskId));
+    if (t) return t.version;
+  }
+  return undefined;
+}
+
+// append ?since=<version> so the server can answer with a delta
+function withSince(url) {
+  url = withWindow(url);
+  if (!lastVersion) return url;
+  return url + '&since=' + encodeURIComponent(lastVersion);
+}
+
 function renderLists(data) {
-  const mainBlock = document.getElementById('main-block');
-  const awBlock = document.getElementById('awaragardi-block');
-  const homeBlock = document.getElementById('home-block');
-
-  function populate(ul, items) {
-    ul.innerHTML = '';
-    if (!items || items.length === 0) {
-      ul.innerHTML = '<li class="list-group-item text-muted text-center">No tasks yet</li>';
+  if (data.delta) {
+    // the write's own response and the stream's event carry the same version: the later one is a no-op
+    if (data.version === lastVersion) return;
+    if (data.base !== lastVersion) {
+      // delta against something we are not showing: resync in full
+      fetchAndRender();
       return;
     }
-    for (const t of items) {
-      ul.appendChild(htmlToElement(renderTaskItem(t)));
+    for (const [key, delta] of Object.entries(data.lists || {})) {
+      if (!applyDelta(key, delta)) {
+        fetchAndRender(); // local view drifted from the server's idea of it
+        return;
+      }
     }
+  } else {
+    for (const key of Object.keys(LIST_BLOCKS)) lists[key] = data[key] || [];
   }
+  for (const key of Object.keys(LIST_BLOCKS)) {
+    const w = data.windows && data.windows[key];
+    totals[key] = w ? w.total : lists[key].length;
+    cursors[key] = w ? w.next : null;
+  }
+  lastVersion = data.version || null;
+  renderAll();
+}
+
+// Apply a delta {inserted, updated, removed, positions, length} to the loaded tasks of one list; false if it does not fit
+function applyDelta(key, delta) {
+  const byId = new Map(lists[key].map(t => [String(t.id), t]));
+  for (const t of delta.updated.concat(delta.inserted)) byId.set(String(t.id), t);
 
-  populate(mainBlock, data.main_list);
-  populate(awBlock, data.awaragardi_list);
-  populate(homeBlock, data.home_list);
+  // final order: unchanged tasks keep their old index, everything else goes to positions[id]
+  const removed = new Set(delta.removed.map(String));
+  const order = new Array(delta.length);
+  lists[key].forEach((t, i) => {
+    const id = String(t.id);
+    if (!removed.has(id)) order[id in delta.positions ? delta.positions[id] : i] = id;
+  });
+  for (const t of delta.inserted) order[delta.positions[t.id]] = String(t.id);
+  if (order.length !== delta.length) return false;
+
+  const next = [];
+  for (const id of order) {
+    const t = id && byId.get(id);
+    if (!t) return false;
+    next.push(t);
+  }
+  lists[key] = next;
+  return true;
+}
+
+function spacer(height) {
+  const li = document.createElement('li');
+  li.className = 'list-spacer';
+  li.setAttribute('aria-hidden', 'true');
+  li.style.height = `${Math.max(0, height)}px`;
+  return li;
+}
+
+// Draw the rows of one list that are in view; returns true if the DOM changed
+function renderWindow(key) {
+  const ul = document.getElementById(LIST_BLOCKS[key]);
+  const items = lists[key];
+  if (totals[key] === 0) {
+    if (renderedRange[key] === 'empty') return false;
+    ul.innerHTML = '<li class="list-group-item text-muted text-center">No tasks yet</li>';
+    renderedRange[key] = 'empty';
+    return true;
+  }
+  // snap to OVERSCAN rows so scrolling redraws once every few rows, not on every one
+  const visible = Math.ceil(Math.max(ul.clientHeight, window.innerHeight) / rowHeight);
+  const top = Math.floor(ul.scrollTop / rowHeight);
+  const first = Math.min(items.length, Math.max(0, Math.floor(top / OVERSCAN) * OVERSCAN - OVERSCAN));
+  const last = Math.min(items.length, first + visible + 3 * OVERSCAN);
+
+  // ask for the next page once the rows in view get close to the end of what is loaded
+  if (last + OVERSCAN >= items.length && items.length < totals[key]) loadMore(key);
+
+  const range = `${first}:${last}`;
+  if (renderedRange[key] === range) return false;
+  const rows = [];
+  for (let i = first; i < last; i++) rows.push(htmlToElement(renderTaskItem(items[i], i)));
+  ul.replaceChildren(spacer(first * rowHeight), ...rows, spacer((totals[key] - last) * rowHeight));
+  firstRendered[key] = first;
+  renderedRange[key] = range;
+
+  if (!rowMeasured && rows.length) {
+    rowMeasured = true;
+    if (rows[0].offsetHeight && Math.abs(rows[0].offsetHeight - rowHeight) > 1) {
+      rowHeight = rows[0].offsetHeight;
+      requestAnimationFrame(renderAll);
+    }
+  }
+  return true;
+}
 
+function renderAll() {
+  renderedRange = {};
+  for (const key of Object.keys(LIST_BLOCKS)) renderWindow(key);
   // Attach row handlers after rendering
   attachRowHandlers();
 }
 
+// Redraw a list on scroll, at most once per frame
+function onListScroll(key) {
+  let pending = false;
+  return () => {
+    if (pending || !lastVersion) return;
+    pending = true;
+    requestAnimationFrame(() => {
+      pending = false;
+      if (!isDragging && renderWindow(key)) attachRowHandlers();
+    });
+  };
+}
+
+// Append the next page of a list. Pages are cut from the server's current version: if that moved on,
+// bring the loaded part up to date first (a windowed delta) and then continue from the fresh cursor.
+async function loadMore(key, retried = false) {
+  if (loading[key] || !cursors[key]) return;
+  loading[key] = true;
+  let stale = false;
+  try {
+    const resp = await fetch(`/api/tasks/${key}?cursor=${encodeURIComponent(cursors[key])}&limit=${PAGE_SIZE}`,
+                             { cache: 'no-store' });
+    if (resp.ok) {
+      const page = await resp.json();
+      if (page.version !== lastVersion) {
+        stale = true;
+      } else if (page.offset === lists[key].length) {
+        lists[key].push(...page.items);
+        totals[key] = page.total;
+        cursors[key] = page.next;
+        renderedRange[key] = null;
+        if (!isDragging && renderWindow(key)) attachRowHandlers();
+      }
+    }
+  } catch (err) {
+    console.error('Failed to load more tasks', err);
+  } finally {
+    loading[key] = false;
+  }
+  if (stale && !retried) {
+    await fetchAndRender(true);
+    await loadMore(key, true);
+  }
+}
+
 // ---- sortable + drag logic ----
 let isDragging = false;
 function initSortable() {
@@ -122,7 +292,8 @@ function initSortable() {
     const taskId = itemEl.getAttribute('data-task-id');
     const fromList = evt.from ? evt.from.id : null;
     const toList = evt.to ? evt.to.id : null;
-    const newIndex = evt.newIndex;
+    // absolute position in the target list: rows above the drawn window are spacers, not elements
+    const newIndex = (firstRendered[BLOCK_LISTS[toList]] || 0) + (evt.newDraggableIndex ?? evt.newIndex);
 
     // Rules:
     // - side -> main allowed
@@ -146,18 +317,19 @@ function initSortable() {
 
       // side -> main (allowed): do NOT lock, mark as in_main on server
       if (fromList !== 'main-block' && toList === 'main-block') {
-        const resp = await fetch('/move', {
+        const resp = await fetch(withSince('/move'), {
           method: 'POST',
           headers: { 'Content-Type': 'application/json' },
           body: JSON.stringify({
             task_id: taskId,
             new_index: newIndex,
             new_category: 'Main',
-            locked: false
+            locked: false,
+            version: taskVersion(taskId)
           })
         });
-        const j = await resp.json();
-        if (j && j.main_list) {
+        const j = await readLists(resp);
+        if (isListPayload(j)) {
           renderLists(j);
           if (j.removed_expired && j.removed_expired.length) showToast(`${j.removed_expired.length} task(s) expired and removed.`);
         } else {
@@ -168,18 +340,19 @@ function initSortable() {
 
       // main -> main (reorder inside main) : lock the task at newIndex
       if (fromList === 'main-block' && toList === 'main-block') {
-        const resp = await fetch('/move', {
+        const resp = await fetch(withSince('/move'), {
           method: 'POST',
           headers: { 'Content-Type': 'application/json' },
           body: JSON.stringify({
             task_id: taskId,
             new_index: newIndex,
             new_category: 'Main',
-            locked: true
+            locked: true,
+            version: taskVersion(taskId)
           })
         });
-        const j = await resp.json();
-        if (j && j.main_list) {
+        const j = await readLists(resp);
+        if (isListPayload(j)) {
           renderLists(j);
           if (j.removed_expired && j.removed_expired.length) showToast(`${j.removed_expired.length} task(s) expired and removed.`);
         } else {
@@ -197,17 +370,33 @@ function initSortable() {
     }
   }
 
-  new Sortable(mainEl, { group: groups, animation: 150, handle: '.drag-handle', onStart: () => { isDragging = true; }, onEnd: onEndHandler });
-  new Sortable(awEl, { group: groups, animation: 150, handle: '.drag-handle', onStart: () => { isDragging = true; }, onEnd: onEndHandler });
-  new Sortable(homeEl, { group: groups, animation: 150, handle: '.drag-handle', onStart: () => { isDragging = true; }, onEnd: onEndHandler });
+  new Sortable(mainEl, { group: groups, animation: 150, handle: '.drag-handle', draggable: 'li[data-task-id]', onStart: () => { isDragging = true; }, onEnd: onEndHandler });
+  new Sortable(awEl, { group: groups, animation: 150, handle: '.drag-handle', draggable: 'li[data-task-id]', onStart: () => { isDragging = true; }, onEnd: onEndHandler });
+  new Sortable(homeEl, { group: groups, animation: 150, handle: '.drag-handle', draggable: 'li[data-task-id]', onStart: () => { isDragging = true; }, onEnd: onEndHandler });
 }
 
 // ---- fetch and render ----
-async function fetchAndRender() {
+// ETag of the lists currently on screen; sent as If-None-Match so unchanged polls get a bodyless 304
+let lastEtag = null;
+
+// parse a canonical-lists response and remember its version
+// (a 409 means the task was changed elsewhere first: nothing was written and the body has the current lists)
+async function readLists(resp) {
+  const etag = resp.headers.get('ETag');
+  if (etag) lastEtag = etag;
+  if (resp.status === 409) showToast('This task was changed elsewhere; showing the latest version.');
+  return resp.json();
+}
+
+// conditional=true (background refresh) lets the server answer 304; other callers need the DOM reset
+async function fetchAndRender(conditional = false) {
   if (isDragging) return;
   try {
-    const resp = await fetch('/api/tasks');
-    const data = await resp.json();
+    const headers = conditional && lastEtag ? { 'If-None-Match': lastEtag } : {};
+    const url = conditional ? withSince('/api/tasks') : withWindow('/api/tasks');
+    const resp = await fetch(url, { headers, cache: 'no-store' });
+    if (resp.status === 304) return; // nothing changed since last render
+    const data = await readLists(resp);
     renderLists(data);
     if (data.removed_expired && data.removed_expired.length) {
       showToast(`${data.removed_expired.length} task(s) expired and were removed.`);
@@ -217,6 +406,36 @@ async function fetchAndRender() {
   }
 }
 
+// ---- live updates (SSE) ----
+// Subscribe to /api/stream; returns false when EventSource is unavailable so the caller can fall back to polling.
+function connectStream() {
+  if (!window.EventSource) return false;
+  // hydrated clients pass the version they hold, so the stream starts with changes instead of a snapshot
+  const since = lastVersion ? `&since=${encodeURIComponent(lastVersion)}` : '';
+  const es = new EventSource(`/api/stream?window=${PAGE_SIZE}${since}`);
+  const onData = (e) => {
+    if (isDragging) return; // the drop handler renders the server's answer itself
+    try {
+      const data = JSON.parse(e.data);
+      // the stream's events cover its first page of each list; with more loaded, fetch the change for all of it
+      // (that answer reports the expired tasks itself)
+      if (Object.values(lists).some(l => l.length > PAGE_SIZE)) return fetchAndRender(true);
+      renderLists(data);
+      if (data.removed_expired && data.removed_expired.length) {
+        showToast(`${data.removed_expired.length} task(s) expired and were removed.`);
+      }
+    } catch (err) {
+      console.error('Bad stream event', err);
+    }
+  };
+  es.addEventListener('tasks', onData);
+  es.addEventListener('delta', onData);
+  // EventSource reconnects on its own, sending the last event id (a list version): the server resumes
+  // with a delta from it, or with a full snapshot if it no longer remembers that version
+  es.onerror = () => console.warn('Task stream interrupted, reconnecting...');
+  return true;
+}
+
 // ---- row event handlers (lock, split, edit-due) ----
 function attachRowHandlers() {
   // LOCK button behavior (explicit toggle)
@@ -230,14 +449,14 @@ function attachRowHandlers() {
         if (!confirm('Make this task eligible for automatic reordering again?')) return;
         // explicit unlock: update locked=false, clear fixed_pos
         try {
-          const resp = await fetch(`/update/${taskId}`, {
+          const resp = await fetch(withSince(`/update/${taskId}`), {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ locked: false, fixed_pos: null })
+            body: JSON.stringify({ locked: false, fixed_pos: null, version: taskVersion(taskId) })
           });
-          const j = await resp.json();
-          if (j && j.main_list) renderLists(j); else fetchAndRender();
-          showToast('Task unlocked (auto-reorder enabled).');
+          const j = await readLists(resp);
+          if (isListPayload(j)) renderLists(j); else fetchAndRender();
+          if (resp.ok) showToast('Task unlocked (auto-reorder enabled).');
         } catch (err) {
           console.error('Unlock failed', err);
           showToast('Failed to unlock task.');
@@ -247,17 +466,18 @@ function attachRowHandlers() {
         const parentUl = li.closest('ul');
         let idx = 0;
         if (parentUl && parentUl.id === 'main-block') {
-          idx = Array.from(parentUl.children).indexOf(li);
+          idx = Number(li.getAttribute('data-index')) || 0;
         }
         try {
-          const resp = await fetch('/move', {
+          const resp = await fetch(withSince('/move'), {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ task_id: taskId, new_index: idx, new_category: 'Main', locked: true })
+            body: JSON.stringify({ task_id: taskId, new_index: idx, new_category: 'Main', locked: true,
+                                   version: taskVersion(taskId) })
           });
-          const j = await resp.json();
-          if (j && j.main_list) renderLists(j); else fetchAndRender();
-          showToast('Task locked in Main.');
+          const j = await readLists(resp);
+          if (isListPayload(j)) renderLists(j); else fetchAndRender();
+          if (resp.ok) showToast('Task locked in Main.');
         } catch (err) {
           console.error('Lock failed', err);
           showToast('Failed to lock task.');
@@ -274,13 +494,13 @@ function attachRowHandlers() {
       const taskId = li.getAttribute('data-task-id');
       if (!confirm('Split this task into parts?')) return;
       try {
-        const resp = await fetch(`/split/${taskId}`, { method: 'POST' });
+        const resp = await fetch(withSince(`/split/${taskId}`), { method: 'POST' });
         if (resp.status === 404) {
           showToast('Split endpoint not available on server.');
           return;
         }
-        const j = await resp.json();
-        if (j && j.main_list) {
+        const j = await readLists(resp);
+        if (isListPayload(j)) {
           renderLists(j);
           showToast('Task split.');
         } else {
@@ -345,17 +565,17 @@ if (saveBtn) {
     const localIso = `${dateInput}T${timeInput}`;
 
     try {
-      const resp = await fetch(`/update/${hiddenId}`, {
+      const resp = await fetch(withSince(`/update/${hiddenId}`), {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ due_datetime: localIso })
+        body: JSON.stringify({ due_datetime: localIso, version: taskVersion(hiddenId) })
       });
       if (resp.status === 404) {
         showToast('Update endpoint not available on server.');
       } else {
-        const j = await resp.json();
-        if (j && j.main_list) renderLists(j); else fetchAndRender();
-        showToast('Due date updated.');
+        const j = await readLists(resp);
+        if (isListPayload(j)) renderLists(j); else fetchAndRender();
+        if (resp.ok) showToast('Due date updated.');
       }
     } catch (err) {
       console.error('Update failed', err);
@@ -369,8 +589,28 @@ if (saveBtn) {
 }}
 
 // ---- boot ----
+// State embedded in the page by the server (first page of each list); false if absent
+function hydrate() {
+  const el = document.getElementById('initial-state');
+  if (!el) return false;
+  try {
+    renderLists(JSON.parse(el.textContent));
+    return true;
+  } catch (err) {
+    console.error('Bad initial state', err);
+    return false;
+  }
+}
+
 window.addEventListener('DOMContentLoaded', () => {
   initSortable();
-  fetchAndRender();
-  setInterval(fetchAndRender, 10000);
+  const hydrated = hydrate();
+  for (const [key, blockId] of Object.entries(LIST_BLOCKS)) {
+    document.getElementById(blockId).addEventListener('scroll', onListScroll(key), { passive: true });
+  }
+  window.addEventListener('resize', () => { if (lastVersion && !isDragging) renderAll(); });
+  if (!connectStream()) {
+    if (!hydrated) fetchAndRender();
+    setInterval(() => fetchAndRender(true), 10000);
+  }
 });
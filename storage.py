@@ -1,142 +1,610 @@
 # storage.py
+import operator
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-from sqlalchemy import select
-from models import Session, Task, engine, Base
-
-# Ensure tables exist (safe to call multiple times)
-Base.metadata.create_all(engine)
-
-def _row_to_dict(row: Task) -> Dict[str, Any]:
-    """Convert a Task row to a plain dict (same shape logic.py expects)."""
-    return {
-        "id": row.id,
-        "title": row.title,
-        "category": row.category,
-        "due_datetime": row.due_datetime,
-        "locked": bool(row.locked),
-        "fixed_pos": row.fixed_pos,
-        "part_label": row.part_label,
-        "is_done": bool(row.is_done),
-        "is_gym": bool(row.is_gym),
-        "in_main": bool(getattr(row, "in_main", False)),
-        "created_at": row.created_at,
-        "updated_at": row.updated_at,
-    }
+from typing import List, Dict, Any, Iterator, Optional, Set, Tuple
+from sqlalchemy import select, insert, delete, and_, or_, func, cast, literal, null, Boolean, DateTime, Integer
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm.exc import StaleDataError
+from models import (Session, WriteSession, Task, ArchivedTask, TaskTemplate, TemplateOccurrence, WorkspaceVersion,
+                    BUSY_TIMEOUT, get_engine, migrate)
+from records import TaskRecord, from_epoch, to_epoch
+from recurrence import Template, occurrence_id, split_id
+import events
 
-def add_task(title: str, category: str, due_datetime: datetime,
-             part_label: Optional[str] = None, is_gym: bool = False, in_main: bool = False) -> int:
-    """Create a task and return its new id."""
-    s = Session()
-    t = Task(
-        title=title,
-        category=category,
-        due_datetime=due_datetime,
-        part_label=part_label,
-        is_gym=is_gym,
-        in_main=in_main,
-        locked=False,
-        is_done=False
-    )
-    s.add(t)
-    s.commit()
-    new_id = t.id
-    s.close()
-    return new_id
-
-def get_task(task_id: int) -> Optional[Dict[str, Any]]:
-    """Return a task dict or None if not found."""
-    s = Session()
-    row = s.get(Task, task_id)
-    s.close()
-    if row:
-        return _row_to_dict(row)
+# Categories that always live in the Main workspace, regardless of in_main
+MAIN_CATEGORIES = ("Necessary", "College")
+
+# Tasks created without an explicit workspace land here (also the single-user default)
+DEFAULT_WORKSPACE = "default"
+# Valid workspace keys
+WORKSPACE_RE = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+class Conflict(Exception):
+    """A compare-and-swap write found the task at another version than the caller read (see update_task)."""
+
+    def __init__(self, task_id: int):
+        super().__init__(f"task {task_id} was changed by another writer")
+        self.task_id = task_id
+
+# Every request reads a data version: one plain sqlite3 connection per process answers those
+# (a pooled SQLAlchemy round trip costs ~50x the primary-key lookup)
+_version_conn = None
+_version_pid = None
+_version_lock = threading.Lock()
+
+def data_version(workspace: str = DEFAULT_WORKSPACE) -> int:
+    """
+    Return the workspace's data version: changes whenever a write to it is committed, by any
+    process on the database (0 before the first).
+    """
+    global _version_conn, _version_pid
+    with _version_lock:
+        if _version_pid != os.getpid():
+            _version_conn = sqlite3.connect(get_engine().url.database, timeout=BUSY_TIMEOUT,
+                                            isolation_level=None, check_same_thread=False)
+            _version_pid = os.getpid()
+        try:
+            row = _version_conn.execute(f"SELECT version FROM {WorkspaceVersion.__tablename__} WHERE workspace = ?",
+                                        (workspace,)).fetchone()
+        except sqlite3.OperationalError as e:
+            if "no such table" not in str(e):
+                raise
+            return 0  # no schema yet: the list queries report it (app._database_error)
+    return row[0] if row else 0
+
+def _advance_versions_stmt(workspaces):
+    """
+    Advance the stored data version of each workspace (unit_of_work runs it before commit).
+    Seeded from the clock, so a database restored from a backup never reissues a version
+    a client may still hold.
+    """
+    stmt = sqlite_insert(WorkspaceVersion).values(
+        [{"workspace": ws, "version": time.time_ns() // 1000} for ws in sorted(workspaces)])
+    return stmt.on_conflict_do_update(
+        index_elements=[WorkspaceVersion.workspace],
+        set_={"version": func.max(WorkspaceVersion.version + 1, stmt.excluded.version)})
+
+def _latest_version_stmt(workspaces):
+    return select(func.max(WorkspaceVersion.version)).where(WorkspaceVersion.workspace.in_(sorted(workspaces)))
+
+def _publish(version: int, workspaces, removed_expired: Optional[Dict[str, List[int]]] = None,
+             due: Optional[List[datetime]] = None) -> None:
+    """
+    Notify this process's subscribers (events.hub) of a committed write to workspaces.
+    removed_expired maps workspace -> ids the expiry sweep deleted; due lists the
+    due_datetime values written, so the expiry scheduler can wake for them.
+    """
+    events.hub.publish({"version": version, "workspaces": sorted(workspaces),
+                        "removed_expired": removed_expired or {}, "due": due or []})
+
+def parse_due(raw: str) -> Optional[datetime]:
+    """Parse a client/imported due_datetime string; returns a datetime or None."""
+    # Try Python 3.7+ fromisoformat (accepts 'YYYY-MM-DDTHH:MM:SS' and 'YYYY-MM-DDTHH:MM')
+    try:
+        return datetime.fromisoformat(raw)
+    except Exception:
+        pass
+    # Fallbacks: 'YYYY-MM-DD HH:MM' or 'YYYY-MM-DDTHH:MM'
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M"):
+        try:
+            return datetime.strptime(raw, fmt)
+        except Exception:
+            pass
     return None
 
-def get_all_tasks(include_done: bool = False) -> List[Dict[str, Any]]:
+def _row_to_record(row: Task) -> TaskRecord:
+    """Convert a loaded Task row to the TaskRecord logic.py works on."""
+    return TaskRecord(row.id, row.title, row.category, to_epoch(row.due_datetime), bool(row.locked),
+                      row.fixed_pos, row.part_label, bool(row.is_done), bool(row.is_gym), bool(row.in_main),
+                      to_epoch(row.created_at), to_epoch(row.updated_at), row.version or 0)
+
+def _epoch_us(col):
     """
-    Return all tasks as dicts.
-    By default excludes tasks where is_done==True (completed).
+    SQL for a DateTime column as records.to_epoch would compute it, evaluated by SQLite so
+    list queries never build datetime objects (stored as 'YYYY-MM-DD HH:MM:SS.ffffff').
     """
-    s = Session()
-    stmt = select(Task)
-    rows = s.execute(stmt).scalars().all()
-    s.close()
-    result = []
-    for r in rows:
-        if not include_done and r.is_done:
-            continue
-        result.append(_row_to_dict(r))
-    return result
+    return cast(func.strftime("%s", col), Integer) * 1000000 + cast(func.substr(col, 21, 6), Integer)
+
+def _flag(col):
+    return func.coalesce(col, False, type_=Boolean)
 
-def update_task(task_id: int, **fields) -> bool:
+# Columns of a list query, in TaskRecord order
+_RECORD_COLUMNS = (
+    Task.id, Task.title, Task.category, _epoch_us(Task.due_datetime), _flag(Task.locked), Task.fixed_pos,
+    Task.part_label, _flag(Task.is_done), _flag(Task.is_gym), _flag(Task.in_main),
+    _epoch_us(Task.created_at), _epoch_us(Task.updated_at), Task.version,
+)
+
+def _records(result) -> List[TaskRecord]:
+    return [TaskRecord(*row) for row in result]
+
+@contextmanager
+def unit_of_work():
     """
-    Update fields on a task. fields example: title="New", due_datetime=dt, category="Home"
-    Returns True if updated, False if not found.
+    Run several storage calls as one transaction:
+
+        with storage.unit_of_work() as s:
+            task = storage.get_task(task_id, workspace=ws, session=s)
+            storage.update_task(task_id, workspace=ws, in_main=True, session=s)
+
+    Takes SQLite's write lock up front, commits on success (rolls back on error)
+    and advances each touched workspace's data version once for the whole unit, in the
+    same transaction.
     """
+    s = WriteSession()
+    changes = s.info.setdefault("changes", {"workspaces": set(), "removed": {}, "due": []})
+    version = None
+    try:
+        yield s
+        if changes["workspaces"]:
+            s.execute(_advance_versions_stmt(changes["workspaces"]))
+            version = s.execute(_latest_version_stmt(changes["workspaces"])).scalar()
+        s.commit()
+    except Exception:
+        s.rollback()
+        raise
+    finally:
+        s.close()
+    if version is not None:
+        _publish(version, changes["workspaces"], changes["removed"], changes["due"])
+
+def _note_write(s, workspace: str, removed: Optional[List[int]] = None,
+                due: Optional[List[datetime]] = None) -> None:
+    """Record a change to workspace in the current unit of work (published after commit)."""
+    changes = s.info["changes"]
+    changes["workspaces"].add(workspace)
+    if removed:
+        changes["removed"].setdefault(workspace, []).extend(removed)
+    changes["due"].extend(due or ())
+
+@contextmanager
+def _writing(session=None):
+    """Use the caller's unit of work if given, else a one-call unit of work."""
+    if session is not None:
+        yield session
+    else:
+        with unit_of_work() as s:
+            yield s
+
+@contextmanager
+def _reading(session=None):
+    if session is not None:
+        yield session
+        return
     s = Session()
-    row = s.get(Task, task_id)
-    if not row:
+    try:
+        yield s
+    finally:
         s.close()
-        return False
-    # Only update accepted attributes to avoid mistakes
-    allowed = {"title", "category", "due_datetime", "part_label", "is_gym", "fixed_pos", "locked", "is_done", "in_main"}
-    for k, v in fields.items():
-        if k in allowed:
-            setattr(row, k, v)
-    s.commit()
-    s.close()
-    return True
 
-def set_locked(task_id: int, locked: bool, fixed_pos: Optional[int] = None) -> bool:
+def _get_row(s, task_id: int, workspace: str, materialize: bool = False) -> Optional[Task]:
     """
-    Mark a task locked/unlocked. If locking, you can pass fixed_pos (int).
-    If unlocking, fixed_pos will be cleared unless you pass a specific value.
+    Load a task by id, only if it belongs to workspace.
+    The id of a generated occurrence (see recurrence.py) resolves to the task it became, else
+    to a new Task for it: saved and claimed with materialize (writes), else a transient copy.
     """
-    s = Session()
+    occ = split_id(task_id)
+    if occ is not None:
+        return _occurrence_row(s, occ, workspace, materialize)
     row = s.get(Task, task_id)
-    if not row:
-        s.close()
-        return False
+    if row is None or row.workspace != workspace:
+        return None
+    return row
+
+def _occurrence_row(s, occ: Tuple[int, int], workspace: str, materialize: bool) -> Optional[Task]:
+    claim = s.get(TemplateOccurrence, occ)
+    if claim is not None:
+        return _get_row(s, claim.task_id, workspace) if claim.task_id is not None else None
+    tpl = s.get(TaskTemplate, occ[0])
+    row = _occurrence_task(tpl, occ, workspace)
+    if row is None or not materialize:
+        return _unsaved(row, occ)
+    s.add(row)
+    s.flush()
+    s.add(_claim(row, occ))
+    s.flush()  # later calls in this unit of work resolve the occurrence to row
+    return row
+
+def _occurrence_task(tpl: Optional[TaskTemplate], occ: Tuple[int, int], workspace: str) -> Optional[Task]:
+    """
+    A new Task for occurrence occ of template row tpl, or None if there is no such occurrence
+    in workspace (shared with astorage).
+    """
+    if tpl is None or tpl.workspace != workspace:
+        return None
+    due = _template_record(tpl).due(occ[1])
+    if due is None:
+        return None
+    return Task(workspace=workspace, title=tpl.title, category=tpl.category,
+                due_datetime=from_epoch(due), part_label=tpl.part_label, is_gym=bool(tpl.is_gym),
+                in_main=bool(tpl.in_main), locked=False, fixed_pos=None, is_done=False, created_at=tpl.created_at)
+
+def _unsaved(row: Optional[Task], occ: Tuple[int, int]) -> Optional[Task]:
+    """row, never to be saved, under the occurrence's generated id (reads of an unclaimed occurrence)."""
+    if row is not None:
+        row.id = occurrence_id(*occ)
+    return row
+
+def _check_version(row: Optional[Task], task_id: int, expected_version: Optional[int]) -> None:
+    """Raise Conflict unless row is at expected_version (None skips the check; a generated occurrence is at 0)."""
+    if expected_version is not None and row is not None and (row.version or 0) != expected_version:
+        raise Conflict(task_id)
+
+def _cas_row(s, task_id: int, workspace: str, expected_version: Optional[int]) -> Optional[Task]:
+    """_get_row(materialize=True) for a write, checked against expected_version before an occurrence is claimed."""
+    if expected_version is not None:
+        _check_version(_get_row(s, task_id, workspace), task_id, expected_version)
+    return _get_row(s, task_id, workspace, materialize=True)
+
+def _cas_flush(s, task_id: int) -> None:
+    """Flush a checked write now, so the version-matching UPDATE reports a lost race as Conflict."""
+    try:
+        s.flush()
+    except StaleDataError:
+        raise Conflict(task_id) from None
+
+def _claim(row: Task, occ: Tuple[int, int]) -> TemplateOccurrence:
+    """The claim of an occurrence materialized as row (flushed, so it has its real id)."""
+    return TemplateOccurrence(template_id=occ[0], occurrence=occ[1], workspace=row.workspace,
+                              due_datetime=row.due_datetime, task_id=row.id)
+
+def add_task(title: str, category: str, due_datetime: datetime,
+             part_label: Optional[str] = None, is_gym: bool = False, in_main: bool = False,
+             workspace: str = DEFAULT_WORKSPACE, session=None) -> int:
+    """Create a task and return its new id."""
+    with _writing(session) as s:
+        t = Task(
+            workspace=workspace,
+            title=title,
+            category=category,
+            due_datetime=due_datetime,
+            part_label=part_label,
+            is_gym=is_gym,
+            in_main=in_main,
+            locked=False,
+            is_done=False
+        )
+        s.add(t)
+        s.flush()
+        _note_write(s, workspace, due=[due_datetime])
+        return t.id
+
+# Columns bulk_insert writes (everything but the autoincrement id)
+_BULK_COLUMNS = tuple(c.name for c in Task.__table__.columns if c.name not in ("id", "version"))
+_BULK_DATETIME_IDX = tuple(i for i, c in enumerate(_BULK_COLUMNS) if isinstance(Task.__table__.c[c].type, DateTime))
+
+def bulk_insert(rows: List[Dict[str, Any]], session=None) -> int:
+    """
+    Insert many task rows (dicts keyed by Task column names) with a single executemany.
+    Rows must already be validated and carry their workspace; returns the number inserted.
+    """
+    if not rows:
+        return 0
+    cols = _BULK_COLUMNS
+    # every inserted row starts at version 1, like an ORM insert (models.Task.version)
+    sql = f"INSERT INTO {Task.__tablename__} ({', '.join(cols)}, version) VALUES ({', '.join('?' * len(cols))}, 1)"
+    # Bypass per-value type processing: write datetimes exactly as the SQLite dialect stores
+    # them ('YYYY-MM-DD HH:MM:SS.ffffff'); sqlite3 already stores bools as 0/1
+    getter = operator.itemgetter(*cols)
+    params = []
+    for r in rows:
+        try:
+            vals = list(getter(r))
+        except KeyError:
+            vals = [r.get(c) for c in cols]
+        for i in _BULK_DATETIME_IDX:
+            if vals[i] is not None:
+                vals[i] = vals[i].isoformat(" ", "microseconds")
+        params.append(tuple(vals))
+    with _writing(session) as s:
+        s.connection().exec_driver_sql(sql, params)
+        # the scheduler only needs the earliest due; it re-anchors on the table after each sweep
+        earliest = [min(r["due_datetime"] for r in rows)]
+        for ws in {r["workspace"] for r in rows}:
+            _note_write(s, ws, due=earliest)
+    return len(rows)
+
+# Archived tasks in the shape of Task columns (done, unlocked, under their original id)
+_ARCHIVE_AS_TASK = (
+    ArchivedTask.task_id.label("id"), ArchivedTask.workspace, ArchivedTask.title, ArchivedTask.category,
+    ArchivedTask.due_datetime, literal(False).label("locked"), null().label("fixed_pos"), ArchivedTask.part_label,
+    literal(True).label("is_done"), ArchivedTask.is_gym, ArchivedTask.in_main, ArchivedTask.created_at,
+    ArchivedTask.updated_at,
+)
+
+def iter_tasks(include_done: bool = True, workspace: Optional[str] = None,
+               batch_size: int = 5000) -> Iterator[Dict[str, Any]]:
+    """
+    Stream task rows (of one workspace, or all when workspace is None) as plain dicts of
+    column values, fetching batch_size rows at a time. With include_done, archived tasks
+    follow the live ones, as done tasks under their original ids.
+    """
+    # the same columns for live and archived rows (the version counter is not exported)
+    stmt = select(*(Task.__table__.c[col.name] for col in _ARCHIVE_AS_TASK)).order_by(Task.id)
+    if workspace is not None:
+        stmt = stmt.where(Task.workspace == workspace)
+    if not include_done:
+        stmt = stmt.where(Task.is_done == False)
+    stmts = [stmt]
+    if include_done:
+        archived = select(*_ARCHIVE_AS_TASK).order_by(ArchivedTask.id)
+        if workspace is not None:
+            archived = archived.where(ArchivedTask.workspace == workspace)
+        stmts.append(archived)
+    with get_engine().connect() as conn:
+        for stmt in stmts:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(stmt)
+            for row in result.mappings():
+                yield dict(row)
+
+def get_task(task_id: int, workspace: str = DEFAULT_WORKSPACE, session=None) -> Optional[TaskRecord]:
+    """Return a task record or None if not found (in this workspace)."""
+    with _reading(session) as s:
+        row = _get_row(s, task_id, workspace)
+        if row:
+            return _row_to_record(row)
+    return None
+
+def get_all_tasks(include_done: bool = False, workspace: str = DEFAULT_WORKSPACE) -> List[TaskRecord]:
+    """
+    Return all tasks of a workspace as records.
+    By default excludes tasks where is_done==True (completed). Completed tasks are
+    normally in the archive already (see get_history); include_done only adds ones
+    marked done that archive_done has not moved yet.
+    """
+    stmt = select(*_RECORD_COLUMNS).where(Task.workspace == workspace)
+    if not include_done:
+        stmt = stmt.where(Task.is_done == False)
+    with _reading() as s:
+        return _records(s.execute(stmt))
+
+def _main_tasks_stmt(workspace: str):
+    return select(*_RECORD_COLUMNS).where(
+        Task.workspace == workspace,
+        Task.is_done == False,
+        or_(Task.in_main == True, Task.category.in_(MAIN_CATEGORIES)),
+    ).order_by(Task.id)
+
+def _side_tasks_stmt(category: str, workspace: str, now: datetime):
+    return select(*_RECORD_COLUMNS).where(
+        Task.workspace == workspace,
+        Task.is_done == False,
+        Task.in_main == False,
+        Task.category == category,
+        Task.due_datetime > now,
+    ).order_by(Task.id)
+
+def get_main_tasks(workspace: str = DEFAULT_WORKSPACE) -> List[TaskRecord]:
+    """
+    Return open tasks that belong in the Main workspace:
+    in_main==True OR category is Necessary/College. Unordered; see logic.compile_main.
+    """
+    with _reading() as s:
+        return _records(s.execute(_main_tasks_stmt(workspace)))
+
+def get_side_tasks(category: str, workspace: str = DEFAULT_WORKSPACE,
+                   now: Optional[datetime] = None) -> List[TaskRecord]:
+    """
+    Return open tasks sitting in a side bank (category, not in_main) and not yet due at now,
+    in id order (so they leave the list on time even if the expiry sweep lags).
+    """
+    with _reading() as s:
+        return _records(s.execute(_side_tasks_stmt(category, workspace, now or datetime.now())))
+
+# Columns of a template query, in recurrence.Template order
+_TEMPLATE_COLUMNS = (
+    TaskTemplate.id, TaskTemplate.title, TaskTemplate.category, TaskTemplate.part_label,
+    _flag(TaskTemplate.is_gym), _flag(TaskTemplate.in_main), TaskTemplate.freq, TaskTemplate.interval,
+    _epoch_us(TaskTemplate.start), _epoch_us(TaskTemplate.until), _epoch_us(TaskTemplate.created_at),
+)
+
+def _template_record(row: TaskTemplate) -> Template:
+    return Template(row.id, row.title, row.category, row.part_label, bool(row.is_gym), bool(row.in_main),
+                    row.freq, row.interval, to_epoch(row.start), to_epoch(row.until), to_epoch(row.created_at))
+
+def _templates_stmt(workspace: str, now: Optional[datetime] = None):
+    stmt = select(*_TEMPLATE_COLUMNS).where(TaskTemplate.workspace == workspace).order_by(TaskTemplate.id)
+    if now is not None:
+        stmt = stmt.where(or_(TaskTemplate.until == None, TaskTemplate.until > now))
+    return stmt
+
+def _claims_stmt(workspace: str, now: datetime):
+    return select(TemplateOccurrence.template_id, TemplateOccurrence.occurrence).where(
+        TemplateOccurrence.workspace == workspace, TemplateOccurrence.due_datetime > now)
+
+def add_template(title: str, category: str, start: datetime, freq: str, interval: int = 1,
+                 until: Optional[datetime] = None, part_label: Optional[str] = None, is_gym: bool = False,
+                 in_main: bool = False, workspace: str = DEFAULT_WORKSPACE, session=None) -> int:
+    """Create a recurring task (first due at start, then every interval days/weeks/months); returns its id."""
+    with _writing(session) as s:
+        t = TaskTemplate(workspace=workspace, title=title, category=category, part_label=part_label,
+                         is_gym=is_gym, in_main=in_main, freq=freq, interval=interval, start=start, until=until)
+        s.add(t)
+        s.flush()
+        _note_write(s, workspace)
+        return t.id
+
+def delete_template(template_id: int, workspace: str = DEFAULT_WORKSPACE, session=None) -> bool:
+    """Delete a template and so all its generated occurrences (ones already materialized stay as tasks)."""
+    with _writing(session) as s:
+        row = s.get(TaskTemplate, template_id)
+        if row is None or row.workspace != workspace:
+            return False
+        s.delete(row)
+        s.execute(delete(TemplateOccurrence).where(TemplateOccurrence.template_id == template_id))
+        _note_write(s, workspace)
+    return True
+
+def get_templates(workspace: str = DEFAULT_WORKSPACE, now: Optional[datetime] = None) -> List[Template]:
+    """A workspace's templates in id order; with now, only those with occurrences still to come."""
+    with _reading() as s:
+        return [Template(*row) for row in s.execute(_templates_stmt(workspace, now))]
+
+def get_claims(workspace: str = DEFAULT_WORKSPACE, now: Optional[datetime] = None) -> Set[Tuple[int, int]]:
+    """(template id, index) of the workspace's occurrences due after now that are real tasks already."""
+    with _reading() as s:
+        return {(tid, n) for tid, n in s.execute(_claims_stmt(workspace, now or datetime.now()))}
+
+# Attributes update_task accepts (anything else is ignored to avoid mistakes)
+UPDATABLE_FIELDS = frozenset({"title", "category", "due_datetime", "part_label", "is_gym", "fixed_pos",
+                              "locked", "is_done", "in_main"})
+
+def _apply_update(row: Task, fields: Dict[str, Any]) -> None:
+    for k, v in fields.items():
+        if k in UPDATABLE_FIELDS:
+            setattr(row, k, v)
+
+def _apply_lock(row: Task, locked: bool, fixed_pos: Optional[int]) -> None:
     row.locked = bool(locked)
     # Only set fixed_pos if provided and an int; clear if unlocking and not provided
     if isinstance(fixed_pos, int):
         row.fixed_pos = fixed_pos
     elif not locked:
         row.fixed_pos = None
-    s.commit()
-    s.close()
+
+# Columns a task keeps in the archive (see models.ArchivedTask)
+_ARCHIVE_FIELDS = ("workspace", "title", "category", "due_datetime", "part_label", "is_gym", "in_main",
+                   "created_at", "updated_at")
+
+def _archived(row: Task, completed_at: datetime) -> ArchivedTask:
+    """The archive row of a completed task (the caller deletes row in the same unit of work)."""
+    return ArchivedTask(task_id=row.id, completed_at=completed_at,
+                        **{k: getattr(row, k) for k in _ARCHIVE_FIELDS})
+
+def update_task(task_id: int, workspace: str = DEFAULT_WORKSPACE, session=None,
+                expected_version: Optional[int] = None, **fields) -> bool:
+    """
+    Update fields on a task. fields example: title="New", due_datetime=dt, category="Home"
+    Setting is_done=True completes it: the task moves to the archive.
+    With expected_version (the "version" of the task the caller read), the write is a
+    compare-and-swap: Conflict is raised, and nothing written, if the task changed since.
+    Returns True if updated, False if not found.
+    """
+    with _writing(session) as s:
+        row = _cas_row(s, task_id, workspace, expected_version)
+        if not row:
+            return False
+        _apply_update(row, fields)
+        if row.is_done:
+            s.add(_archived(row, datetime.now()))
+            s.delete(row)
+        if row.is_done or expected_version is not None:
+            # done: later calls in this unit of work no longer find it
+            _cas_flush(s, task_id)
+        _note_write(s, workspace, due=[row.due_datetime])
     return True
 
-def mark_done(task_id: int) -> bool:
-    """Mark a task as done (is_done=True)."""
-    return update_task(task_id, is_done=True)
+def set_locked(task_id: int, locked: bool, fixed_pos: Optional[int] = None,
+               workspace: str = DEFAULT_WORKSPACE, session=None, expected_version: Optional[int] = None) -> bool:
+    """
+    Mark a task locked/unlocked. If locking, you can pass fixed_pos (int).
+    If unlocking, fixed_pos will be cleared unless you pass a specific value.
+    expected_version makes it a compare-and-swap, as in update_task.
+    """
+    with _writing(session) as s:
+        row = _cas_row(s, task_id, workspace, expected_version)
+        if not row:
+            return False
+        _apply_lock(row, locked, fixed_pos)
+        if expected_version is not None:
+            _cas_flush(s, task_id)
+        _note_write(s, workspace)
+    return True
 
-def delete_task(task_id: int) -> bool:
+def mark_done(task_id: int, workspace: str = DEFAULT_WORKSPACE, session=None) -> bool:
+    """Mark a task as done (is_done=True), which moves it to the archive."""
+    return update_task(task_id, workspace=workspace, session=session, is_done=True)
+
+def delete_task(task_id: int, workspace: str = DEFAULT_WORKSPACE, session=None) -> bool:
     """Delete a task row; returns True if deleted."""
-    s = Session()
-    row = s.get(Task, task_id)
-    if not row:
-        s.close()
-        return False
-    s.delete(row)
-    s.commit()
-    s.close()
+    with _writing(session) as s:
+        row = _get_row(s, task_id, workspace, materialize=True)
+        if not row:
+            return False
+        s.delete(row)
+        _note_write(s, workspace)
     return True
 
-def remove_expired(now: Optional[datetime] = None) -> List[int]:
+def remove_expired(now: Optional[datetime] = None, session=None) -> List[int]:
     """
-    Remove tasks whose due_datetime <= now AND not done.
-    Returns list of removed task ids for notifying the UI.
+    Remove tasks (in every workspace) whose due_datetime <= now AND not done, in one bulk DELETE.
+    Returns list of removed task ids; notifications carry them per workspace for the UI.
     """
     if now is None:
         now = datetime.now()
-    s = Session()
-    stmt = select(Task).where(Task.due_datetime <= now, Task.is_done == False)
-    rows = s.execute(stmt).scalars().all()
-    removed_ids = [r.id for r in rows]
-    for r in rows:
-        s.delete(r)
-    s.commit()
-    s.close()
-    return removed_ids
\ No newline at end of file
+    cond = (Task.due_datetime <= now, Task.is_done == False)
+    with _writing(session) as s:
+        if s.get_bind().dialect.delete_returning:
+            removed = s.execute(delete(Task).where(*cond).returning(Task.id, Task.workspace)).all()
+        else:
+            # SQLite < 3.35: collect ids first, same transaction
+            removed = s.execute(select(Task.id, Task.workspace).where(*cond)).all()
+            if removed:
+                s.execute(delete(Task).where(Task.id.in_([r.id for r in removed])))
+        by_workspace: Dict[str, List[int]] = {}
+        for task_id, ws in removed:
+            by_workspace.setdefault(ws, []).append(task_id)
+        for ws, ids in by_workspace.items():
+            _note_write(s, ws, removed=ids)
+    return [r.id for r in removed]
+
+def archive_done(now: Optional[datetime] = None, session=None) -> int:
+    """
+    Compaction: move every task still marked done in tasks (any workspace; e.g. imported
+    done, or completed before the archive existed) into the archive with two bulk statements.
+    Returns the number moved. The lists never show done tasks, so no version changes.
+    """
+    if now is None:
+        now = datetime.now()
+    cols = [getattr(Task, k) for k in _ARCHIVE_FIELDS]
+    with _writing(session) as s:
+        moved = s.execute(insert(ArchivedTask).from_select(
+            ["task_id", *_ARCHIVE_FIELDS, "completed_at"],
+            select(Task.id, *cols, literal(now, DateTime)).where(Task.is_done == True).order_by(Task.id),
+        )).rowcount
+        if moved:
+            s.execute(delete(Task).where(Task.is_done == True))
+    return moved
+
+def prune_occurrences(now: Optional[datetime] = None, session=None) -> int:
+    """
+    Compaction: drop claims of occurrences that came due (any workspace); expand() never
+    generates those again. Returns the number removed; the lists do not change.
+    """
+    if now is None:
+        now = datetime.now()
+    with _writing(session) as s:
+        return s.execute(delete(TemplateOccurrence).where(TemplateOccurrence.due_datetime <= now)).rowcount
+
+def get_history(workspace: str = DEFAULT_WORKSPACE, start: Optional[datetime] = None,
+                end: Optional[datetime] = None, limit: int = 100,
+                after: Optional[Tuple[datetime, int]] = None) -> List[Dict[str, Any]]:
+    """
+    Completed tasks of a workspace from the archive, newest completion first, as dicts of
+    ArchivedTask columns. start/end bound completed_at (start inclusive, end exclusive);
+    after=(completed_at, id) of the last row of a previous page continues after it.
+    Served by ix_tasks_archive_ws_completed.
+    """
+    a = ArchivedTask
+    stmt = select(a).where(a.workspace == workspace)
+    if start is not None:
+        stmt = stmt.where(a.completed_at >= start)
+    if end is not None:
+        stmt = stmt.where(a.completed_at < end)
+    if after is not None:
+        at, archive_id = after
+        stmt = stmt.where(or_(a.completed_at < at, and_(a.completed_at == at, a.id < archive_id)))
+    stmt = stmt.order_by(a.completed_at.desc(), a.id.desc()).limit(limit)
+    with _reading() as s:
+        return [row.as_dict() for row in s.execute(stmt).scalars()]
+
+def next_due() -> Optional[datetime]:
+    """Return the earliest due_datetime among open tasks (any workspace), or None."""
+    with _reading() as s:
+        return s.execute(select(func.min(Task.due_datetime)).where(Task.is_done == False)).scalar()
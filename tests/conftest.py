@@ -0,0 +1,26 @@
+# conftest.py
+"""Run the tests against a scratch database (DB_URL is read when models is imported)."""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["TODO_DB_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='todo-tests-')}/tasks.db"
+
+
+@pytest.fixture(scope="session")
+def app():
+    """The Flask app on the scratch database (migrated once)."""
+    import app as web
+    import storage
+    storage.migrate()
+    web.app.config["TESTING"] = True
+    return web.app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,50 @@
+# test_bulk.py
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+import bulk
+import storage
+
+WS = "bulktest"
+
+
+@pytest.fixture(scope="module", autouse=True)
+def tasks():
+    """One open task, one edited (version 2) and one archived, in a workspace of their own."""
+    storage.migrate()
+    due = datetime(2099, 1, 1, 9, 30)
+    open_id = storage.add_task("open", "Home", due, workspace=WS)
+    edited_id = storage.add_task("edited", "Work", due + timedelta(hours=1), workspace=WS)
+    storage.update_task(edited_id, workspace=WS, title="edited twice", part_label="1/2")
+    done_id = storage.add_task("done", "Home", due + timedelta(hours=2), workspace=WS)
+    storage.mark_done(done_id, workspace=WS)
+    return open_id, edited_id, done_id
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "csv"])
+def test_export_round_trip(fmt):
+    out = io.StringIO()
+    assert bulk.export_tasks(out, fmt, workspace=WS) == 3
+    rows = list(bulk.read_rows(io.StringIO(out.getvalue()), fmt))
+    assert [r["title"] for r in rows] == ["open", "edited twice", "done"]
+    assert all(list(r) == bulk.EXPORT_FIELDS for r in rows)
+
+    copy = f"{WS}-{fmt}"
+    moved = [dict(r, workspace=copy) for r in rows]
+    assert bulk.import_tasks(bulk.validate(moved)) == 3
+    again = io.StringIO()
+    bulk.export_tasks(again, fmt, workspace=copy)
+    copied = list(bulk.read_rows(io.StringIO(again.getvalue()), fmt))
+
+    def data(r):
+        return {k: v for k, v in r.items() if k not in ("id", "workspace")}
+    assert [data(r) for r in copied] == [data(r) for r in rows]
+
+
+def test_live_and_archived_rows_share_columns(tasks):
+    rows = list(storage.iter_tasks(workspace=WS))
+    assert [r["id"] for r in rows] == list(tasks)
+    assert all(list(r) == bulk.EXPORT_FIELDS for r in rows)
+    assert [r["is_done"] for r in rows] == [False, False, True]
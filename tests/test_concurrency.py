@@ -0,0 +1,62 @@
+# test_concurrency.py
+"""A small version of benchmarks/stress_concurrency.py: concurrent writers through the Flask app."""
+import random
+import threading
+from datetime import datetime, timedelta
+
+import storage
+
+WS = "concurrent"
+THREADS = 8
+OPS = 30
+
+
+def test_concurrent_writers_leave_consistent_lists(app):
+    import app as web
+    headers = {"X-Workspace": WS}
+    date_str, time_str = (datetime.now() + timedelta(days=2)).strftime("%Y-%m-%d %H:%M").split(" ")
+    storage.add_task("seed", "Home", datetime.now() + timedelta(days=2), workspace=WS)
+    created = [0] * THREADS
+    errors = []
+    start = threading.Barrier(THREADS)
+
+    def worker(n):
+        rng = random.Random(n)
+        client = app.test_client()
+        start.wait()
+        for i in range(OPS):
+            ids = [t.id for t in storage.get_all_tasks(workspace=WS)]
+            op = rng.random()
+            try:
+                if op < 0.4:
+                    form = {"title": f"w{n}-{i}", "category": rng.choice(["Home", "Awaragardi", "College"]),
+                            "due_date": date_str, "due_time": time_str}
+                    r = client.post("/add", data=form, headers=headers)
+                    created[n] += r.status_code == 302
+                elif op < 0.7:
+                    move = {"task_id": rng.choice(ids), "new_category": "Main",
+                            "new_index": rng.randint(0, 10), "locked": rng.random() < 0.5}
+                    r = client.post("/move", json=move, headers=headers)
+                else:
+                    r = client.post(f"/update/{rng.choice(ids)}", json={"title": f"u{n}-{i}"}, headers=headers)
+                if r.status_code not in (200, 302):
+                    errors.append((n, i, r.status_code, r.get_data(as_text=True)[:200]))
+            except Exception as e:  # noqa: BLE001 - report every failure
+                errors.append((n, i, "exception", repr(e)))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    tasks = storage.get_all_tasks(workspace=WS)
+    assert len(tasks) == 1 + sum(created)
+
+    # every task is in exactly one list, and the cached lists match a fresh compile
+    body = app.test_client().get("/api/tasks", headers=headers).get_json()
+    listed = [t["id"] for key in web.LIST_KEYS for t in body[key]]
+    assert sorted(listed) == sorted(t.id for t in tasks)
+    fresh = web._build_lists(WS, storage.data_version(WS), datetime.now()).payload
+    assert all(body[key] == fresh[key] for key in web.LIST_KEYS)
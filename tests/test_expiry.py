@@ -0,0 +1,19 @@
+# test_expiry.py
+from datetime import datetime, timedelta
+
+import storage
+
+
+def test_polling_reports_tasks_expired_since_its_version(client):
+    headers = {"X-Workspace": "expiry-poll"}
+    due = datetime.now() + timedelta(seconds=5)
+    task_id = storage.add_task("soon", "Home", due, workspace="expiry-poll")
+    before = client.get("/api/tasks", headers=headers).get_json()["version"]
+
+    assert task_id in storage.remove_expired(due + timedelta(seconds=1))
+
+    after = client.get("/api/tasks", query_string={"since": before}, headers=headers).get_json()
+    assert after["removed_expired"] == [task_id]
+    again = client.get("/api/tasks", query_string={"since": after["version"]}, headers=headers).get_json()
+    assert again["removed_expired"] == []
+    assert client.get("/api/tasks", headers=headers).get_json()["removed_expired"] == []
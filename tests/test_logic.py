@@ -0,0 +1,43 @@
+# test_logic.py
+import random
+from datetime import datetime
+
+import pytest
+
+import logic
+from benchmarks.compile_main import legacy_compile_main, random_tasks
+from benchmarks.sort_columns import adversarial_tasks, reference_order
+from records import to_epoch
+
+NOW = datetime(2025, 1, 1, 12, 0)
+
+
+@pytest.fixture(params=["numpy", "python"])
+def sort_path(request, monkeypatch):
+    """Run sort_reorderable with NumPy for every set size, or as if NumPy were not installed."""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+        monkeypatch.setattr(logic, "NUMPY_MIN_TASKS", 0)
+    else:
+        monkeypatch.setattr(logic, "_np", False)
+    return request.param
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_compile_main_matches_the_original_implementation(seed):
+    rng = random.Random(seed)
+    for _ in range(60):
+        n = rng.choice([0, 1, 2, 5, 20, 100, 500])
+        tasks = random_tasks(rng, n, NOW, locked_ratio=rng.random(), pos_spread=rng.choice([0.1, 1.0, 3.0]))
+        expected = [t["id"] for t in legacy_compile_main(tasks, NOW)]
+        assert [t["id"] for t in logic.compile_main(tasks, NOW)] == expected
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_sort_reorderable_matches_the_key_function_order(sort_path, seed):
+    rng = random.Random(seed)
+    now_us = to_epoch(NOW)
+    for _ in range(200):
+        tasks = adversarial_tasks(rng, rng.choice([0, 1, 2, 3, 10, 100, 1000]), now_us)
+        expected = [tasks[i].id for i in reference_order(tasks, now_us)]
+        assert [t.id for t in logic.sort_reorderable(tasks, NOW)] == expected
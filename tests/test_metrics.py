@@ -0,0 +1,30 @@
+# test_metrics.py
+import os
+import threading
+
+import metrics
+
+
+def test_overlapping_profiled_requests_are_profiled_one_at_a_time(tmp_path):
+    profiling, release = threading.Event(), threading.Event()
+    dumps = {}
+
+    def first():
+        metrics.begin_request("first", profile=True)
+        profiling.set()
+        release.wait()
+        dumps["first"] = metrics.end_request(str(tmp_path))[1]
+
+    t = threading.Thread(target=first)
+    t.start()
+    profiling.wait()
+    metrics.begin_request("second", profile=True)
+    stats, dumps["second"] = metrics.end_request(str(tmp_path))
+    release.set()
+    t.join()
+
+    assert stats.endpoint == "second"  # recorded, just not profiled
+    assert dumps["second"] is None
+    assert dumps["first"] is not None and os.path.exists(dumps["first"])
+    metrics.begin_request("third", profile=True)
+    assert metrics.end_request(str(tmp_path))[1] is not None
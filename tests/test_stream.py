@@ -0,0 +1,80 @@
+# test_stream.py
+import json
+from datetime import datetime, timedelta
+
+import events
+import storage
+
+DUE = datetime(2099, 1, 1, 9, 0)
+
+
+def open_stream(client, workspace, **headers):
+    """Open /api/stream for workspace; returns (response, iterator over its messages)."""
+    resp = client.get("/api/stream", headers={"X-Workspace": workspace, **headers}, buffered=False)
+    assert resp.status_code == 200
+    return resp, iter(resp.response)
+
+
+def read_event(stream):
+    """The next SSE message: (event, id, data), or ("heartbeat", None, None) for a comment."""
+    chunk = next(stream)
+    text = chunk.decode() if isinstance(chunk, bytes) else chunk
+    if text.startswith(":"):
+        return "heartbeat", None, None
+    fields = dict(line.split(": ", 1) for line in text.strip().split("\n"))
+    return fields["event"], fields["id"], json.loads(fields["data"])
+
+
+def inserted_titles(delta, key="home_list"):
+    return [t["title"] for t in delta["lists"].get(key, {}).get("inserted", [])]
+
+
+def test_stream_sends_the_lists_then_a_delta_per_write(client):
+    ws = "stream-add"
+    resp, stream = open_stream(client, ws)
+    try:
+        event, first_id, data = read_event(stream)
+        assert event == "tasks"
+        assert data["version"] == first_id and data["home_list"] == []
+        form = {"title": "new", "category": "Home", "due_date": "2099-01-02", "due_time": "10:00"}
+        assert client.post("/add", data=form, headers={"X-Workspace": ws}).status_code == 302
+        event, _, delta = read_event(stream)
+        assert event == "delta"
+        assert delta["base"] == first_id
+        assert inserted_titles(delta) == ["new"]
+    finally:
+        resp.close()
+
+
+def test_idle_stream_sends_heartbeats_until_closed(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, "STREAM_HEARTBEAT", 0.05)
+    monkeypatch.setitem(app.config, "STREAM_POLL", 0.01)
+    client.get("/api/cache")  # the first request starts the expiry scheduler, itself a subscriber
+    subscribers = events.hub.subscriber_count()
+    resp, stream = open_stream(client, "stream-idle")
+    assert events.hub.subscriber_count() == subscribers + 1
+    assert read_event(stream)[0] == "tasks"
+    assert [read_event(stream)[0] for _ in range(2)] == ["heartbeat", "heartbeat"]
+    resp.close()
+    assert events.hub.subscriber_count() == subscribers
+
+
+def test_reconnect_with_last_event_id_resumes_with_a_delta(client):
+    ws = "stream-resume"
+    resp, stream = open_stream(client, ws)
+    assert read_event(stream)[0] == "tasks"
+    # a write no request answers: only the stream ever serves this version
+    storage.add_task("seen", "Home", DUE, workspace=ws)
+    event, last_id, _ = read_event(stream)
+    assert event == "delta"
+    resp.close()
+
+    storage.add_task("missed", "Home", DUE + timedelta(hours=1), workspace=ws)
+    resp, stream = open_stream(client, ws, **{"Last-Event-ID": last_id})
+    try:
+        event, _, data = read_event(stream)
+        assert event == "delta"
+        assert data["base"] == last_id
+        assert inserted_titles(data) == ["missed"]
+    finally:
+        resp.close()
@@ -0,0 +1,62 @@
+# test_versions.py
+from datetime import datetime
+
+import pytest
+
+import storage
+
+WS = {"X-Workspace": "cas"}
+DUE = datetime(2099, 1, 1, 9, 0)
+
+
+@pytest.fixture
+def edited(app):
+    """A task edited once since it was read: the client's version 1 is stale."""
+    task_id = storage.add_task("read", "Home", DUE, workspace="cas")
+    storage.update_task(task_id, workspace="cas", title="edited elsewhere")
+    assert storage.get_task(task_id, workspace="cas").version == 2
+    return task_id
+
+
+def assert_conflict(resp, task_id):
+    assert resp.status_code == 409
+    body = resp.get_json()
+    assert body["reason"] == "conflict" and body["task_id"] == task_id
+    assert body["task"]["title"] == "edited elsewhere" and body["task"]["version"] == 2
+    assert "home_list" in body  # the current lists, to re-render from
+    return body
+
+
+def test_stale_update_is_rejected_with_the_current_task(client, edited):
+    resp = client.post(f"/update/{edited}", json={"title": "mine", "version": 1}, headers=WS)
+    assert_conflict(resp, edited)
+    assert storage.get_task(edited, workspace="cas").title == "edited elsewhere"
+
+    resp = client.post(f"/update/{edited}", json={"title": "mine", "version": 2}, headers=WS)
+    assert resp.status_code == 200
+    assert storage.get_task(edited, workspace="cas").version == 3
+
+
+def test_stale_move_is_rejected_with_the_current_task(client, edited):
+    move = {"task_id": edited, "new_category": "Main", "new_index": 0, "version": 1}
+    assert_conflict(client.post("/move", json=move, headers=WS), edited)
+    assert not storage.get_task(edited, workspace="cas").in_main
+
+    assert client.post("/move", json={**move, "version": 2}, headers=WS).status_code == 200
+    assert storage.get_task(edited, workspace="cas").in_main
+
+
+def test_stale_batch_op_rolls_back_the_whole_batch(client, edited):
+    other = storage.add_task("other", "Home", DUE, workspace="cas")
+    ops = [
+        {"op": "add", "title": "added", "category": "Home", "due_datetime": "2099-01-02T10:00"},
+        {"op": "update", "task_id": other, "title": "renamed", "version": 1},
+        {"op": "update", "task_id": edited, "title": "mine", "version": 1},
+        {"op": "delete", "task_id": other},
+    ]
+    body = assert_conflict(client.post("/api/batch", json={"ops": ops}, headers=WS), edited)
+    assert body["op_index"] == 2
+
+    titles = [t.title for t in storage.get_all_tasks(workspace="cas")]
+    assert "added" not in titles
+    assert storage.get_task(other, workspace="cas").title == "other"
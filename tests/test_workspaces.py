@@ -0,0 +1,14 @@
+# test_workspaces.py
+
+
+def test_invalid_workspace_is_rejected(client):
+    resp = client.get("/api/tasks", headers={"X-Workspace": "not a workspace!"})
+    assert resp.status_code == 400
+    assert resp.get_json()["reason"] == "invalid workspace"
+
+
+def test_static_files_ignore_the_workspace(client):
+    client.set_cookie("workspace", "bad cookie!")
+    resp = client.get("/static/script.js", query_string={"workspace": "bad/ws"}, headers={"X-Workspace": "bad ws"})
+    assert resp.status_code == 200
+    resp.close()